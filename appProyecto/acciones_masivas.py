@@ -0,0 +1,159 @@
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from .autenticacion import invalidar_usuarios
+from .basedatos import atomico
+from .enrutador import alias_auditoria, auditoria_separada, es_auditoria
+from .models import Categoria, HistorialDenuncia, LogActividad
+from .priorizacion import recalcular_ids
+from .tareas import al_confirmar
+
+
+# ==============================================================================
+# DENUNCIAS
+# ==============================================================================
+
+def reasignar_categoria_lote(queryset, categoria, usuario, ip=None, batch_size=1000):
+    """
+    Mueve a `categoria` las denuncias de `queryset` con un solo UPDATE.
+    Retorna {denuncia_id: categoria_anterior_id} de las denuncias modificadas.
+    """
+    afectadas = queryset.exclude(categoria=categoria)
+
+    with atomico():
+        previas = dict(afectadas.select_for_update().values_list('id', 'categoria_id'))
+        if not previas:
+            return {}
+        afectadas.update(categoria=categoria, fecha_actualizacion=timezone.now())
+
+        nombres = dict(Categoria.objects.values_list('id', 'nombre'))
+        HistorialDenuncia.objects.bulk_create([
+            HistorialDenuncia(
+                denuncia_id=denuncia_id,
+                usuario=usuario,
+                tipo_accion='edicion',
+                cambio_descripcion=f'Categoría: {nombres.get(anterior, "sin categoría")} → {categoria.nombre}'
+            )
+            for denuncia_id, anterior in previas.items()
+        ], batch_size=batch_size)
+        LogActividad.objects.bulk_create([
+            LogActividad(
+                usuario=usuario,
+                accion=f'Cambió categoría de denuncia #{denuncia_id} a {categoria.nombre}',
+                ip_origen=ip
+            )
+            for denuncia_id in previas
+        ], batch_size=batch_size)
+        al_confirmar(recalcular_ids, list(previas))
+
+    return previas
+
+
+def vista_previa_eliminacion(queryset):
+    """
+    Efecto de borrar `queryset` sobre las tablas relacionadas, con un COUNT
+    por relación en vez de recorrer objeto por objeto como delete_selected.
+    Retorna [(nombre, cantidad, efecto)].
+    """
+    efectos = {
+        models.CASCADE: 'se eliminarán',
+        models.SET_NULL: 'quedarán sin referencia',
+        models.PROTECT: 'impiden el borrado',
+    }
+    preview = [(queryset.model._meta.verbose_name_plural, queryset.count(), 'se eliminarán')]
+    ids = None
+    for relacion in queryset.model._meta.related_objects:
+        if relacion.many_to_many:
+            continue
+        relacionado = relacion.related_model
+        if es_auditoria(relacionado):
+            # Otra base: sin subconsulta, por lotes de ids (cascada por señal)
+            if ids is None:
+                ids = list(queryset.values_list('pk', flat=True))
+            cantidad = sum(
+                relacionado._base_manager.filter(**{f'{relacion.field.name}_id__in': ids[i:i + 1000]}).count()
+                for i in range(0, len(ids), 1000)
+            )
+            efecto = 'quedarán sin referencia' if relacion.field.null else 'se eliminarán'
+        elif relacion.on_delete is models.DO_NOTHING:
+            continue
+        else:
+            cantidad = relacionado._base_manager.filter(
+                **{f'{relacion.field.name}__in': queryset.values('pk')}
+            ).count()
+            efecto = efectos.get(relacion.on_delete, 'se verán afectadas')
+        if cantidad:
+            preview.append((relacionado._meta.verbose_name_plural, cantidad, efecto))
+    return preview
+
+
+def eliminar_denuncias_lote(queryset, usuario, ip=None, batch_size=1000):
+    """
+    Borra las denuncias de `queryset` y su historial con un DELETE por lote
+    de ids. Deja un log por denuncia eliminada.
+    Retorna la cantidad de denuncias eliminadas.
+    """
+    with atomico():
+        titulos = dict(queryset.select_for_update().values_list('id', 'titulo'))
+        if not titulos:
+            return 0
+        # Por lotes: un IN con toda la selección pasa el límite de variables de SQLite
+        ids = list(titulos)
+        lotes = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+        def borrar_historial():
+            for lote in lotes:
+                HistorialDenuncia.objects.filter(denuncia_id__in=lote).delete()
+
+        if auditoria_separada():
+            # Otra base, sin FK: se borra cuando se confirme el borrado
+            transaction.on_commit(borrar_historial, using=alias_auditoria())
+        else:
+            # Misma base con FK: el historial primero, en la misma transacción
+            borrar_historial()
+        # _raw_delete no carga las instancias ni emite post_delete: la
+        # cascada por señal (una por fila) se reemplaza por un DELETE por lote.
+        # Denuncia no tiene otras relaciones que borrar en el motor.
+        alias = router.db_for_write(queryset.model)
+        for lote in lotes:
+            queryset.model._base_manager.filter(pk__in=lote)._raw_delete(alias)
+        LogActividad.objects.bulk_create([
+            LogActividad(
+                usuario=usuario,
+                accion=f'Eliminó denuncia #{denuncia_id}: {titulo}'[:255],
+                ip_origen=ip
+            )
+            for denuncia_id, titulo in titulos.items()
+        ], batch_size=batch_size)
+    return len(titulos)
+
+
+# ==============================================================================
+# USUARIOS
+# ==============================================================================
+
+def desactivar_usuarios_lote(queryset, usuario, ip=None, batch_size=1000):
+    """
+    Desactiva con un solo UPDATE las cuentas activas de `queryset`
+    (nunca la del propio admin) e invalida su snapshot de sesión.
+    Retorna {usuario_id: username} de las cuentas desactivadas.
+    """
+    afectadas = queryset.filter(activo=True).exclude(pk=usuario.pk)
+
+    with atomico():
+        desactivados = dict(afectadas.select_for_update().values_list('id', 'username'))
+        if not desactivados:
+            return {}
+        afectadas.update(activo=False)
+        LogActividad.objects.bulk_create([
+            LogActividad(
+                usuario=usuario,
+                accion=f'Desactivó cuenta de {username}',
+                ip_origen=ip
+            )
+            for username in desactivados.values()
+        ], batch_size=batch_size)
+        # UPDATE no emite post_save: la caché se invalida a mano tras el commit
+        transaction.on_commit(lambda: invalidar_usuarios(list(desactivados)))
+
+    return desactivados
@@ -1,8 +1,13 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
 from django.urls import reverse
-from django.db.models import Count
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import (
     Usuario,
     TokenRecuperacion,
@@ -16,6 +21,17 @@ from .models import (
     Dispositivo,
     Reporte
 )
+from .acciones_masivas import (
+    desactivar_usuarios_lote,
+    eliminar_denuncias_lote,
+    reasignar_categoria_lote,
+    vista_previa_eliminacion,
+)
+from .paginacion import PaginadorEstimado
+from .priorizacion import recalcular_ids
+from .servicios import DenunciaCreationService, generar_miniatura
+from .tareas import al_confirmar, encolar
+from .transiciones import ConflictoConcurrencia, cambiar_prioridad_lote, transicionar_lote
 
 
 # ==============================================================================
@@ -27,12 +43,91 @@ admin.site.site_title = "SilvaSentinel Admin"
 admin.site.index_title = "Panel de Control"
 
 
+class TablaGrandeMixin:
+    """
+    Changelists sobre tablas que crecen sin límite: paginador con conteo
+    estimado y sin el segundo COUNT(*) de "X de Y en total"
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+
+class AuditoriaAdminMixin:
+    """
+    Historial y logs pueden estar en la base de auditoría: sin JOIN con
+    usuarios ni denuncias. Los relacionados se cargan con prefetch y la
+    búsqueda por nombre resuelve primero los ids en la base principal.
+    """
+    list_select_related = ()  # False haría select_related() de las FK de list_display
+    busqueda_relacionada = {}  # campo FK: campo de texto del modelo relacionado
+    MAX_IDS_BUSQUEDA = 1000
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(*self.busqueda_relacionada)
+
+    def get_search_results(self, request, queryset, search_term):
+        resultado, duplicados = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return resultado, duplicados
+        for campo, texto in self.busqueda_relacionada.items():
+            relacionado = self.model._meta.get_field(campo).related_model
+            ids = list(
+                relacionado._default_manager.filter(**{f'{texto}__icontains': search_term})
+                .values_list('pk', flat=True)[:self.MAX_IDS_BUSQUEDA]
+            )
+            if ids:
+                resultado |= queryset.filter(**{f'{campo}_id__in': ids})
+        return resultado, duplicados
+
+
+def total_denuncias_por(campo):
+    """
+    Subconsulta correlacionada con el total de denuncias por `campo`.
+    Se evalúa solo para las filas de la página (a diferencia de un
+    JOIN + GROUP BY sobre toda la tabla de denuncias).
+    """
+    return Coalesce(
+        Subquery(
+            Denuncia.objects.filter(**{campo: OuterRef('pk')})
+            .order_by()
+            .values(campo)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def ejecutar_masivo(modeladmin, request, queryset, funcion, *args, total=None):
+    """
+    Corre una acción masiva dentro de la petición o, si la selección supera
+    ACCIONES_ASYNC_UMBRAL, en la cola de tareas para no agotar el timeout.
+    Retorna el resultado de `funcion`, o None si quedó en segundo plano.
+    """
+    if total is None:
+        total = queryset.count()
+    ip = request.META.get('REMOTE_ADDR')
+
+    if total > getattr(settings, 'ACCIONES_ASYNC_UMBRAL', 10000):
+        encolar(funcion, queryset, *args, ip=ip)
+        modeladmin.message_user(
+            request,
+            f'ℹ️ {total} registros se están procesando en segundo plano. '
+            f'El resultado quedará en los logs de actividad.',
+            messages.INFO
+        )
+        return None
+
+    return funcion(queryset, *args, ip=ip)
+
+
 # ==============================================================================
 # USUARIO ADMIN
 # ==============================================================================
 
 @admin.register(Usuario)
-class UsuarioAdmin(UserAdmin):
+class UsuarioAdmin(TablaGrandeMixin, UserAdmin):
     """
     Administración avanzada de usuarios con estadísticas
     """
@@ -74,6 +169,10 @@ class UsuarioAdmin(UserAdmin):
     )
     
     readonly_fields = ('last_login', 'date_joined')
+    actions = ('desactivar_usuarios',)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_denuncias=total_denuncias_por('usuario'))
     
     # Campos personalizados
     def get_nombre_completo(self, obj):
@@ -106,13 +205,22 @@ class UsuarioAdmin(UserAdmin):
     activo_badge.short_description = "Estado"
     
     def total_denuncias(self, obj):
-        """Contar denuncias del usuario"""
-        count = obj.denuncias.count()
+        """Denuncias del usuario (anotadas en get_queryset)"""
+        count = obj.num_denuncias
         if count > 0:
             url = reverse('admin:appProyecto_denuncia_changelist') + f'?usuario__id__exact={obj.id}'
             return format_html('<a href="{}" style="font-weight: bold;">{} denuncias</a>', url, count)
         return "0 denuncias"
     total_denuncias.short_description = "Denuncias"
+    total_denuncias.admin_order_field = 'num_denuncias'
+    
+    def desactivar_usuarios(self, request, queryset):
+        """Desactiva las cuentas seleccionadas (excepto la propia)"""
+        desactivados = ejecutar_masivo(self, request, queryset, desactivar_usuarios_lote, request.user)
+        if desactivados is not None:
+            self.message_user(request, f'✅ {len(desactivados)} cuentas desactivadas.', messages.SUCCESS)
+    desactivar_usuarios.short_description = "Desactivar cuentas seleccionadas"
+    desactivar_usuarios.allowed_permissions = ('change',)
 
 
 # ==============================================================================
@@ -124,19 +232,23 @@ class CategoriaAdmin(admin.ModelAdmin):
     """
     Administración de categorías con contador de denuncias
     """
-    list_display = ('nombre', 'slug', 'total_denuncias', 'descripcion_corta')
+    list_display = ('nombre', 'slug', 'peso', 'total_denuncias', 'descripcion_corta')
     search_fields = ('nombre', 'descripcion')
     prepopulated_fields = {'slug': ('nombre',)}
     ordering = ('nombre',)
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(num_denuncias=total_denuncias_por('categoria'))
+    
     def total_denuncias(self, obj):
-        """Contar denuncias por categoría"""
-        count = obj.denuncias.count()
+        """Denuncias por categoría (anotadas en get_queryset)"""
+        count = obj.num_denuncias
         if count > 0:
             url = reverse('admin:appProyecto_denuncia_changelist') + f'?categoria__id__exact={obj.id}'
             return format_html('<a href="{}" style="font-weight: bold;">{}</a>', url, count)
         return "0"
     total_denuncias.short_description = "Total Denuncias"
+    total_denuncias.admin_order_field = 'num_denuncias'
     
     def descripcion_corta(self, obj):
         """Mostrar descripción resumida"""
@@ -151,7 +263,7 @@ class CategoriaAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(Ubicacion)
-class UbicacionAdmin(admin.ModelAdmin):
+class UbicacionAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Administración de ubicaciones con mapa
     """
@@ -161,6 +273,13 @@ class UbicacionAdmin(admin.ModelAdmin):
     readonly_fields = ('fecha_registro',)
     ordering = ('-fecha_registro',)
     
+    def get_readonly_fields(self, request, obj=None):
+        """Una ubicación internada es compartida: sus coordenadas no se editan"""
+        campos = super().get_readonly_fields(request, obj)
+        if obj is not None and obj.clave is not None:
+            campos = (*campos, 'latitud', 'longitud', 'altitud', 'region', 'comuna')
+        return campos
+    
     def descripcion_corta(self, obj):
         """Descripción resumida"""
         if obj.descripcion:
@@ -186,11 +305,22 @@ class UbicacionAdmin(admin.ModelAdmin):
 # DENUNCIA ADMIN
 # ==============================================================================
 
+class DenunciaAccionForm(helpers.ActionForm):
+    """Barra de acciones con la categoría destino para reasignar"""
+    categoria = forms.ModelChoiceField(
+        queryset=Categoria.objects.all(),
+        required=False,
+        empty_label='Categoría destino'
+    )
+
+
 @admin.register(Denuncia)
-class DenunciaAdmin(admin.ModelAdmin):
+class DenunciaAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Administración avanzada de denuncias
     """
+    action_form = DenunciaAccionForm
+    actions = ('marcar_resueltas', 'prioridad_alta', 'reasignar_categoria', 'eliminar_con_vista_previa')
     list_display = (
         'id',
         'titulo_corto',
@@ -198,13 +328,16 @@ class DenunciaAdmin(admin.ModelAdmin):
         'categoria',
         'estado_badge',
         'prioridad_badge',
+        'puntaje',
         'evidencia_icon',
         'fecha_creacion'
     )
     list_filter = ('estado', 'prioridad', 'categoria', 'fecha_creacion')
+    list_select_related = ('usuario', 'categoria')
     search_fields = ('titulo', 'descripcion', 'usuario__username')
-    date_hierarchy = 'fecha_creacion'
-    readonly_fields = ('fecha_creacion', 'fecha_actualizacion')
+    autocomplete_fields = ('usuario', 'categoria')
+    raw_id_fields = ('ubicacion',)
+    readonly_fields = ('puntaje', 'fecha_creacion', 'fecha_actualizacion')
     ordering = ('-fecha_creacion',)
     
     fieldsets = (
@@ -212,7 +345,7 @@ class DenunciaAdmin(admin.ModelAdmin):
             'fields': ('usuario', 'categoria', 'titulo', 'descripcion')
         }),
         ('Ubicación', {
-            'fields': ('ubicacion',),
+            'fields': ('ubicacion', 'ubicacion_texto'),
             'classes': ('collapse',)
         }),
         ('Evidencia', {
@@ -220,7 +353,7 @@ class DenunciaAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Gestión', {
-            'fields': ('estado', 'prioridad')
+            'fields': ('estado', 'prioridad', 'puntaje')
         }),
         ('Fechas', {
             'fields': ('fecha_creacion', 'fecha_actualizacion'),
@@ -281,6 +414,88 @@ class DenunciaAdmin(admin.ModelAdmin):
             return format_html('<span style="color: blue; font-size: 18px;" title="Tiene URL">🔗</span>')
         return format_html('<span style="color: gray; font-size: 18px;" title="Sin evidencia">❌</span>')
     evidencia_icon.short_description = "Evidencia"
+    
+    def save_model(self, request, obj, form, change):
+        """Las altas pasan por el mismo servicio que pagina2"""
+        if change:
+            if 'evidencia' in form.changed_data:
+                obj.miniatura = None
+                al_confirmar(generar_miniatura, obj.pk, request.user.pk, None)
+            super().save_model(request, obj, form, change)
+            al_confirmar(recalcular_ids, [obj.pk])
+            return
+        DenunciaCreationService(request.user, ip=request.META.get('REMOTE_ADDR')).guardar(obj)
+    
+    # Acciones masivas (un UPDATE/DELETE por conjunto)
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # delete_selected recorre objeto por objeto; la reemplaza eliminar_con_vista_previa
+        actions.pop('delete_selected', None)
+        return actions
+    
+    def marcar_resueltas(self, request, queryset):
+        """Resuelve las denuncias cuyo estado lo permite"""
+        try:
+            movidas = ejecutar_masivo(self, request, queryset, transicionar_lote, 'resuelta', request.user)
+        except ConflictoConcurrencia:
+            self.message_user(request, '⚠️ Otro usuario modificó algunas denuncias. Vuelve a intentarlo.', messages.ERROR)
+            return
+        if movidas is not None:
+            self.message_user(request, f'✅ {len(movidas)} denuncias marcadas como resueltas.', messages.SUCCESS)
+    marcar_resueltas.short_description = "Marcar como resueltas"
+    marcar_resueltas.allowed_permissions = ('change',)
+    
+    def prioridad_alta(self, request, queryset):
+        """Sube a prioridad alta"""
+        try:
+            cambiadas = ejecutar_masivo(self, request, queryset, cambiar_prioridad_lote, 'alta', request.user)
+        except ConflictoConcurrencia:
+            self.message_user(request, '⚠️ Otro usuario modificó algunas denuncias. Vuelve a intentarlo.', messages.ERROR)
+            return
+        if cambiadas is not None:
+            self.message_user(request, f'✅ {len(cambiadas)} denuncias con prioridad alta.', messages.SUCCESS)
+    prioridad_alta.short_description = "Cambiar prioridad a alta"
+    prioridad_alta.allowed_permissions = ('change',)
+    
+    def reasignar_categoria(self, request, queryset):
+        """Mueve las denuncias a la categoría elegida en la barra de acciones"""
+        categoria_id = request.POST.get('categoria', '')
+        categoria = Categoria.objects.filter(pk=categoria_id).first() if categoria_id.isdigit() else None
+        if categoria is None:
+            self.message_user(request, '⚠️ Elige la categoría destino junto a la acción.', messages.WARNING)
+            return
+        movidas = ejecutar_masivo(self, request, queryset, reasignar_categoria_lote, categoria, request.user)
+        if movidas is not None:
+            self.message_user(request, f'✅ {len(movidas)} denuncias movidas a {categoria.nombre}.', messages.SUCCESS)
+    reasignar_categoria.short_description = "Reasignar categoría"
+    reasignar_categoria.allowed_permissions = ('change',)
+    
+    def eliminar_con_vista_previa(self, request, queryset):
+        """Muestra cuánto arrastra el borrado (conteos por tabla) y pide confirmación"""
+        preview = vista_previa_eliminacion(queryset)
+        total = preview[0][1]
+
+        if request.POST.get('confirmar'):
+            eliminadas = ejecutar_masivo(self, request, queryset, eliminar_denuncias_lote, request.user, total=total)
+            if eliminadas is not None:
+                self.message_user(request, f'✅ {eliminadas} denuncias eliminadas.', messages.SUCCESS)
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Confirmar eliminación',
+            'opts': self.model._meta,
+            'preview': preview,
+            'muestra': queryset.select_related(None).only('id', 'titulo')[:20],
+            'total': total,
+            'en_segundo_plano': total > getattr(settings, 'ACCIONES_ASYNC_UMBRAL', 10000),
+            'seleccionadas': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/appProyecto/denuncia/eliminar_vista_previa.html', context)
+    eliminar_con_vista_previa.short_description = "Eliminar con vista previa"
+    eliminar_con_vista_previa.allowed_permissions = ('delete',)
 
 
 # ==============================================================================
@@ -288,14 +503,16 @@ class DenunciaAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(HistorialDenuncia)
-class HistorialDenunciaAdmin(admin.ModelAdmin):
+class HistorialDenunciaAdmin(AuditoriaAdminMixin, TablaGrandeMixin, admin.ModelAdmin):
     """
     Historial de cambios en denuncias
     """
     list_display = ('denuncia', 'usuario', 'tipo_accion_badge', 'cambio_descripcion_corta', 'fecha')
     list_filter = ('tipo_accion', 'fecha')
-    search_fields = ('denuncia__titulo', 'usuario__username', 'cambio_descripcion')
-    date_hierarchy = 'fecha'
+    search_fields = ('cambio_descripcion',)
+    busqueda_relacionada = {'denuncia': 'titulo', 'usuario': 'username'}
+    autocomplete_fields = ('usuario',)
+    raw_id_fields = ('denuncia',)
     readonly_fields = ('fecha',)
     ordering = ('-fecha',)
     
@@ -328,14 +545,15 @@ class HistorialDenunciaAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(LogActividad)
-class LogActividadAdmin(admin.ModelAdmin):
+class LogActividadAdmin(AuditoriaAdminMixin, TablaGrandeMixin, admin.ModelAdmin):
     """
     Registro de actividades del sistema
     """
     list_display = ('usuario', 'accion_corta', 'ip_origen', 'fecha')
     list_filter = ('fecha',)
-    search_fields = ('usuario__username', 'accion', 'ip_origen')
-    date_hierarchy = 'fecha'
+    search_fields = ('accion', 'ip_origen')
+    busqueda_relacionada = {'usuario': 'username'}
+    autocomplete_fields = ('usuario',)
     readonly_fields = ('fecha',)
     ordering = ('-fecha',)
     
@@ -350,14 +568,15 @@ class LogActividadAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(Mensaje)
-class MensajeAdmin(admin.ModelAdmin):
+class MensajeAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Gestión de mensajes entre usuarios
     """
     list_display = ('emisor', 'receptor', 'asunto_corto', 'leido_badge', 'fecha')
     list_filter = ('leido', 'fecha')
+    list_select_related = ('emisor', 'receptor')
     search_fields = ('emisor__username', 'receptor__username', 'asunto', 'contenido')
-    date_hierarchy = 'fecha'
+    autocomplete_fields = ('emisor', 'receptor')
     readonly_fields = ('fecha',)
     ordering = ('-fecha',)
     
@@ -379,14 +598,16 @@ class MensajeAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(Observacion)
-class ObservacionAdmin(admin.ModelAdmin):
+class ObservacionAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Observaciones en denuncias
     """
     list_display = ('titulo_corto', 'usuario', 'fecha_creacion')
     list_filter = ('fecha_creacion',)
+    list_select_related = ('usuario',)
     search_fields = ('titulo', 'descripcion', 'usuario__username')
-    date_hierarchy = 'fecha_creacion'
+    autocomplete_fields = ('usuario', 'categoria')
+    raw_id_fields = ('ubicacion',)
     readonly_fields = ('fecha_creacion',)
     ordering = ('-fecha_creacion',)
     
@@ -401,13 +622,16 @@ class ObservacionAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(Dispositivo)
-class DispositivoAdmin(admin.ModelAdmin):
+class DispositivoAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Dispositivos registrados
     """
     list_display = ('identificador', 'tipo_badge', 'usuario',)
     list_filter = ('tipo',)
+    list_select_related = ('usuario',)
     search_fields = ('identificador', 'usuario__username')
+    autocomplete_fields = ('usuario',)
+    raw_id_fields = ('ultima_ubicacion',)
     
     def tipo_badge(self, obj):
         """Badge para tipo de dispositivo"""
@@ -427,14 +651,15 @@ class DispositivoAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(Reporte)
-class ReporteAdmin(admin.ModelAdmin):
+class ReporteAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Reportes generados
     """
     list_display = ('titulo', 'usuario', 'fecha_creacion')
     list_filter = ('fecha_creacion',)
+    list_select_related = ('usuario',)
     search_fields = ('titulo', 'usuario__username')
-    date_hierarchy = 'fecha_creacion'
+    autocomplete_fields = ('usuario',)
     readonly_fields = ('fecha_creacion',)
     ordering = ('-fecha_creacion',)
 
@@ -444,13 +669,15 @@ class ReporteAdmin(admin.ModelAdmin):
 # ==============================================================================
 
 @admin.register(TokenRecuperacion)
-class TokenRecuperacionAdmin(admin.ModelAdmin):
+class TokenRecuperacionAdmin(TablaGrandeMixin, admin.ModelAdmin):
     """
     Tokens de recuperación de contraseña
     """
     list_display = ('usuario', 'usado_badge', 'fecha_creacion', 'fecha_expiracion', 'estado_token')
     list_filter = ('usado', 'fecha_creacion', 'fecha_expiracion')
+    list_select_related = ('usuario',)
     search_fields = ('usuario__username', 'token')
+    autocomplete_fields = ('usuario',)
     readonly_fields = ('fecha_creacion',)
     ordering = ('-fecha_creacion',)
     
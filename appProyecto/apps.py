@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppproyectoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appProyecto'
+
+    def ready(self):
+        from . import archivo, nomenclator, signals  # noqa: F401
+
+        nomenclator.precargar()
@@ -0,0 +1,169 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.db import connections, router
+from django.db.models import BooleanField, Value, prefetch_related_objects
+from django.utils import timezone
+
+from .basedatos import atomico, reintentar_si_bloqueada
+from .models import Denuncia, DenunciaArchivada, HistorialDenuncia, HistorialDenunciaArchivada
+
+ESTADOS_CERRADOS = ('resuelta', 'rechazada')
+
+# Tabla caliente → tabla de archivo
+PARES = ((Denuncia, DenunciaArchivada), (HistorialDenuncia, HistorialDenunciaArchivada))
+
+
+# ==============================================================================
+# COPIA ENTRE TABLAS CALIENTE Y DE ARCHIVO
+# ==============================================================================
+
+def _ejecutar(modelo, sql, ids):
+    """Ejecuta `sql` en la base donde vive `modelo`; retorna las filas afectadas"""
+    conexion = connections[router.db_for_write(modelo)]
+    with conexion.cursor() as cursor:
+        cursor.execute(sql.format(q=conexion.ops.quote_name, marcadores=', '.join(['%s'] * len(ids))), ids)
+        return cursor.rowcount
+
+
+def _copiar(origen, destino, columnas, campo, ids):
+    """
+    INSERT ... SELECT de `columnas` de las filas con `campo` IN ids. Es una copia fiel
+    (sin auto_now, save() ni señales) y no pasa las filas por Python.
+    """
+    q = connections[router.db_for_write(origen)].ops.quote_name
+    lista = ', '.join(q(columna) for columna in columnas)
+    return _ejecutar(
+        origen,
+        f'INSERT INTO {q(destino._meta.db_table)} ({lista}) '
+        f'SELECT {lista} FROM {q(origen._meta.db_table)} WHERE {q(campo)} IN ({{marcadores}})',
+        ids
+    )
+
+
+def _borrar(modelo, campo, ids):
+    q = connections[router.db_for_write(modelo)].ops.quote_name
+    return _ejecutar(
+        modelo, f'DELETE FROM {q(modelo._meta.db_table)} WHERE {q(campo)} IN ({{marcadores}})', ids
+    )
+
+
+def _columnas(modelo):
+    return [campo.column for campo in modelo._meta.concrete_fields]
+
+
+@reintentar_si_bloqueada
+def _mover_lote(queryset, ids, hacia_archivo):
+    """
+    Denuncias e historial de un lote, en una transacción sobre ambas bases.
+    Vuelve a filtrar con `queryset` ya dentro de ella: una denuncia reabierta
+    desde que se leyó el lote no se archiva.
+    """
+    (caliente, archivo), (historial, historial_archivo) = PARES
+    with atomico():
+        ids = list(queryset.filter(pk__in=ids).select_for_update().values_list('pk', flat=True))
+        if not ids:
+            return 0
+        if hacia_archivo:
+            origen, destino = (caliente, historial), (archivo, historial_archivo)
+        else:
+            origen, destino = (archivo, historial_archivo), (caliente, historial)
+        # Con FK en el motor (auditoría en la principal) el padre se copia
+        # antes que el historial y se borra después
+        _copiar(origen[0], destino[0], _columnas(caliente), 'id', ids)
+        _copiar(origen[1], destino[1], _columnas(historial), 'denuncia_id', ids)
+        _borrar(origen[1], 'denuncia_id', ids)
+        return _borrar(origen[0], 'id', ids)
+
+
+def _por_lotes(queryset, lote, pausa, hacia_archivo):
+    """Recorre `queryset` por pk y mueve cada lote en su propia transacción"""
+    total = 0
+    ultimo_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=ultimo_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += _mover_lote(queryset, ids, hacia_archivo)
+        ultimo_id = ids[-1]
+        if pausa:
+            time.sleep(pausa)
+
+
+def candidatas(meses=None):
+    """Denuncias cerradas sin cambios hace más de `meses` meses"""
+    meses = settings.ARCHIVO_MESES if meses is None else meses
+    corte = timezone.now() - timedelta(days=30 * meses)
+    return Denuncia.objects.filter(estado__in=ESTADOS_CERRADOS, fecha_actualizacion__lt=corte)
+
+
+def archivar(meses=None, lote=1000, pausa=0.0):
+    """Mueve al archivo las denuncias candidatas y su historial. Retorna cuántas movió."""
+    return _por_lotes(candidatas(meses), lote, pausa, hacia_archivo=True)
+
+
+def restaurar(queryset, lote=1000, pausa=0.0):
+    """Devuelve a la tabla caliente las DenunciaArchivada de `queryset` con su historial"""
+    return _por_lotes(queryset, lote, pausa, hacia_archivo=False)
+
+
+# ==============================================================================
+# CONSULTAS CON ARCHIVO (incluir_archivo=1)
+# ==============================================================================
+
+def incluir_archivo(request):
+    return request.GET.get('incluir_archivo') == '1'
+
+
+def contar(incluir, **filtros):
+    """COUNT con los mismos filtros en la tabla caliente y, si se pide, en el archivo"""
+    total = Denuncia.objects.filter(**filtros).count()
+    if incluir:
+        total += DenunciaArchivada.objects.filter(**filtros).count()
+    return total
+
+
+def con_archivo(denuncias, archivadas):
+    """
+    UNION ALL de denuncias vivas y archivadas, como instancias de Denuncia
+    con el atributo `archivada`. Ambos querysets llegan ya filtrados; sobre
+    el resultado solo se puede ordenar, paginar y contar (ver `con_relaciones`).
+    """
+    return (
+        denuncias.select_related(None).order_by()
+        .annotate(archivada=Value(False, output_field=BooleanField()))
+        .union(
+            archivadas.select_related(None).order_by().defer('fecha_archivo')
+            .annotate(archivada=Value(True, output_field=BooleanField())),
+            all=True
+        )
+    )
+
+
+def con_relaciones(filas, *relaciones):
+    """prefetch_related no se admite tras union(): se hace sobre las filas ya leídas"""
+    filas = list(filas)
+    prefetch_related_objects(filas, *relaciones)
+    return filas
+
+
+@checks.register(checks.Tags.models)
+def revisar_columnas_archivo(app_configs, **kwargs):
+    """El archivo debe tener las columnas de la tabla caliente, en el mismo orden"""
+    errores = []
+    for caliente, archivo in PARES:
+        columnas = _columnas(caliente)
+        if _columnas(archivo)[:len(columnas)] != columnas:
+            errores.append(checks.Error(
+                f'{archivo.__name__} no replica las columnas de {caliente.__name__} en el mismo orden',
+                hint='Agrega al modelo de archivo los campos nuevos de la tabla caliente.',
+                obj=archivo,
+                id='appProyecto.E001',
+            ))
+    return errores
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+from .models import Usuario
+
+
+# Campos para AuthenticationMiddleware, los decoradores de rol y el perfil;
+# el resto se carga diferido si se usa. El hash de la contraseña nunca va a
+# la caché (FileBasedCache en disco): solo el HMAC de sesión derivado de él.
+CAMPOS_SNAPSHOT = (
+    'id',
+    'username',
+    'email',
+    'first_name',
+    'last_name',
+    'telefono',
+    'date_joined',
+    'is_superuser',
+    'is_staff',
+    'is_active',
+    'rol',
+    'activo',
+)
+
+
+def clave_usuario(usuario_id):
+    return f'usuario_sesion:v2:{usuario_id}'
+
+
+def invalidar_usuarios(ids):
+    """Descarta el snapshot en caché de los usuarios indicados"""
+    cache.delete_many([clave_usuario(usuario_id) for usuario_id in ids])
+
+
+class UsuarioCacheBackend(ModelBackend):
+    """
+    Backend de autenticación que resuelve request.user desde un snapshot
+    en caché (id, username, rol, activo y permisos) en vez de consultar
+    la tabla usuarios en cada petición autenticada.
+    """
+
+    def get_user(self, user_id):
+        clave = clave_usuario(user_id)
+        snapshot = cache.get(clave)
+
+        if snapshot is None:
+            usuario = super().get_user(user_id)
+            if usuario is None:
+                return None
+            snapshot = {campo: getattr(usuario, campo) for campo in CAMPOS_SNAPSHOT}
+            snapshot['permisos'] = sorted(self.get_all_permissions(usuario))
+            snapshot['hash_sesion'] = usuario.get_session_auth_hash()
+            cache.set(clave, snapshot, getattr(settings, 'USUARIO_CACHE_TTL', 1800))
+        else:
+            usuario = self._desde_snapshot(snapshot)
+
+        if not usuario.activo or not self.user_can_authenticate(usuario):
+            return None
+        return usuario
+
+    def _desde_snapshot(self, snapshot):
+        campos = [f.attname for f in Usuario._meta.concrete_fields if f.attname in snapshot]
+        usuario = Usuario.from_db(
+            router.db_for_read(Usuario),
+            campos,
+            [snapshot[campo] for campo in campos],
+        )
+        usuario._perm_cache = set(snapshot['permisos'])
+        # get_user de django.contrib.auth compara este valor con el de la sesión;
+        # sin el password cargado, el método original lo leería de la base
+        hash_sesion = snapshot['hash_sesion']
+        usuario.get_session_auth_hash = lambda: hash_sesion
+        return usuario
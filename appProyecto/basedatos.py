@@ -0,0 +1,92 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from .enrutador import alias_auditoria
+
+logger = logging.getLogger(__name__)
+
+MENSAJES_BLOQUEO = ('database is locked', 'database table is locked', 'database is busy')
+
+
+# ==============================================================================
+# PERFIL SQLITE (se aplica en connection_created)
+# ==============================================================================
+
+def aplicar_pragmas_sqlite(connection):
+    """
+    WAL (lectores y escritor no se bloquean entre sí), synchronous=NORMAL,
+    busy_timeout, mmap y caché; configurables con SQLITE_PRAGMAS.
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+# ==============================================================================
+# REINTENTOS ANTE "DATABASE IS LOCKED"
+# ==============================================================================
+
+def es_bloqueo(error):
+    return isinstance(error, OperationalError) and any(
+        mensaje in str(error).lower() for mensaje in MENSAJES_BLOQUEO
+    )
+
+
+def reintentar_si_bloqueada(func=None, *, using='default'):
+    """
+    Reintenta la función con backoff exponencial (y jitter) si SQLite
+    responde "database is locked". Solo reintenta en el bloque atómico más
+    externo: dentro de otra transacción el error sube para que la reintente
+    quien la abrió. SQLITE_REINTENTOS=0 desactiva los reintentos.
+    """
+    def decorador(func):
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            intentos = getattr(settings, 'SQLITE_REINTENTOS', 5)
+            espera = getattr(settings, 'SQLITE_REINTENTO_ESPERA', 0.05)
+            for intento in range(intentos + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as error:
+                    if (
+                        not es_bloqueo(error)
+                        or intento == intentos
+                        or connections[using].in_atomic_block
+                    ):
+                        raise
+                    pausa = espera * (2 ** intento) * random.uniform(0.5, 1.5)
+                    logger.warning('BD bloqueada en %s, reintento %s en %.2fs', func.__name__, intento + 1, pausa)
+                    time.sleep(pausa)
+        return envoltura
+
+    return decorador if func is None else decorador(func)
+
+
+# ==============================================================================
+# TRANSACCIONES CON AUDITORÍA
+# ==============================================================================
+
+@contextmanager
+def atomico():
+    """
+    transaction.atomic sobre la base principal y, si es otra, también sobre
+    la de auditoría: un error revierte ambos cambios. No es un commit en dos
+    fases: la principal confirma primero, así que un fallo justo después deja
+    el cambio sin su historial, nunca historial de un cambio revertido.
+    """
+    auditoria = alias_auditoria()
+    if auditoria == DEFAULT_DB_ALIAS:
+        with transaction.atomic():
+            yield
+        return
+    with transaction.atomic(using=auditoria), transaction.atomic():
+        yield
@@ -0,0 +1,331 @@
+"""
+Catálogo local de especies para buscar flora y fauna sin depender de la red.
+
+Se importa (manage.py importar_catalogo) desde un Darwin Core Archive de
+taxonomía: el de iNaturalist (inaturalist-taxonomy.dwca.zip) o el backbone de
+GBIF. Las columnas se leen de meta.xml, así sirve cualquiera de los dos. Quedan
+las tablas Taxon y NombreTaxon (nombres comunes en español y científicos,
+normalizados sin tildes e indexados).
+
+La búsqueda combina:
+- prefijo sobre NombreTaxon.normalizado, como rango en el índice de la tabla;
+- nombres y palabras exactas, y trigramas para errores de tipeo, en un índice
+  en memoria por proceso que se recarga cuando se importa un catálogo nuevo.
+La API de iNaturalist solo se usa para completar las fotos en segundo plano.
+"""
+import csv
+import io
+import logging
+import os
+import threading
+import zipfile
+from collections import Counter
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .inaturalist import enriquecer_fotos
+from .models import NombreTaxon, Taxon
+from .nomenclator import normalizar, trigramas_de
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'catalogo:version'
+SIMILITUD_MINIMA = 0.6
+MAX_CANDIDATOS = 600
+FOTOS_REVISAR_CADA = timedelta(days=30)
+GRUPO_DE_REINO = {'plantae': 'flora', 'animalia': 'fauna'}
+RANGOS_ESPECIE = ('species', 'subspecies', 'variety', 'form', 'hybrid')
+IDIOMAS_ESPANOL = frozenset(('es', 'spa', 'spanish', 'español', 'espanol'))
+
+
+# ==============================================================================
+# LECTURA DE UN DARWIN CORE ARCHIVE
+# ==============================================================================
+
+TERMINOS = {
+    'http://rs.tdwg.org/dwc/terms/taxonID': 'taxon_id',
+    'http://rs.tdwg.org/dwc/terms/scientificName': 'nombre_cientifico',
+    'http://rs.tdwg.org/dwc/terms/taxonRank': 'rango',
+    'http://rs.tdwg.org/dwc/terms/kingdom': 'reino',
+    'http://rs.tdwg.org/dwc/terms/class': 'clase',
+    'http://rs.tdwg.org/dwc/terms/taxonomicStatus': 'estado',
+    'http://rs.tdwg.org/dwc/terms/vernacularName': 'nombre',
+    'http://purl.org/dc/terms/language': 'idioma',
+    'http://rs.tdwg.org/dwc/terms/language': 'idioma',
+}
+VERNACULAR = 'http://rs.gbif.org/terms/1.0/VernacularName'
+
+
+class ArchivoDwca:
+    """Un .zip o una carpeta con meta.xml: la tabla de taxones y las de nombres comunes"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.zip = zipfile.ZipFile(ruta) if zipfile.is_zipfile(ruta) else None
+        with self._abrir('meta.xml') as archivo:
+            raiz = ElementTree.parse(archivo).getroot()
+        self.core = None
+        self.vernaculares = []  # iNaturalist trae una extensión por idioma
+        for elemento in raiz:
+            etiqueta = elemento.tag.rsplit('}', 1)[-1]
+            if etiqueta == 'core':
+                self.core = elemento
+            elif etiqueta == 'extension' and elemento.get('rowType') == VERNACULAR:
+                self.vernaculares.append(elemento)
+        espanol = [e for e in self.vernaculares if 'spanish' in self._ubicacion(e).lower()]
+        if espanol:
+            self.vernaculares = espanol
+
+    def _abrir(self, nombre):
+        if self.zip is not None:
+            return self.zip.open(nombre)
+        return open(os.path.join(self.ruta, nombre), 'rb')
+
+    @staticmethod
+    def _ubicacion(elemento):
+        return next(e for e in elemento.iter() if e.tag.endswith('location')).text.strip()
+
+    def filas(self, elemento):
+        """Filas de la tabla (core o extensión) como {campo: valor}, con 'id' del taxón"""
+        hijos = {hijo.tag.rsplit('}', 1)[-1]: hijo for hijo in elemento}
+        ubicacion = self._ubicacion(elemento)
+        columnas = {}
+        for hijo in elemento:
+            campo = TERMINOS.get(hijo.get('term'))
+            if campo and hijo.get('index') is not None:
+                columnas[campo] = int(hijo.get('index'))
+        id_elemento = hijos.get('id') if elemento is self.core else hijos.get('coreid')
+        columnas['id'] = int(id_elemento.get('index'))
+
+        separador = elemento.get('fieldsTerminatedBy', ',').encode().decode('unicode_escape')
+        comillas = elemento.get('fieldsEnclosedBy', '"')
+        saltar = int(elemento.get('ignoreHeaderLines', '0'))
+        with self._abrir(ubicacion) as binario:
+            texto = io.TextIOWrapper(binario, encoding=elemento.get('encoding', 'utf-8'), newline='')
+            lector = csv.reader(
+                texto, delimiter=separador,
+                quotechar=comillas or None, quoting=csv.QUOTE_MINIMAL if comillas else csv.QUOTE_NONE,
+            )
+            for numero, valores in enumerate(lector):
+                if numero < saltar:
+                    continue
+                yield {
+                    campo: valores[indice] if indice < len(valores) else ''
+                    for campo, indice in columnas.items()
+                }
+
+
+def leer_catalogo(ruta, rangos=RANGOS_ESPECIE, solo_con_nombre=True):
+    """
+    {taxon_id: dict} de Plantae y Animalia aceptados en los rangos pedidos,
+    cada uno con sus nombres en español. Con `solo_con_nombre` se omiten los
+    taxones sin nombre común en español.
+    """
+    archivo = ArchivoDwca(ruta)
+    if archivo.core is None:
+        raise ValueError('meta.xml no declara la tabla core')
+    nombres = {}
+    for fila in (fila for extension in archivo.vernaculares for fila in archivo.filas(extension)):
+        if fila.get('idioma', '').strip().lower() in IDIOMAS_ESPANOL and fila.get('nombre'):
+            lista = nombres.setdefault(fila['id'], [])
+            if fila['nombre'] not in lista:
+                lista.append(fila['nombre'].strip())
+
+    taxones = {}
+    for fila in archivo.filas(archivo.core):
+        grupo = GRUPO_DE_REINO.get(fila.get('reino', '').lower())
+        if grupo is None or fila.get('rango', '').lower() not in rangos:
+            continue
+        if fila.get('estado', 'accepted').lower() not in ('', 'accepted', 'active'):
+            continue
+        if solo_con_nombre and fila['id'] not in nombres:
+            continue
+        try:
+            taxon_id = int(fila['id'])
+        except ValueError:
+            continue
+        taxones[taxon_id] = {
+            'nombre_cientifico': fila['nombre_cientifico'][:255],
+            'rango': fila['rango'].lower()[:30],
+            'grupo': grupo,
+            'clase': fila.get('clase', '')[:100],
+            'nombres': nombres.get(fila['id'], []),
+        }
+    return taxones
+
+
+# ==============================================================================
+# ÍNDICE EN MEMORIA
+# ==============================================================================
+
+class IndiceNombres:
+    """Nombres completos y sus palabras → taxones, con índice de trigramas"""
+
+    def __init__(self, filas):
+        """`filas`: iterable de (taxon_id, normalizado)"""
+        self.taxones = set()
+        self.claves = []      # nombres y palabras distintas
+        self.por_clave = {}   # clave → índice
+        self.taxones_de = []  # por clave: set de (taxon_id, es_palabra)
+        self.trigramas = {}
+        self.tamanos = []
+        for taxon_id, normalizado in filas:
+            self.taxones.add(taxon_id)
+            self._agregar(normalizado, taxon_id, False)
+            palabras = normalizado.split()
+            if len(palabras) > 1:
+                for palabra in palabras:
+                    if len(palabra) >= 3:
+                        self._agregar(palabra, taxon_id, True)
+
+    def _agregar(self, clave, taxon_id, es_palabra):
+        indice = self.por_clave.get(clave)
+        if indice is None:
+            indice = self.por_clave[clave] = len(self.claves)
+            self.claves.append(clave)
+            self.taxones_de.append(set())
+            trigramas = trigramas_de(clave)
+            self.tamanos.append(len(trigramas))
+            for trigrama in trigramas:
+                self.trigramas.setdefault(trigrama, []).append(indice)
+        self.taxones_de[indice].add((taxon_id, es_palabra))
+
+    def puntajes(self, consulta):
+        """{taxon_id: puntaje} por coincidencia exacta (nombre o palabra) y por trigramas"""
+        puntajes = {}
+
+        def sumar(indice, puntaje):
+            for taxon_id, es_palabra in self.taxones_de[indice]:
+                valor = puntaje * (0.95 if es_palabra else 1.0)
+                if valor > puntajes.get(taxon_id, 0):
+                    puntajes[taxon_id] = valor
+
+        exacta = self.por_clave.get(consulta)
+        if exacta is not None:
+            sumar(exacta, 1.0)
+        trigramas = trigramas_de(consulta)
+        comunes = Counter()
+        for trigrama in trigramas:
+            comunes.update(self.trigramas.get(trigrama, ()))
+        minimo = SIMILITUD_MINIMA * len(trigramas) / 2
+        for indice, n in comunes.most_common():
+            if n < minimo:
+                break
+            similitud = 2 * n / (len(trigramas) + self.tamanos[indice])
+            if similitud >= SIMILITUD_MINIMA and indice != exacta:
+                sumar(indice, 0.85 * similitud)
+        return puntajes
+
+
+_indice = None
+_version = None
+_cargado = False
+_lock = threading.Lock()
+
+
+def indice():
+    """Índice del proceso; None si el catálogo está vacío. Se recarga tras importar."""
+    global _indice, _version, _cargado
+    version = cache.get(CLAVE_VERSION)
+    if not _cargado or version != _version:
+        with _lock:
+            if not _cargado or version != _version:
+                filas = NombreTaxon.objects.values_list('taxon_id', 'normalizado').iterator(chunk_size=10000)
+                nuevo = IndiceNombres(filas)
+                _indice = nuevo if nuevo.claves else None
+                _version, _cargado = version, True
+                if _indice is not None:
+                    logger.info('Catálogo de especies cargado: %s taxones, %s claves', len(nuevo.taxones), len(nuevo.claves))
+    return _indice
+
+
+def publicar_version():
+    """Tras importar: cada proceso recarga su índice en la próxima búsqueda"""
+    cache.set(CLAVE_VERSION, timezone.now().isoformat(), None)
+
+
+# ==============================================================================
+# BÚSQUEDA
+# ==============================================================================
+
+def _item(taxon):
+    """Taxon → diccionario que muestra pagina3.html (mismo formato que iNaturalist)"""
+    return {
+        'nombre_comun': taxon.nombre_comun or 'Sin nombre común',
+        'nombre_cientifico': taxon.nombre_cientifico,
+        'descripcion': '',
+        'imagen': taxon.foto_url or None,
+        'tipo': taxon.clase,
+        'ciclo': '',
+        'nombre': taxon.nombre_comun or taxon.nombre_cientifico,
+        'habitat': '',
+        'dieta': '',
+        'poblacion': '',
+        'ubicaciones': '',
+    }
+
+
+# Caracteres de un nombre normalizado, en el orden de la intercalación
+# binaria y también de las _ai_ci de MySQL (espacio, dígitos, letras)
+ALFABETO = ' 0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def sucesor(prefijo):
+    """
+    Menor texto mayor que todos los que empiezan con `prefijo` (None si no
+    hay): `prefijo + '~'` no sirve, '~' va antes de las letras en utf8mb4_0900_ai_ci.
+    """
+    while prefijo:
+        posicion = ALFABETO.find(prefijo[-1])
+        if 0 <= posicion < len(ALFABETO) - 1:
+            return prefijo[:-1] + ALFABETO[posicion + 1]
+        prefijo = prefijo[:-1]
+    return None
+
+
+def buscar(texto, pagina=1, por_pagina=30):
+    """
+    (flora, fauna) del catálogo local para una página, o None si no hay
+    catálogo importado. Las fotos faltantes se piden a iNaturalist sin esperar.
+    """
+    actual = indice()
+    if actual is None:
+        return None
+    consulta = normalizar(texto)
+    if not consulta:
+        return [], []
+
+    puntajes = actual.puntajes(consulta)
+    # Prefijo como rango del índice (startswith es un LIKE que SQLite no indexa)
+    por_prefijo = NombreTaxon.objects.filter(normalizado__gte=consulta)
+    tope = sucesor(consulta)
+    if tope is not None:
+        por_prefijo = por_prefijo.filter(normalizado__lt=tope)
+    por_prefijo = por_prefijo.values_list('taxon_id', flat=True)[:MAX_CANDIDATOS]
+    for taxon_id in por_prefijo:
+        puntajes[taxon_id] = max(puntajes.get(taxon_id, 0), 0.9)
+
+    orden = sorted(puntajes, key=lambda taxon_id: -puntajes[taxon_id])[:MAX_CANDIDATOS]
+    taxones = Taxon.objects.in_bulk(orden)
+    # Ante igual puntaje: especies antes que otros rangos y con nombre común antes
+    orden.sort(key=lambda taxon_id: (
+        -round(puntajes[taxon_id], 3),
+        taxones[taxon_id].rango not in RANGOS_ESPECIE if taxon_id in taxones else True,
+        not taxones[taxon_id].nombre_comun if taxon_id in taxones else True,
+    ))
+    desde = (pagina - 1) * por_pagina
+    flora = [taxones[t] for t in orden if t in taxones and taxones[t].grupo == 'flora'][desde:desde + por_pagina]
+    fauna = [taxones[t] for t in orden if t in taxones and taxones[t].grupo == 'fauna'][desde:desde + por_pagina]
+
+    limite = timezone.now() - FOTOS_REVISAR_CADA
+    sin_foto = [
+        taxon.pk for taxon in flora + fauna
+        if not taxon.foto_url and taxon.fuente == 'inaturalist'
+        and (taxon.foto_revisada is None or taxon.foto_revisada < limite)
+    ]
+    if sin_foto:
+        enriquecer_fotos(sin_foto)
+    return [_item(taxon) for taxon in flora], [_item(taxon) for taxon in fauna]
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .basedatos import atomico, reintentar_si_bloqueada
+from .models import Denuncia, HistorialDenuncia
+
+
+ESTADOS_EN_COLA = ('pendiente', 'en_proceso')
+
+ORDEN_PRIORIDAD = Case(
+    When(prioridad='alta', then=Value(0)),
+    When(prioridad='media', then=Value(1)),
+    default=Value(2),
+    output_field=IntegerField(),
+)
+
+
+def duracion_reclamo():
+    return timedelta(minutes=getattr(settings, 'COLA_RECLAMO_MINUTOS', 30))
+
+
+def disponibles(ahora=None):
+    """Denuncias abiertas sin revisor o con el reclamo vencido"""
+    ahora = ahora or timezone.now()
+    return Denuncia.objects.filter(estado__in=ESTADOS_EN_COLA).filter(
+        Q(asignado_a__isnull=True) | Q(asignacion_expira__lte=ahora)
+    )
+
+
+def en_orden(queryset):
+    """Prioridad alta primero y, dentro de cada prioridad, las más antiguas"""
+    return queryset.annotate(orden_prioridad=ORDEN_PRIORIDAD).order_by('orden_prioridad', 'fecha_creacion')
+
+
+def reclamadas_por(revisor, ahora=None):
+    ahora = ahora or timezone.now()
+    return Denuncia.objects.filter(asignado_a=revisor, asignacion_expira__gt=ahora)
+
+
+@reintentar_si_bloqueada
+def reclamar_siguientes(revisor, cantidad=10):
+    """
+    Asigna al revisor las `cantidad` siguientes denuncias de la cola.
+    MySQL: SELECT ... FOR UPDATE SKIP LOCKED, así varios revisores reclaman
+    en paralelo sin esperar ni duplicar. SQLite: un solo UPDATE con subconsulta,
+    atómico porque la base admite un único escritor.
+    Retorna los ids reclamados.
+    """
+    ahora = timezone.now()
+    expira = ahora + duracion_reclamo()
+    candidatas = en_orden(disponibles(ahora))
+
+    with atomico():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(
+                candidatas.select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:cantidad]
+            )
+            Denuncia.objects.filter(pk__in=ids).update(asignado_a=revisor, asignacion_expira=expira)
+        else:
+            Denuncia.objects.filter(
+                pk__in=candidatas.values('pk')[:cantidad]
+            ).update(asignado_a=revisor, asignacion_expira=expira)
+            ids = list(
+                Denuncia.objects.filter(asignado_a=revisor, asignacion_expira=expira)
+                .values_list('id', flat=True)
+            )
+
+        HistorialDenuncia.objects.bulk_create([
+            HistorialDenuncia(
+                denuncia_id=denuncia_id,
+                usuario=revisor,
+                tipo_accion='asignacion',
+                cambio_descripcion=f'Reclamada por {revisor.username} hasta {timezone.localtime(expira):%H:%M}'
+            )
+            for denuncia_id in ids
+        ])
+
+    return ids
+
+
+def renovar(revisor, ids):
+    """Extiende el reclamo vigente de las denuncias indicadas"""
+    return reclamadas_por(revisor).filter(pk__in=ids).update(
+        asignacion_expira=timezone.now() + duracion_reclamo()
+    )
+
+
+@reintentar_si_bloqueada
+def liberar(revisor, ids):
+    """Devuelve a la cola denuncias reclamadas por el revisor"""
+    with atomico():
+        liberadas = list(
+            Denuncia.objects.filter(asignado_a=revisor, pk__in=ids).values_list('id', flat=True)
+        )
+        Denuncia.objects.filter(pk__in=liberadas).update(asignado_a=None, asignacion_expira=None)
+        HistorialDenuncia.objects.bulk_create([
+            HistorialDenuncia(
+                denuncia_id=denuncia_id,
+                usuario=revisor,
+                tipo_accion='asignacion',
+                cambio_descripcion=f'Liberada por {revisor.username}'
+            )
+            for denuncia_id in liberadas
+        ])
+    return liberadas
+
+
+def reencolar_vencidas():
+    """Limpia los reclamos vencidos (la cola ya los trata como libres)"""
+    return Denuncia.objects.filter(
+        asignado_a__isnull=False,
+        asignacion_expira__lte=timezone.now(),
+    ).update(asignado_a=None, asignacion_expira=None)
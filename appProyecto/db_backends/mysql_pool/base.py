@@ -0,0 +1,77 @@
+"""
+Backend MySQL con pool de conexiones por proceso.
+
+ENGINE = 'appProyecto.db_backends.mysql_pool' y, opcionalmente, la clave
+POOL del alias: {'TAMANO': 10, 'MAX_VIDA': 1800, 'PING_TRAS': 30, 'ESPERA': 5}.
+Con CONN_MAX_AGE = 0 Django "cierra" la conexión al terminar cada petición:
+aquí eso la devuelve al pool en vez de cerrar el socket.
+"""
+import os
+import threading
+
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from .pool import PoolConexiones
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def pool_de(alias, opciones=None):
+    """
+    Pool del alias en este proceso. La clave incluye el pid: tras el fork de
+    gunicorn cada worker arma el suyo y nunca usa sockets del proceso padre.
+    """
+    clave = (os.getpid(), alias)
+    pool = _pools.get(clave)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(clave)
+            if pool is None:
+                opciones = opciones or {}
+                pool = _pools[clave] = PoolConexiones(
+                    tamano=opciones.get('TAMANO', 10),
+                    max_vida=opciones.get('MAX_VIDA', 1800),
+                    ping_tras=opciones.get('PING_TRAS', 30),
+                    espera=opciones.get('ESPERA', 5.0),
+                )
+    return pool
+
+
+def metricas_pools():
+    """{alias: estado del pool} de este proceso"""
+    pid = os.getpid()
+    return {alias: pool.estado() for (dueno, alias), pool in list(_pools.items()) if dueno == pid}
+
+
+class DatabaseWrapper(MySQLDatabaseWrapper):
+    conexion_reutilizada = False
+
+    @property
+    def pool(self):
+        return pool_de(self.alias, self.settings_dict.get('POOL'))
+
+    def get_new_connection(self, conn_params):
+        conexion, nueva = self.pool.obtener(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        self.conexion_reutilizada = not nueva
+        return conexion
+
+    def init_connection_state(self):
+        # Las variables de sesión (SQL_AUTO_IS_NULL, aislamiento) siguen fijadas
+        # desde que se abrió: no repetir el SET en cada préstamo
+        if not self.conexion_reutilizada:
+            super().init_connection_state()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Cerrada a mitad de un bloque atómico: el estado de la sesión no es fiable
+        reutilizable = not self.in_atomic_block
+        if reutilizable and not self.autocommit:
+            try:
+                self.connection.rollback()
+            except Exception:
+                reutilizable = False
+        self.pool.devolver(self.connection, reutilizable=reutilizable)
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.db import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAgotado(OperationalError):
+    """Todas las conexiones del pool están prestadas y se agotó la espera"""
+
+
+class PoolConexiones:
+    """
+    Pool acotado de conexiones abiertas de un proceso (compartido por sus hilos).
+    - Reutiliza la conexión devuelta más recientemente (LIFO): las demás
+      envejecen y se reciclan antes.
+    - Ping antes de prestar una conexión que lleva más de `ping_tras` segundos
+      ociosa; si falla se descarta y se toma otra.
+    - Recicla las conexiones con más de `max_vida` segundos (antes de que el
+      servidor las corte por wait_timeout).
+    - Sin cupo, espera hasta `espera` segundos y luego lanza PoolAgotado.
+    """
+
+    def __init__(self, tamano=10, max_vida=1800, ping_tras=30, espera=5.0):
+        self.tamano = tamano
+        self.max_vida = max_vida
+        self.ping_tras = ping_tras
+        self.espera = espera
+
+        self._cond = threading.Condition()
+        self._libres = deque()   # (conexion, devuelta_en)
+        self._creadas = {}       # id(conexion) → creada_en
+        self._prestadas = 0
+        self._abriendo = 0       # cupos reservados con la conexión aún abriéndose
+        self.metricas = Counter()
+
+    # --------------------------------------------------------------------------
+    # Préstamo y devolución
+    # --------------------------------------------------------------------------
+
+    def obtener(self, crear):
+        """
+        (conexion, nueva): una libre que responde, o una nueva abierta con
+        `crear()` si hay cupo
+        """
+        while True:
+            conexion, devuelta_en = self._reservar()
+            if conexion is None:
+                return self._abrir(crear), True
+            if time.monotonic() - devuelta_en > self.ping_tras and not self._responde(conexion):
+                self._descartar(conexion, motivo='descartadas_ping')
+                continue
+            return conexion, False
+
+    def devolver(self, conexion, reutilizable=True):
+        """Devuelve la conexión; si no es reutilizable o está vencida, la cierra"""
+        with self._cond:
+            vencida = self._vencida(conexion)
+            if reutilizable and not vencida:
+                self._prestadas -= 1
+                self._libres.append((conexion, time.monotonic()))
+                self._cond.notify()
+                return
+        self._descartar(conexion, motivo='recicladas_vida' if vencida else 'descartadas_sucias')
+
+    def cerrar_todas(self):
+        with self._cond:
+            libres = [conexion for conexion, _ in self._libres]
+            self._libres.clear()
+        for conexion in libres:
+            self._descartar(conexion, prestada=False)
+
+    def estado(self):
+        """Instantánea para métricas: ocupación actual y contadores acumulados"""
+        with self._cond:
+            return {
+                'tamano': self.tamano,
+                'abiertas': len(self._creadas),
+                'libres': len(self._libres),
+                'prestadas': self._prestadas,
+                **self.metricas,
+            }
+
+    # --------------------------------------------------------------------------
+    # Internos
+    # --------------------------------------------------------------------------
+
+    def _reservar(self):
+        """
+        (conexion, devuelta_en) de una libre, o (None, None) si se reservó cupo
+        para abrir una nueva. Espera si no hay ninguna de las dos.
+        """
+        limite = time.monotonic() + self.espera
+        esperando = False
+        with self._cond:
+            while True:
+                while self._libres:
+                    conexion, devuelta_en = self._libres.pop()
+                    if self._vencida(conexion):
+                        self.metricas['recicladas_vida'] += 1
+                        self._olvidar(conexion)
+                        self._cerrar(conexion)
+                        continue
+                    self._prestar()
+                    self.metricas['reutilizadas'] += 1
+                    return conexion, devuelta_en
+
+                if len(self._creadas) + self._abriendo < self.tamano:
+                    self._abriendo += 1
+                    self._prestar()
+                    return None, None
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self.metricas['agotado'] += 1
+                    logger.warning('Pool MySQL agotado: %s conexiones prestadas', self._prestadas)
+                    raise PoolAgotado(
+                        f'Sin conexiones libres en el pool tras {self.espera}s '
+                        f'({self._prestadas}/{self.tamano} prestadas)'
+                    )
+                if not esperando:
+                    esperando = True
+                    self.metricas['esperas'] += 1
+                self._cond.wait(restante)
+
+    def _abrir(self, crear):
+        inicio = time.monotonic()
+        try:
+            conexion = crear()
+        except Exception:
+            with self._cond:
+                self._abriendo -= 1
+                self._prestadas -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._abriendo -= 1
+            self.metricas['creadas'] += 1
+            self.metricas['ms_apertura'] += round((time.monotonic() - inicio) * 1000)
+            self._creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    def _prestar(self):
+        self._prestadas += 1
+        if self._prestadas > self.metricas['max_prestadas']:
+            self.metricas['max_prestadas'] = self._prestadas
+
+    def _vencida(self, conexion):
+        creada_en = self._creadas.get(id(conexion))
+        return creada_en is None or time.monotonic() - creada_en > self.max_vida
+
+    def _responde(self, conexion):
+        try:
+            conexion.ping()
+        except Exception:
+            return False
+        return True
+
+    def _descartar(self, conexion, prestada=True, motivo=None):
+        with self._cond:
+            if prestada:
+                self._prestadas -= 1
+            if motivo:
+                self.metricas[motivo] += 1
+            self._olvidar(conexion)
+            self._cond.notify()
+        self._cerrar(conexion)
+
+    def _olvidar(self, conexion):
+        self._creadas.pop(id(conexion), None)
+
+    def _cerrar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
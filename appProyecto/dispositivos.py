@@ -0,0 +1,251 @@
+"""
+Dispositivo más cercano (cámara, sensor, estación) a cada denuncia.
+
+Índice en memoria por proceso sobre `ultima_ubicacion` de los dispositivos:
+- los puntos se pasan a la esfera unitaria (x, y, z), donde la distancia
+  recta crece con la distancia sobre la Tierra, y van a un árbol k-d
+  estático con hojas de HOJA puntos;
+- cuando un dispositivo se mueve, su posición vieja se marca como borrada
+  y la nueva va a una lista aparte que se recorre por fuerza bruta; con
+  muchos cambios pendientes el árbol se reconstruye entero.
+Las señales de Dispositivo marcan una versión en caché; cada proceso la
+compara antes de consultar y relee solo los dispositivos sincronizados
+desde la última lectura. Las bajas (y cada INDICE_TTL) reconstruyen.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Dispositivo
+
+logger = logging.getLogger(__name__)
+
+RADIO_TIERRA = 6_371_000.0
+HOJA = 16
+CLAVE_VERSION = 'dispositivos:version'
+CLAVE_BAJAS = 'dispositivos:bajas'
+
+
+def esfera(latitudes, longitudes):
+    """Coordenadas (n, 3) sobre la esfera unitaria"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def cuerda2(metros):
+    """Cuadrado de la distancia recta en la esfera unitaria para un arco en metros"""
+    return (2 * math.sin(min(metros / RADIO_TIERRA, math.pi) / 2)) ** 2
+
+
+def metros(cuerda2_):
+    return 2 * RADIO_TIERRA * np.arcsin(np.minimum(np.sqrt(cuerda2_) / 2, 1.0))
+
+
+# ==============================================================================
+# ÁRBOL K-D
+# ==============================================================================
+
+class ArbolKD:
+    """Árbol k-d en arreglos: cada nodo es un tramo [inicio, fin) de los puntos reordenados"""
+
+    def __init__(self, puntos):
+        n = len(puntos)
+        orden = np.arange(n)
+        self.inicio, self.fin, self.eje, self.corte, self.hijos = [], [], [], [], []
+        pendientes = [(0, n, None)]
+        while pendientes:
+            inicio, fin, padre = pendientes.pop()
+            nodo = len(self.inicio)
+            if padre is not None:
+                self.hijos[padre[0]][padre[1]] = nodo
+            self.inicio.append(inicio)
+            self.fin.append(fin)
+            self.hijos.append([-1, -1])
+            if fin - inicio <= HOJA:
+                self.eje.append(-1)
+                self.corte.append(0.0)
+                continue
+            tramo = puntos[orden[inicio:fin]]
+            eje = int(np.argmax(tramo.max(axis=0) - tramo.min(axis=0)))
+            mitad = (fin - inicio) // 2
+            particion = np.argpartition(tramo[:, eje], mitad)
+            orden[inicio:fin] = orden[inicio:fin][particion]
+            self.eje.append(eje)
+            self.corte.append(float(puntos[orden[inicio + mitad], eje]))
+            pendientes.append((inicio, inicio + mitad, (nodo, 0)))
+            pendientes.append((inicio + mitad, fin, (nodo, 1)))
+        self.orden = orden
+        self.puntos = puntos[orden]
+
+    def vecinos(self, punto, k, limite, vigentes=None):
+        """[(distancia², posición)] de los k puntos más cercanos con distancia² ≤ limite"""
+        mejores = []  # montículo de (-distancia², posición)
+        pila = [(0, 0.0)]
+        while pila:
+            nodo, cota = pila.pop()
+            if cota > limite:
+                continue
+            eje = self.eje[nodo]
+            if eje < 0:
+                inicio, fin = self.inicio[nodo], self.fin[nodo]
+                d2 = ((self.puntos[inicio:fin] - punto) ** 2).sum(axis=1)
+                if vigentes is not None:
+                    d2[~vigentes[inicio:fin]] = np.inf
+                for i in np.flatnonzero(d2 <= limite):
+                    heapq.heappush(mejores, (-d2[i], inicio + i))
+                    if len(mejores) > k:
+                        heapq.heappop(mejores)
+                if len(mejores) == k:
+                    limite = -mejores[0][0]
+                continue
+            diferencia = punto[eje] - self.corte[nodo]
+            cerca, lejos = self.hijos[nodo] if diferencia < 0 else self.hijos[nodo][::-1]
+            pila.append((lejos, max(cota, diferencia * diferencia)))
+            pila.append((cerca, cota))
+        return sorted((-d2, posicion) for d2, posicion in mejores)
+
+
+# ==============================================================================
+# ÍNDICE DE DISPOSITIVOS
+# ==============================================================================
+
+class IndiceDispositivos:
+
+    def __init__(self):
+        self.version, self.bajas = self._versiones()
+        self._reconstruir()
+
+    @staticmethod
+    def _versiones():
+        valores = cache.get_many([CLAVE_VERSION, CLAVE_BAJAS])
+        return valores.get(CLAVE_VERSION), valores.get(CLAVE_BAJAS)
+
+    def _reconstruir(self):
+        self.desde = timezone.now()
+        filas = list(
+            Dispositivo.objects.filter(ultima_ubicacion__isnull=False)
+            .values_list('pk', 'ultima_ubicacion__latitud', 'ultima_ubicacion__longitud')
+        )
+        self.ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+        puntos = esfera([fila[1] for fila in filas], [fila[2] for fila in filas]) if filas else np.empty((0, 3))
+        self.arbol = ArbolKD(puntos)
+        self.ids = self.ids[self.arbol.orden]
+        self.posicion = {int(pk): i for i, pk in enumerate(self.ids)}
+        self.vigentes = np.ones(len(self.ids), dtype=bool)
+        self.extra = {}   # dispositivo_id → punto, movidos desde la construcción
+        self._extra_arreglos = None
+        self.construido_en = time.monotonic()
+
+    def _aplicar_cambios(self):
+        """Relee los dispositivos sincronizados desde la última lectura"""
+        desde, self.desde = self.desde, timezone.now()
+        cambios = (
+            Dispositivo.objects.filter(fecha_sincronizacion__gte=desde - timedelta(seconds=1))
+            .values_list('pk', 'ultima_ubicacion__latitud', 'ultima_ubicacion__longitud')
+        )
+        for pk, latitud, longitud in cambios:
+            posicion = self.posicion.get(pk)
+            if posicion is not None:
+                self.vigentes[posicion] = False
+            if latitud is None:
+                self.extra.pop(pk, None)
+            else:
+                self.extra[pk] = esfera([latitud], [longitud])[0]
+        self._extra_arreglos = None
+
+    def refrescar(self):
+        version, bajas = self._versiones()
+        vencido = time.monotonic() - self.construido_en > settings.DISPOSITIVOS_INDICE_TTL
+        if bajas != self.bajas or vencido:
+            self._reconstruir()
+        elif version != self.version:
+            self._aplicar_cambios()
+            if len(self.extra) > max(64, len(self.ids) // 8):
+                self._reconstruir()
+        self.version, self.bajas = version, bajas
+
+    def _extra(self):
+        if self._extra_arreglos is None:
+            ids = np.fromiter(self.extra.keys(), dtype=np.int64, count=len(self.extra))
+            puntos = np.array(list(self.extra.values())) if self.extra else np.empty((0, 3))
+            self._extra_arreglos = (ids, puntos)
+        return self._extra_arreglos
+
+    def cercanos(self, latitud, longitud, k=1, max_metros=None):
+        """[(dispositivo_id, metros)] de los k más cercanos, del más cercano al más lejano"""
+        punto = esfera([float(latitud)], [float(longitud)])[0]
+        limite = cuerda2(max_metros) if max_metros is not None else 4.0
+        resultados = [
+            (d2, int(self.ids[posicion]))
+            for d2, posicion in self.arbol.vecinos(punto, k, limite, self.vigentes)
+        ]
+        ids, puntos = self._extra()
+        if len(ids):
+            d2 = ((puntos - punto) ** 2).sum(axis=1)
+            resultados += [(d2[i], int(ids[i])) for i in np.flatnonzero(d2 <= limite)]
+        resultados.sort()
+        return [(pk, round(float(metros(d2)), 1)) for d2, pk in resultados[:k]]
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def indice():
+    """Índice del proceso, al día con los cambios publicados en caché"""
+    global _indice
+    with _lock:
+        if _indice is None:
+            _indice = IndiceDispositivos()
+            logger.info('Índice de dispositivos construido: %s', len(_indice.ids))
+        else:
+            _indice.refrescar()
+        return _indice
+
+
+def publicar_cambio(baja=False):
+    """Avisa a todos los procesos que un dispositivo se movió (o se borró)"""
+    cache.set(CLAVE_BAJAS if baja else CLAVE_VERSION, time.time_ns(), None)
+
+
+def cercanos(latitud, longitud, k=None, max_metros=None):
+    """[(Dispositivo, metros)] más cercanos a la coordenada (k y tope según settings)"""
+    k = k or settings.DISPOSITIVOS_CERCANOS
+    if max_metros is None:
+        max_metros = settings.DISPOSITIVOS_DISTANCIA_MAXIMA
+    encontrados = indice().cercanos(latitud, longitud, k, max_metros)
+    dispositivos = Dispositivo.objects.in_bulk([pk for pk, _ in encontrados])
+    return [(dispositivos[pk], distancia) for pk, distancia in encontrados if pk in dispositivos]
+
+
+def anotar(denuncias, max_metros=None):
+    """
+    Agrega `dispositivo_cercano` y `distancia_dispositivo` a cada denuncia de
+    la lista (None si no tiene ubicación o no hay ninguno dentro del tope).
+    Los dispositivos se leen con una sola consulta.
+    """
+    if max_metros is None:
+        max_metros = settings.DISPOSITIVOS_DISTANCIA_MAXIMA
+    actual = indice()
+    encontrados = {}
+    for denuncia in denuncias:
+        ubicacion = denuncia.ubicacion
+        if ubicacion is not None:
+            cercano = actual.cercanos(ubicacion.latitud, ubicacion.longitud, 1, max_metros)
+            if cercano:
+                encontrados[denuncia.pk] = cercano[0]
+    dispositivos = Dispositivo.objects.in_bulk({pk for pk, _ in encontrados.values()})
+    for denuncia in denuncias:
+        pk, distancia = encontrados.get(denuncia.pk, (None, None))
+        denuncia.dispositivo_cercano = dispositivos.get(pk)
+        denuncia.distancia_dispositivo = distancia if denuncia.dispositivo_cercano else None
+    return denuncias
@@ -0,0 +1,129 @@
+"""
+Altitud de una coordenada desde un modelo digital de elevación local.
+
+ELEVACION_RASTER es una grilla cruda (p. ej. `gdal_translate -of ENVI` de un
+GeoTIFF) o un .npy, y al lado va `<raster>.json` con su georreferencia:
+
+    {"filas": 36000, "columnas": 18000, "tipo": "<i2",
+     "oeste": -76.0, "norte": -17.0, "paso_x": 0.000833, "paso_y": 0.000833,
+     "sin_dato": -32768}
+
+El archivo se abre con numpy.memmap: solo se leen las páginas de las celdas
+consultadas, nunca el raster completo. Cada valor representa el centro de su
+pixel (convención de GeoTIFF) y se interpola bilinealmente entre los cuatro
+vecinos.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger(__name__)
+
+
+class RasterElevacion:
+
+    def __init__(self, ruta, meta):
+        self.oeste = float(meta['oeste'])
+        self.norte = float(meta['norte'])
+        self.paso_x = float(meta['paso_x'])
+        self.paso_y = float(meta['paso_y'])
+        self.sin_dato = meta.get('sin_dato')
+        if ruta.endswith('.npy'):
+            self.datos = np.load(ruta, mmap_mode='r')
+        else:
+            self.datos = np.memmap(
+                ruta, dtype=np.dtype(meta['tipo']), mode='r',
+                shape=(int(meta['filas']), int(meta['columnas']))
+            )
+        self.filas, self.columnas = self.datos.shape
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(f'{ruta}.json', encoding='utf-8') as archivo:
+            return cls(ruta, json.load(archivo))
+
+    def muestrear(self, latitudes, longitudes):
+        """Altitud interpolada por punto (NaN fuera del raster o sin dato alrededor)"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        resultado = np.full(len(latitudes), np.nan)
+
+        # Posición continua en la grilla, con el centro de cada pixel en .0
+        columna = (longitudes - self.oeste) / self.paso_x - 0.5
+        fila = (self.norte - latitudes) / self.paso_y - 0.5
+        validos = np.flatnonzero(
+            (columna >= -0.5) & (columna <= self.columnas - 0.5)
+            & (fila >= -0.5) & (fila <= self.filas - 0.5)
+        )
+        if not validos.size:
+            return resultado
+
+        # Celda superior izquierda de los cuatro vecinos; en el borde se repite el pixel
+        f0 = np.clip(np.floor(fila[validos]), 0, max(self.filas - 2, 0)).astype(np.int64)
+        c0 = np.clip(np.floor(columna[validos]), 0, max(self.columnas - 2, 0)).astype(np.int64)
+        f1 = np.minimum(f0 + 1, self.filas - 1)
+        c1 = np.minimum(c0 + 1, self.columnas - 1)
+        df = np.clip(fila[validos] - f0, 0.0, 1.0)
+        dc = np.clip(columna[validos] - c0, 0.0, 1.0)
+
+        # Leer en orden de fila recorre el archivo hacia adelante
+        orden = np.argsort(f0 * self.columnas + c0, kind='stable')
+        vecinos = np.empty((4, len(validos)))
+        for k, (f, c) in enumerate(((f0, c0), (f0, c1), (f1, c0), (f1, c1))):
+            vecinos[k, orden] = self.datos[f[orden], c[orden]]
+        pesos = np.array([(1 - df) * (1 - dc), (1 - df) * dc, df * (1 - dc), df * dc])
+
+        if self.sin_dato is not None:
+            # Sin dato en un vecino: se reparte su peso entre los demás
+            faltan = vecinos == self.sin_dato
+            pesos[faltan] = 0.0
+            vecinos[faltan] = 0.0
+        total = pesos.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado[validos] = np.where(total > 0, (vecinos * pesos).sum(axis=0) / total, np.nan)
+        return resultado
+
+
+_raster = None
+_cargado = False
+_lock = threading.Lock()
+
+
+def raster():
+    """Raster del proceso (mapeado, no cargado); None si no hay archivo"""
+    global _raster, _cargado
+    if not _cargado:
+        with _lock:
+            if not _cargado:
+                ruta = settings.ELEVACION_RASTER
+                if os.path.exists(ruta) and os.path.exists(f'{ruta}.json'):
+                    _raster = RasterElevacion.desde_archivo(ruta)
+                    logger.info('Raster de elevación mapeado: %s×%s', _raster.filas, _raster.columnas)
+                _cargado = True
+    return _raster
+
+
+def altitud_de(latitud, longitud):
+    """Altitud en metros redondeada a 2 decimales, o None"""
+    actual = raster()
+    if actual is None or latitud is None or longitud is None:
+        return None
+    valor = actual.muestrear([float(latitud)], [float(longitud)])[0]
+    return None if np.isnan(valor) else round(float(valor), 2)
+
+
+@checks.register()
+def revisar_raster_elevacion(app_configs, **kwargs):
+    ruta = settings.ELEVACION_RASTER
+    if os.path.exists(ruta) and os.path.exists(f'{ruta}.json'):
+        return []
+    return [checks.Warning(
+        f'No existe {ruta} (o su {os.path.basename(ruta)}.json): las ubicaciones quedarán sin altitud',
+        hint='Convierte el DEM a una grilla cruda con su georreferencia en JSON y define ELEVACION_RASTER.',
+        id='appProyecto.W003',
+    )]
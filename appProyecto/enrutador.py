@@ -0,0 +1,143 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Tablas de auditoría (solo se insertan y se leen por fecha): van a su propia base
+MODELOS_AUDITORIA = {
+    'appProyecto.historialdenuncia',
+    'appProyecto.historialdenunciaarchivada',
+    'appProyecto.logactividad',
+}
+
+# Sesión y usuario se leen siempre de la principal: en vistas con
+# @lectura_en_replica los carga perezosamente el middleware, y una réplica
+# atrasada cerraría sesiones recién iniciadas o con la contraseña cambiada
+APPS_PRINCIPAL = {'auth', 'sessions', 'contenttypes'}
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Alias de lectura de la vista en curso (None = base principal)
+_alias_lectura = ContextVar('alias_lectura', default=None)
+
+
+def alias_auditoria():
+    """Alias de la base de auditoría; la principal si no hay una configurada"""
+    alias = getattr(settings, 'BD_AUDITORIA_ALIAS', 'audit')
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def auditoria_separada():
+    """
+    True si la auditoría vive en otra base: entonces sus FK no existen en el
+    motor y la cascada la hacen las señales. En una sola base son FK normales.
+    """
+    return alias_auditoria() != DEFAULT_DB_ALIAS
+
+
+def alias_replica():
+    """Alias de la réplica de lectura, o None si no hay una configurada"""
+    alias = getattr(settings, 'BD_REPLICA_ALIAS', 'replica')
+    return alias if alias != DEFAULT_DB_ALIAS and alias in settings.DATABASES else None
+
+
+def es_auditoria(modelo):
+    return modelo._meta.label_lower in MODELOS_AUDITORIA
+
+
+def es_principal(modelo):
+    return modelo._meta.app_label in APPS_PRINCIPAL or modelo._meta.label == settings.AUTH_USER_MODEL
+
+
+# ==============================================================================
+# ROUTER
+# ==============================================================================
+
+class EnrutadorBaseDatos:
+    """
+    - Historial y logs: base de auditoría (lectura, escritura y migraciones).
+    - Resto de modelos: base principal, salvo en vistas marcadas con
+      @lectura_en_replica, que leen de la réplica (menos sesión y usuarios).
+    Devuelve siempre un alias explícito: sin él Django usaría la base de la
+    instancia de origen (p. ej. cargar el usuario de un log desde la auditoría).
+    """
+
+    def db_for_read(self, model, **hints):
+        if es_auditoria(model):
+            return alias_auditoria()
+        if es_principal(model):
+            return DEFAULT_DB_ALIAS
+        return _alias_lectura.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if es_auditoria(model):
+            return alias_auditoria()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las relaciones entre auditoría y principal existen sin FK en el motor
+        alias = {DEFAULT_DB_ALIAS, alias_auditoria(), alias_replica()}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == alias_replica():
+            # El esquema de la réplica llega por replicación
+            return False
+        if model_name and f'{app_label}.{model_name}' in MODELOS_AUDITORIA:
+            return db == alias_auditoria()
+        return db == DEFAULT_DB_ALIAS
+
+
+# ==============================================================================
+# LECTURAS EN RÉPLICA CON ADHERENCIA TRAS ESCRIBIR
+# ==============================================================================
+
+def alias_lectura(request):
+    """
+    Réplica para peticiones de solo lectura, salvo si el cliente escribió
+    hace poco (cookie de adherencia): entonces lee de la principal para ver
+    sus propios cambios aunque la réplica vaya atrasada.
+    """
+    replica = alias_replica()
+    if replica is None or request.method not in METODOS_SEGUROS:
+        return None
+    if request.COOKIES.get(settings.REPLICA_COOKIE):
+        return None
+    return replica
+
+
+def lectura_en_replica(vista):
+    """Las consultas de la vista (salvo auditoría) van a la réplica"""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        token = _alias_lectura.set(alias_lectura(request))
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            _alias_lectura.reset(token)
+    return envoltura
+
+
+class AdherenciaEscrituraMiddleware:
+    """
+    Tras un POST (o cualquier método que escriba) deja una cookie que
+    durante REPLICA_ADHERENCIA_SEGUNDOS manda las lecturas a la principal.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in METODOS_SEGUROS and alias_replica() is not None:
+            response.set_cookie(
+                settings.REPLICA_COOKIE,
+                '1',
+                max_age=settings.REPLICA_ADHERENCIA_SEGUNDOS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
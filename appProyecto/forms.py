@@ -147,13 +147,9 @@ class DenunciaForm(forms.ModelForm):
         longitud = self.cleaned_data.get('longitud')
         ubicacion_texto = self.cleaned_data.get('ubicacion_texto')
         
+        denuncia.ubicacion_texto = ubicacion_texto or None
         if latitud and longitud:
-            ubicacion, created = Ubicacion.objects.get_or_create(
-                latitud=latitud,
-                longitud=longitud,
-                defaults={'descripcion': ubicacion_texto}
-            )
-            denuncia.ubicacion = ubicacion
+            denuncia.ubicacion = Ubicacion.objects.internar(latitud, longitud, ubicacion_texto)
         
         if commit:
             denuncia.save()
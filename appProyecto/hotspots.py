@@ -0,0 +1,301 @@
+"""
+Focos (hotspots) de denuncias recientes por categoría.
+
+DBSCAN sobre una grilla de celdas de lado radio/√2:
+- dos puntos de la misma celda están siempre a menos del radio, así que
+  toda celda con al menos HOTSPOTS_MINIMO puntos es entera de núcleos;
+- el resto de los puntos cuenta vecinos solo en las 21 celdas cercanas;
+- las celdas con núcleos se unen si algún par de núcleos está a menos del
+  radio: primero se prueban hasta REPRESENTANTES por celda y, para las
+  celdas vecinas que eso no dejó en el mismo componente, todos los pares;
+  los componentes conexos de ese grafo son los focos;
+- los puntos no núcleo a menos del radio de un núcleo quedan como borde
+  (con el foco de cualquiera de ellos, como en DBSCAN).
+El resultado es el de DBSCAN exacto, salvo el foco elegido para un borde.
+Todo se hace con NumPy sobre los puntos ordenados por celda; las
+coordenadas se proyectan a metros con una equirectangular local.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .basedatos import atomico
+from .models import Denuncia, Hotspot
+
+METROS_POR_GRADO = 111_320.0
+BASE = 2 ** 32               # clave de celda = columna × BASE + fila
+REPRESENTANTES = 16          # núcleos por celda al unir celdas
+PARES_POR_BLOQUE = 4_000_000
+
+# 5×5 celdas sin las esquinas: todo lo que puede estar a menos del radio
+DESPLAZAMIENTOS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if abs(dx) + abs(dy) < 4]
+# Para pares no dirigidos entre celdas distintas basta la mitad
+DESPLAZAMIENTOS_MITAD = [(dx, dy) for dx, dy in DESPLAZAMIENTOS if dx > 0 or (dx == 0 and dy > 0)]
+
+
+# ==============================================================================
+# DBSCAN SOBRE GRILLA
+# ==============================================================================
+
+class _Grilla:
+    """Puntos ordenados por celda, para buscar vecinos desplazando la clave"""
+
+    def __init__(self, claves, indices):
+        orden = np.argsort(claves, kind='stable')
+        self.puntos = indices[orden]
+        self.celdas, self.inicio, self.conteo = np.unique(claves[orden], return_index=True, return_counts=True)
+
+    def vecindario(self):
+        """Puntos en las 21 celdas cercanas de cada celda (cota del conteo de vecinos)"""
+        total = np.zeros(len(self.celdas), dtype=np.int64)
+        for dx, dy in DESPLAZAMIENTOS:
+            objetivo = self.celdas + dx * BASE + dy
+            posiciones = np.minimum(np.searchsorted(self.celdas, objetivo), len(self.celdas) - 1)
+            hay = self.celdas[posiciones] == objetivo
+            total[hay] += self.conteo[posiciones[hay]]
+        return total
+
+    def pares(self, claves_q, indices_q, x, y, radio2, desplazamientos=DESPLAZAMIENTOS):
+        """Genera (q, p) con p de la grilla a distancia ≤ radio de q, por bloques acotados"""
+        # Se busca una vez por celda consultada, no por punto
+        celdas_q, celda_q = np.unique(claves_q, return_inverse=True)
+        for dx, dy in desplazamientos:
+            objetivo = celdas_q + dx * BASE + dy
+            posiciones = np.minimum(np.searchsorted(self.celdas, objetivo), len(self.celdas) - 1)
+            posiciones = posiciones[celda_q]
+            hay = self.celdas[posiciones] == objetivo[celda_q]
+            if not hay.any():
+                continue
+            q = indices_q[hay]
+            posiciones = posiciones[hay]
+            conteos = self.conteo[posiciones]
+            acumulado = np.cumsum(conteos)
+
+            a = 0
+            while a < len(q):
+                previo = acumulado[a - 1] if a else 0
+                b = max(a + 1, int(np.searchsorted(acumulado, previo + PARES_POR_BLOQUE, side='right')))
+                n = conteos[a:b]
+                qq = np.repeat(q[a:b], n)
+                desplazamiento = np.arange(len(qq)) - np.repeat(np.cumsum(n) - n, n)
+                pp = self.puntos[np.repeat(self.inicio[posiciones[a:b]], n) + desplazamiento]
+                cerca = (x[qq] - x[pp]) ** 2 + (y[qq] - y[pp]) ** 2 <= radio2
+                yield qq[cerca], pp[cerca]
+                a = b
+
+
+def _componentes(n, a, b):
+    """Componente (0..k-1) de cada nodo del grafo con aristas a[i]–b[i]"""
+    etiqueta = np.arange(n)
+    # Muchos pares de representantes unen las mismas dos celdas
+    distintas = a != b
+    aristas = np.unique(np.minimum(a, b)[distintas] * n + np.maximum(a, b)[distintas])
+    a, b = aristas // n, aristas % n
+    while len(a):
+        menor = np.minimum(etiqueta[a], etiqueta[b])
+        nueva = etiqueta.copy()
+        np.minimum.at(nueva, a, menor)
+        np.minimum.at(nueva, b, menor)
+        nueva = nueva[nueva]  # salto de punteros: converge en pocas vueltas
+        if np.array_equal(nueva, etiqueta):
+            break
+        etiqueta = nueva
+    return np.unique(etiqueta, return_inverse=True)[1]
+
+
+def proyectar(latitudes, longitudes):
+    """Metros en una equirectangular local (escala de x según la latitud de cada punto)"""
+    y = latitudes * METROS_POR_GRADO
+    x = longitudes * METROS_POR_GRADO * np.cos(np.radians(latitudes))
+    return x, y
+
+
+def dbscan(x, y, radio, minimo):
+    """Etiqueta de foco por punto (-1 = ruido)"""
+    n = len(x)
+    etiquetas = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return etiquetas
+    lado = radio / math.sqrt(2)
+    radio2 = radio * radio
+    claves = np.floor(x / lado).astype(np.int64) * BASE + np.floor(y / lado).astype(np.int64)
+    todos = np.arange(n)
+    grilla = _Grilla(claves, todos)
+
+    # Núcleos: celdas densas completas; en las demás se cuentan vecinos (incluye
+    # al propio punto), salvo donde ni las 21 celdas cercanas suman el mínimo
+    celda = np.searchsorted(grilla.celdas, claves)
+    nucleo = grilla.conteo[celda] >= minimo
+    ralos = np.flatnonzero(~nucleo & (grilla.vecindario()[celda] >= minimo))
+    if ralos.size:
+        vecinos = np.zeros(n, dtype=np.int64)
+        for q, _ in grilla.pares(claves[ralos], ralos, x, y, radio2):
+            vecinos += np.bincount(q, minlength=n)
+        nucleo[ralos] = vecinos[ralos] >= minimo
+
+    nucleos = np.flatnonzero(nucleo)
+    if not nucleos.size:
+        return etiquetas
+    nucleos = nucleos[np.argsort(claves[nucleos], kind='stable')]
+    _, inicio, conteo = np.unique(claves[nucleos], return_index=True, return_counts=True)
+    celda_de = np.repeat(np.arange(len(conteo)), conteo)
+    celda_punto = np.full(n, -1, dtype=np.int64)
+    celda_punto[nucleos] = celda_de
+
+    # Representantes repartidos dentro de cada celda
+    rango = np.arange(len(nucleos)) - np.repeat(inicio, conteo)
+    paso = np.repeat(np.maximum(1, -(-conteo // REPRESENTANTES)), conteo)
+    representantes = nucleos[rango % paso == 0]
+    grilla_representantes = _Grilla(claves[representantes], representantes)
+
+    origenes, destinos = [], []
+    for q, p in grilla_representantes.pares(
+        claves[representantes], representantes, x, y, radio2, DESPLAZAMIENTOS_MITAD
+    ):
+        origenes.append(celda_punto[q])
+        destinos.append(celda_punto[p])
+
+    def componentes():
+        vacio = np.empty(0, dtype=np.int64)
+        return _componentes(
+            len(conteo),
+            np.concatenate(origenes) if origenes else vacio,
+            np.concatenate(destinos) if destinos else vacio,
+        )
+
+    # Celdas vecinas que los representantes no conectaron: todos los pares
+    # de núcleos, desplazamiento por desplazamiento
+    componente = componentes()
+    grilla_nucleos = _Grilla(claves[nucleos], nucleos)
+    celdas = grilla_nucleos.celdas
+    pendientes = False
+    for dx, dy in DESPLAZAMIENTOS_MITAD:
+        objetivo = celdas + dx * BASE + dy
+        vecina = np.minimum(np.searchsorted(celdas, objetivo), len(celdas) - 1)
+        separadas = (celdas[vecina] == objetivo) & (componente != componente[vecina])
+        if not separadas.any():
+            continue
+        pendientes = True
+        consulta = nucleos[separadas[celda_de]]
+        for q, p in grilla_nucleos.pares(claves[consulta], consulta, x, y, radio2, [(dx, dy)]):
+            origenes.append(celda_punto[q])
+            destinos.append(celda_punto[p])
+    if pendientes:
+        componente = componentes()
+    etiquetas[nucleos] = componente[celda_de]
+
+    # Bordes: el foco de algún núcleo cercano (primero entre los representantes)
+    bordes = np.flatnonzero(~nucleo)
+    for grilla_ in (grilla_representantes, grilla_nucleos):
+        if not bordes.size:
+            break
+        for q, p in grilla_.pares(claves[bordes], bordes, x, y, radio2):
+            etiquetas[q] = componente[celda_punto[p]]
+        bordes = bordes[etiquetas[bordes] < 0]
+    return etiquetas
+
+
+# ==============================================================================
+# FOCOS POR CATEGORÍA
+# ==============================================================================
+
+def _ventana(ahora):
+    return Denuncia.objects.filter(
+        fecha_creacion__gte=ahora - timedelta(days=settings.HOTSPOTS_VENTANA_DIAS),
+        ubicacion__isnull=False,
+    ).exclude(estado='rechazada')
+
+
+def _focos(categoria_id, ahora):
+    """Hotspot (sin guardar) de una categoría"""
+    filas = list(
+        _ventana(ahora).filter(categoria_id=categoria_id)
+        .values_list('ubicacion__latitud', 'ubicacion__longitud', 'fecha_creacion')
+    )
+    if len(filas) < settings.HOTSPOTS_MINIMO:
+        return []
+    latitudes, longitudes, fechas = zip(*filas)
+    latitudes = np.array(latitudes, dtype=np.float64)
+    longitudes = np.array(longitudes, dtype=np.float64)
+    segundos = np.array([f.timestamp() for f in fechas], dtype=np.float64)
+
+    x, y = proyectar(latitudes, longitudes)
+    etiquetas = dbscan(x, y, settings.HOTSPOTS_RADIO_METROS, settings.HOTSPOTS_MINIMO)
+    miembros = etiquetas >= 0
+    if not miembros.any():
+        return []
+
+    # Resumen por foco con bincount (sin bucles por punto)
+    e = etiquetas[miembros]
+    k = e.max() + 1
+    total = np.bincount(e, minlength=k)
+    lat_media = np.bincount(e, latitudes[miembros], k) / total
+    lon_media = np.bincount(e, longitudes[miembros], k) / total
+    cx, cy = proyectar(lat_media, lon_media)
+    distancia = np.hypot(x[miembros] - cx[e], y[miembros] - cy[e])
+    radio = np.zeros(k)
+    np.maximum.at(radio, e, distancia)
+    primera = np.full(k, np.inf)
+    ultima = np.full(k, -np.inf)
+    np.minimum.at(primera, e, segundos[miembros])
+    np.maximum.at(ultima, e, segundos[miembros])
+    corte = (ahora - timedelta(days=settings.HOTSPOTS_VENTANA_DIAS / 4)).timestamp()
+    recientes = np.bincount(e, segundos[miembros] >= corte, k)
+
+    zona = dt_timezone.utc if settings.USE_TZ else None
+    return [
+        Hotspot(
+            categoria_id=categoria_id,
+            latitud=round(float(lat_media[i]), 8),
+            longitud=round(float(lon_media[i]), 8),
+            radio_metros=round(float(radio[i]), 1),
+            denuncias=int(total[i]),
+            recientes=int(recientes[i]),
+            primera=datetime.fromtimestamp(primera[i], tz=zona),
+            ultima=datetime.fromtimestamp(ultima[i], tz=zona),
+        )
+        for i in range(k)
+    ]
+
+
+def _clave_firma(categoria_id):
+    return f'hotspots:firma:{categoria_id}'
+
+
+def actualizar(todas=False):
+    """
+    Recalcula los focos de las categorías cuyas denuncias en la ventana
+    cambiaron desde la última vez (firma: cantidad, último id y última
+    actualización). Retorna {categoria_id: focos} de las recalculadas.
+    """
+    ahora = timezone.now()
+    parametros = (settings.HOTSPOTS_RADIO_METROS, settings.HOTSPOTS_MINIMO, settings.HOTSPOTS_VENTANA_DIAS)
+    firmas = {
+        fila['categoria_id']: (fila['n'], fila['ultimo_id'], str(fila['actualizada']), parametros)
+        for fila in _ventana(ahora).values('categoria_id').annotate(
+            n=Count('id'), ultimo_id=Max('id'), actualizada=Max('fecha_actualizacion')
+        ).order_by()
+    }
+    # Categorías que ya no tienen denuncias en la ventana
+    for categoria_id in set(Hotspot.objects.values_list('categoria_id', flat=True).distinct()) - set(firmas):
+        firmas[categoria_id] = None
+
+    recalculadas = {}
+    for categoria_id, firma in firmas.items():
+        if not todas and firma is not None and cache.get(_clave_firma(categoria_id)) == firma:
+            continue
+        focos = _focos(categoria_id, ahora) if firma is not None else []
+        with atomico():
+            Hotspot.objects.filter(categoria_id=categoria_id).delete()
+            Hotspot.objects.bulk_create(focos)
+        if firma is None:
+            cache.delete(_clave_firma(categoria_id))
+        else:
+            cache.set(_clave_firma(categoria_id), firma, None)
+        recalculadas[categoria_id] = len(focos)
+    return recalculadas
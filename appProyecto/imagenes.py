@@ -0,0 +1,228 @@
+"""
+Proxy de fotos externas (iNaturalist) para las tarjetas de pagina3.
+
+En vez de enlazar la foto original, la página apunta a /api/imagenes/?u=
+con la URL firmada (django.core.signing, así no es un proxy abierto). El
+proxy la descarga con un httpx.AsyncClient con pool en el loop de fondo de
+appProyecto.inaturalist, la reduce a TAMANO_MINIATURA con Pillow, la
+recodifica a WebP y la guarda en IMAGENES_CACHE_DIR.
+
+La firma solo cubre la URL original: las redirecciones se siguen a mano y
+solo hacia su mismo host o a IMAGENES_HOSTS_REDIRECCION.
+
+El directorio es un LRU acotado a IMAGENES_CACHE_MAX_BYTES: cada acierto
+actualiza el mtime del archivo y, cuando el total pasa el límite, se borran
+los menos usados hasta quedar en el 90 %. El directorio es compartido por
+todos los workers: cada proceso vuelve a medirlo tras escribir una fracción
+(RECUENTO_CADA) del límite, así el exceso queda acotado a workers × fracción.
+Las respuestas llevan Cache-Control de un año (la URL firmada no cambia de
+contenido) y ETag.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from io import BytesIO
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import httpx
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from PIL import Image, UnidentifiedImageError
+
+from .inaturalist import en_fondo
+from .servicios import TAMANO_MINIATURA
+
+logger = logging.getLogger(__name__)
+
+SAL_FIRMA = 'appProyecto.imagenes'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MAX_REDIRECCIONES = 3
+RECUENTO_CADA = 0.05  # fracción del límite escrita por un proceso antes de volver a medir el disco
+
+
+class ImagenNoDisponible(Exception):
+    """El origen falló o no devolvió una imagen válida"""
+
+
+def url_proxy(url):
+    """URL del proxy para una foto externa (None si no hay foto)"""
+    if not url:
+        return None
+    return f"{reverse('imagen_proxy')}?{urlencode({'u': signing.Signer(salt=SAL_FIRMA).sign(url)})}"
+
+
+def leer_firma(valor):
+    """URL original; lanza signing.BadSignature si no la firmó este sitio"""
+    return signing.Signer(salt=SAL_FIRMA).unsign(valor)
+
+
+def clave(url):
+    tamano = 'x'.join(map(str, TAMANO_MINIATURA))
+    return hashlib.sha256(f'{tamano}:{url}'.encode()).hexdigest()
+
+
+# ==============================================================================
+# CACHÉ EN DISCO (LRU POR MTIME)
+# ==============================================================================
+
+_escritos = None  # bytes escritos por este proceso desde la última medición (None: sin medir)
+_lock = threading.Lock()
+
+
+def _ruta(clave_):
+    return os.path.join(settings.IMAGENES_CACHE_DIR, clave_[:2], f'{clave_}.webp')
+
+
+def leer(clave_):
+    """Bytes de la miniatura guardada (y la marca como usada), o None"""
+    ruta = _ruta(clave_)
+    try:
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read()
+        os.utime(ruta)
+    except FileNotFoundError:
+        return None
+    return datos
+
+
+def _archivos():
+    for carpeta, _, nombres in os.walk(settings.IMAGENES_CACHE_DIR):
+        for nombre in nombres:
+            if nombre.endswith('.webp'):
+                ruta = os.path.join(carpeta, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:  # la borró otro proceso
+                    continue
+                yield estado.st_mtime, estado.st_size, ruta
+
+
+def recortar():
+    """Borra los menos usados hasta quedar bajo el 90 % del límite; retorna bytes en disco"""
+    archivos = sorted(_archivos())
+    total = sum(tamano for _, tamano, _ in archivos)
+    limite = settings.IMAGENES_CACHE_MAX_BYTES
+    if total > limite:
+        for _, tamano, ruta in archivos:
+            if total <= 0.9 * limite:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+    return total
+
+
+def guardar(clave_, datos):
+    """Escritura atómica (rename) y recorte tras cada RECUENTO_CADA del límite escrito"""
+    global _escritos
+    ruta = _ruta(clave_)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporal, 'wb') as archivo:
+        archivo.write(datos)
+    os.replace(temporal, ruta)
+    with _lock:
+        # Se mide el disco (no un total propio): incluye lo escrito por otros workers
+        if _escritos is None or _escritos + len(datos) > RECUENTO_CADA * settings.IMAGENES_CACHE_MAX_BYTES:
+            recortar()
+            _escritos = 0
+        else:
+            _escritos += len(datos)
+
+
+# ==============================================================================
+# DESCARGA Y CONVERSIÓN (en el loop de fondo)
+# ==============================================================================
+
+_cliente = None
+_en_curso = {}  # clave → Future de la descarga; solo se toca desde el loop de fondo
+
+
+def _miniatura(original):
+    """Corre en el executor: Pillow libera el GIL en la decodificación"""
+    try:
+        imagen = Image.open(BytesIO(original))
+        imagen.draft('RGB', TAMANO_MINIATURA)  # JPEG: decodifica ya reducida
+        imagen.thumbnail(TAMANO_MINIATURA)
+        salida = BytesIO()
+        imagen.convert('RGB').save(salida, 'WEBP', quality=80)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as error:
+        raise ImagenNoDisponible(f'imagen inválida: {error}') from error
+    return salida.getvalue()
+
+
+async def _descargar(url):
+    global _cliente
+    if _cliente is None:
+        _cliente = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.INATURALIST_CONEXIONES,
+                max_keepalive_connections=settings.INATURALIST_CONEXIONES,
+            ),
+            timeout=settings.INATURALIST_TIMEOUT,
+            follow_redirects=False,  # se siguen a mano en _descargar
+            headers={'User-Agent': 'SilvaSentinel/1.0'},
+        )
+    permitidos = {urlsplit(url).hostname, *settings.IMAGENES_HOSTS_REDIRECCION}
+    try:
+        for _ in range(MAX_REDIRECCIONES + 1):
+            async with _cliente.stream('GET', url) as respuesta:
+                if respuesta.is_redirect:
+                    url = urljoin(url, respuesta.headers['Location'])
+                    partes = urlsplit(url)
+                    if partes.scheme not in ('http', 'https') or partes.hostname not in permitidos:
+                        raise ImagenNoDisponible(f'redirección a un host no permitido: {partes.hostname}')
+                    continue
+                if respuesta.status_code != 200:
+                    raise ImagenNoDisponible(f'HTTP {respuesta.status_code}')
+                return await _leer_cuerpo(respuesta)
+    except httpx.HTTPError as error:
+        raise ImagenNoDisponible(repr(error)) from error
+    raise ImagenNoDisponible('demasiadas redirecciones')
+
+
+async def _leer_cuerpo(respuesta):
+    partes = []
+    leidos = 0
+    async for parte in respuesta.aiter_bytes():
+        leidos += len(parte)
+        if leidos > settings.IMAGENES_MAX_BYTES:
+            raise ImagenNoDisponible('imagen demasiado grande')
+        partes.append(parte)
+    return b''.join(partes)
+
+
+async def _procesar(url, clave_):
+    loop = asyncio.get_running_loop()
+    original = await _descargar(url)
+    datos = await loop.run_in_executor(None, _miniatura, original)
+    await loop.run_in_executor(None, guardar, clave_, datos)
+    return datos
+
+
+async def _obtener(url, clave_):
+    """Una sola descarga por clave aunque lleguen varias peticiones a la vez"""
+    futuro = _en_curso.get(clave_)
+    if futuro is None:
+        futuro = _en_curso[clave_] = asyncio.ensure_future(_procesar(url, clave_))
+        futuro.add_done_callback(lambda _: _en_curso.pop(clave_, None))
+    return await asyncio.shield(futuro)
+
+
+async def miniatura(url):
+    """Bytes WebP de la foto en tamaño tarjeta, desde el disco o descargándola"""
+    clave_ = clave(url)
+    # Lectura de disco fuera del loop de la vista
+    datos = await asyncio.get_running_loop().run_in_executor(None, leer, clave_)
+    if datos is None:
+        try:
+            datos = await en_fondo(_obtener(url, clave_))
+        except ImagenNoDisponible as error:
+            logger.warning('Imagen no disponible %s: %s', url, error)
+            raise
+    return datos
@@ -0,0 +1,429 @@
+"""
+Cliente asíncrono de la API de iNaturalist para pagina3.
+
+- Un httpx.AsyncClient por proceso, con pool de conexiones persistentes
+  (keep-alive, TLS reutilizado), que vive en un event loop propio en un
+  hilo de fondo: así el pool sobrevive entre peticiones tanto bajo ASGI
+  como bajo WSGI, donde cada vista async corre en un loop nuevo.
+- Timeout adaptativo: media y desviación exponenciales de la latencia
+  (como el RTO de TCP), acotadas entre INATURALIST_TIMEOUT_MINIMO y
+  INATURALIST_TIMEOUT.
+- Circuito: tras INATURALIST_FALLAS_PARA_ABRIR fallas seguidas se deja de
+  llamar durante INATURALIST_ENFRIAMIENTO segundos; luego pasa una sola
+  petición de prueba.
+- Caché de resultados con stale-while-revalidate y precarga de la página
+  siguiente (ver más abajo).
+- Con catálogo local (appProyecto.catalogo) solo se usa para las fotos.
+INATURALIST_URL apunta a la API; en pruebas, a un servidor HTTP local.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import Taxon
+from .nomenclator import normalizar
+
+logger = logging.getLogger(__name__)
+
+PLACE_ID_CHILE = 6793
+FLORA = 'Plantae'
+FAUNA = 'Animalia,Aves,Mammalia,Reptilia,Amphibia,Actinopterygii,Arachnida,Insecta,Mollusca'
+
+
+class ServicioNoDisponible(Exception):
+    """iNaturalist falló o el circuito está abierto"""
+
+
+# ==============================================================================
+# CIRCUITO Y TIMEOUT ADAPTATIVO
+# ==============================================================================
+
+class Circuito:
+    """Cerrado → abierto tras N fallas seguidas → semiabierto tras el enfriamiento"""
+
+    def __init__(self, fallas_para_abrir, enfriamiento):
+        self.fallas_para_abrir = fallas_para_abrir
+        self.enfriamiento = enfriamiento
+        self.fallas = 0
+        self.abierto_hasta = 0.0
+        self.probando = False
+
+    @property
+    def abierto(self):
+        return self.fallas >= self.fallas_para_abrir and time.monotonic() < self.abierto_hasta
+
+    @property
+    def semiabierto(self):
+        return self.fallas >= self.fallas_para_abrir and time.monotonic() >= self.abierto_hasta
+
+    def permitir(self):
+        if self.fallas < self.fallas_para_abrir:
+            return True
+        if time.monotonic() < self.abierto_hasta or self.probando:
+            return False
+        self.probando = True  # semiabierto: una sola petición de prueba
+        return True
+
+    def exito(self):
+        self.fallas = 0
+        self.probando = False
+
+    def falla(self):
+        self.fallas += 1
+        self.probando = False
+        if self.fallas >= self.fallas_para_abrir:
+            self.abierto_hasta = time.monotonic() + self.enfriamiento
+            logger.warning('Circuito de iNaturalist abierto por %ss', self.enfriamiento)
+
+
+class TimeoutAdaptativo:
+
+    def __init__(self, minimo, maximo):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.media = None
+        self.desviacion = 0.0
+
+    def actual(self):
+        if self.media is None:
+            return self.maximo
+        return min(self.maximo, max(self.minimo, self.media + 4 * self.desviacion))
+
+    def registrar(self, segundos):
+        if self.media is None:
+            self.media, self.desviacion = segundos, segundos / 2
+        else:
+            self.desviacion = 0.75 * self.desviacion + 0.25 * abs(self.media - segundos)
+            self.media = 0.875 * self.media + 0.125 * segundos
+
+    def expiro(self):
+        """Tras un timeout se duplica la espera (hasta el máximo), como TCP"""
+        if self.media is not None:
+            self.media = min(self.maximo, 2 * self.media)
+
+
+# ==============================================================================
+# CLIENTE
+# ==============================================================================
+
+class ClienteINaturalist:
+    """Solo se usa desde el loop de fondo: no necesita locks"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            base_url=settings.INATURALIST_URL,
+            limits=httpx.Limits(
+                max_connections=settings.INATURALIST_CONEXIONES,
+                max_keepalive_connections=settings.INATURALIST_CONEXIONES,
+            ),
+            headers={'User-Agent': 'SilvaSentinel/1.0'},
+        )
+        self.circuito = Circuito(settings.INATURALIST_FALLAS_PARA_ABRIR, settings.INATURALIST_ENFRIAMIENTO)
+        self.timeout = TimeoutAdaptativo(settings.INATURALIST_TIMEOUT_MINIMO, settings.INATURALIST_TIMEOUT)
+
+    async def consultar(self, ruta, params=None):
+        if not self.circuito.permitir():
+            raise ServicioNoDisponible('circuito abierto')
+        inicio = time.monotonic()
+        try:
+            respuesta = await self.http.get(ruta, params=params, timeout=self.timeout.actual())
+            if respuesta.status_code == 429 or respuesta.status_code >= 500:
+                raise ServicioNoDisponible(f'HTTP {respuesta.status_code}')
+            datos = respuesta.json() if respuesta.status_code == 200 else None
+        except (httpx.HTTPError, ValueError, ServicioNoDisponible) as error:
+            if isinstance(error, httpx.TimeoutException):
+                self.timeout.expiro()
+            self.circuito.falla()
+            logger.warning('iNaturalist falló: %r', error)
+            raise ServicioNoDisponible(str(error)) from error
+        if datos is None:
+            # Un 4xx es culpa de la consulta, no del servicio: no abre el circuito
+            self.circuito.exito()
+            raise ServicioNoDisponible(f'HTTP {respuesta.status_code}')
+        self.timeout.registrar(time.monotonic() - inicio)
+        self.circuito.exito()
+        return datos
+
+
+_loop = None
+_cliente = None
+_lock = threading.Lock()
+
+
+def _loop_de_fondo():
+    """Event loop del proceso (hilo daemon) donde vive el pool de conexiones"""
+    global _loop, _cliente
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='inaturalist', daemon=True).start()
+                _cliente = asyncio.run_coroutine_threadsafe(_crear_cliente(), loop).result()
+                _loop = loop
+    return _loop
+
+
+async def _crear_cliente():
+    return ClienteINaturalist()
+
+
+async def en_fondo(corrutina):
+    """Espera en el loop de quien llama una corrutina que corre en el loop de fondo"""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(corrutina, _loop_de_fondo()))
+
+
+# ==============================================================================
+# FLORA Y FAUNA
+# ==============================================================================
+
+def _item(obs):
+    """Observación de iNaturalist → diccionario que muestra pagina3.html"""
+    taxon = obs.get('taxon') or {}
+    if not taxon:
+        return None
+
+    # nombre común en español si existe
+    nombre_comun = taxon.get('preferred_common_name')
+    if not nombre_comun:
+        for nombre in taxon.get('names', []):
+            if nombre.get('lexicon') == 'Spanish':
+                nombre_comun = nombre.get('name')
+                break
+    nombre_cientifico = taxon.get('name') or ''
+
+    # primera foto de la observación
+    foto = None
+    fotos = obs.get('photos') or []
+    if fotos:
+        foto = fotos[0].get('url') or fotos[0].get('medium_url') or fotos[0].get('square_url')
+
+    return {
+        'nombre_comun': nombre_comun or 'Sin nombre común',
+        'nombre_cientifico': nombre_cientifico,
+        'descripcion': '',
+        'imagen': foto,
+        'tipo': (taxon.get('iconic_taxon_name') or '').capitalize(),
+        'ciclo': '',
+        'nombre': nombre_comun or nombre_cientifico,
+        'habitat': '',
+        'dieta': '',
+        'poblacion': '',
+        'ubicaciones': 'Chile',
+    }
+
+
+async def _buscar(texto, taxones, pagina, por_pagina):
+    params = {
+        'place_id': PLACE_ID_CHILE,
+        'preferred_place_id': PLACE_ID_CHILE,
+        'iconic_taxa': taxones,
+        'q': texto,
+        'per_page': por_pagina,
+        'page': pagina,
+        'order_by': 'created_at',
+        'order': 'desc',
+        'locale': 'es',
+        'verifiable': 'true',
+        'photos': 'true',
+    }
+    datos = await _cliente.consultar('/observations', params)
+    return [item for item in map(_item, datos.get('results', [])) if item]
+
+
+async def _capturar(corrutina):
+    try:
+        return await corrutina
+    except Exception as error:
+        return error
+
+
+async def _consultar(texto, pagina, por_pagina):
+    """(flora, fauna, error) pidiendo ambas listas a la vez; corre en el loop de fondo"""
+    busquedas = (_buscar(texto, FLORA, pagina, por_pagina), _buscar(texto, FAUNA, pagina, por_pagina))
+    if _cliente.circuito.semiabierto:
+        # Semiabierto deja pasar una sola petición de prueba: flora prueba y
+        # fauna va después, con el circuito ya cerrado (o de nuevo abierto)
+        flora, fauna = [await _capturar(busqueda) for busqueda in busquedas]
+    else:
+        flora, fauna = await asyncio.gather(*busquedas, return_exceptions=True)
+    for resultado in (flora, fauna):
+        if isinstance(resultado, Exception) and not isinstance(resultado, ServicioNoDisponible):
+            raise resultado
+    error = None
+    if isinstance(flora, ServicioNoDisponible) or isinstance(fauna, ServicioNoDisponible):
+        if _cliente.circuito.abierto:
+            error = 'El servicio de biodiversidad no responde; reintenta en unos minutos.'
+        else:
+            error = 'No se pudo obtener información desde iNaturalist por ahora.'
+    return (
+        [] if isinstance(flora, Exception) else flora,
+        [] if isinstance(fauna, Exception) else fauna,
+        error,
+    )
+
+
+# ==============================================================================
+# CACHÉ DE BÚSQUEDAS (TTL + STALE-WHILE-REVALIDATE)
+# ==============================================================================
+# Cada (texto normalizado, página) se guarda en la caché de Django con la hora
+# de la consulta. Hasta INATURALIST_CACHE_FRESCO se sirve tal cual; después y
+# hasta INATURALIST_CACHE_MAXIMO se sirve igual, al instante, mientras el loop
+# de fondo la refresca (si iNaturalist está caído, la entrada vieja sigue
+# sirviendo). Tras servir una página llena se precarga la siguiente.
+
+# Contadores en la caché compartida. incr solo es atómico en Redis y
+# Memcached: con FileBasedCache (get + set) dos workers pueden pisarse y
+# perder cuentas, así que ahí las métricas son aproximadas
+METRICAS = ('aciertos', 'obsoletas', 'fallos', 'refrescos', 'refrescos_fallidos', 'precargas')
+
+_en_vuelo = set()  # claves refrescándose; solo se toca desde el loop de fondo
+
+
+def _clave(texto, pagina):
+    # Hash del texto normalizado: truncarlo juntaba búsquedas distintas con
+    # el mismo prefijo, y el texto crudo puede no ser una clave válida
+    return f"inaturalist:{hashlib.sha256(normalizar(texto).encode()).hexdigest()}:{pagina}"
+
+
+def _clave_metrica(nombre):
+    return f'inaturalist:metricas:{nombre}'
+
+
+def _contar_en_fondo(nombre):
+    """Suma 1 a una métrica compartida sin demorar a quien llama (ver METRICAS)"""
+    def contar():
+        clave = _clave_metrica(nombre)
+        cache.add(clave, 0, None)
+        try:
+            cache.incr(clave)
+        except ValueError:  # expulsada entre add e incr
+            cache.set(clave, 1, None)
+    _loop_de_fondo().call_soon_threadsafe(lambda: _loop.run_in_executor(None, contar))
+
+
+def _lanzar(corrutina):
+    """Corrutina en el loop de fondo sin esperar su resultado"""
+    asyncio.run_coroutine_threadsafe(corrutina, _loop_de_fondo())
+
+
+async def _guardar(texto, pagina, por_pagina, metrica):
+    """Consulta y guarda la página (una sola vez a la vez por clave)"""
+    clave = _clave(texto, pagina)
+    if clave in _en_vuelo:
+        return
+    _en_vuelo.add(clave)
+    try:
+        loop = asyncio.get_running_loop()
+        if metrica == 'precargas':
+            entrada = await loop.run_in_executor(None, cache.get, clave)
+            if entrada and time.time() - entrada['guardado'] < settings.INATURALIST_CACHE_FRESCO:
+                return
+        flora, fauna, error = await _consultar(texto, pagina, por_pagina)
+        if error is not None:
+            if metrica == 'refrescos':
+                _contar_en_fondo('refrescos_fallidos')
+            return
+        entrada = {'flora': flora, 'fauna': fauna, 'guardado': time.time()}
+        await loop.run_in_executor(None, cache.set, clave, entrada, settings.INATURALIST_CACHE_MAXIMO)
+        _contar_en_fondo(metrica)
+    except Exception:
+        logger.exception('No se pudo %s la búsqueda %r', 'precargar' if metrica == 'precargas' else 'refrescar', texto)
+    finally:
+        _en_vuelo.discard(clave)
+
+
+async def flora_y_fauna(texto, pagina=1, por_pagina=30):
+    """
+    (flora, fauna, error) de la búsqueda, desde la caché si se puede. Si una
+    de las dos listas falla se devuelve la otra y el mensaje de error.
+    """
+    _loop_de_fondo()
+    entrada = await cache.aget(_clave(texto, pagina))
+    if entrada is not None:
+        fresca = time.time() - entrada['guardado'] < settings.INATURALIST_CACHE_FRESCO
+        _contar_en_fondo('aciertos' if fresca else 'obsoletas')
+        if not fresca:
+            _lanzar(_guardar(texto, pagina, por_pagina, 'refrescos'))
+        flora, fauna, error = entrada['flora'], entrada['fauna'], None
+    else:
+        _contar_en_fondo('fallos')
+        flora, fauna, error = await en_fondo(_consultar(texto, pagina, por_pagina))
+        if error is None:
+            await cache.aset(
+                _clave(texto, pagina),
+                {'flora': flora, 'fauna': fauna, 'guardado': time.time()},
+                settings.INATURALIST_CACHE_MAXIMO,
+            )
+
+    if error is None and (len(flora) == por_pagina or len(fauna) == por_pagina):
+        _lanzar(_guardar(texto, pagina + 1, por_pagina, 'precargas'))
+    return flora, fauna, error
+
+
+def metricas():
+    """Contadores compartidos y tasa de aciertos (frescas + obsoletas sobre el total)"""
+    valores = cache.get_many([_clave_metrica(nombre) for nombre in METRICAS])
+    resultado = {nombre: valores.get(_clave_metrica(nombre), 0) for nombre in METRICAS}
+    servidas = resultado['aciertos'] + resultado['obsoletas']
+    total = servidas + resultado['fallos']
+    resultado['tasa_aciertos'] = round(servidas / total, 3) if total else None
+    return resultado
+
+
+def reiniciar_metricas():
+    cache.delete_many([_clave_metrica(nombre) for nombre in METRICAS])
+
+
+# ==============================================================================
+# FOTOS DEL CATÁLOGO LOCAL (appProyecto.catalogo)
+# ==============================================================================
+
+TAXONES_POR_CONSULTA = 30
+
+
+def _guardar_fotos(fotos, ids):
+    """Corre en un hilo del executor: anota la foto (o que no hay) de cada taxón"""
+    try:
+        ahora = timezone.now()
+        for taxon_id, url in fotos.items():
+            Taxon.objects.filter(pk=taxon_id).update(foto_url=url, foto_revisada=ahora)
+        Taxon.objects.filter(pk__in=set(ids) - set(fotos)).update(foto_revisada=ahora)
+    finally:
+        connection.close()
+
+
+async def _fotos(ids):
+    clave = f"fotos:{','.join(map(str, ids))}"
+    if clave in _en_vuelo:
+        return
+    _en_vuelo.add(clave)
+    try:
+        datos = await _cliente.consultar(f"/taxa/{','.join(map(str, ids))}")
+        fotos = {}
+        for taxon in datos.get('results', []):
+            foto = taxon.get('default_photo') or {}
+            url = foto.get('medium_url') or foto.get('url') or foto.get('square_url')
+            if url:
+                fotos[taxon['id']] = url
+        await asyncio.get_running_loop().run_in_executor(None, _guardar_fotos, fotos, ids)
+    except ServicioNoDisponible:
+        pass  # se reintenta en la próxima búsqueda que muestre estos taxones
+    except Exception:
+        logger.exception('No se pudieron completar las fotos de %s taxones', len(ids))
+    finally:
+        _en_vuelo.discard(clave)
+
+
+def enriquecer_fotos(ids):
+    """Busca en segundo plano las fotos de taxones de iNaturalist, sin esperar"""
+    ids = sorted(ids)
+    for inicio in range(0, len(ids), TAXONES_POR_CONSULTA):
+        _lanzar(_fotos(ids[inicio:inicio + TAXONES_POR_CONSULTA]))
@@ -0,0 +1,35 @@
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import router
+
+from appProyecto.archivo import PARES, archivar, candidatas
+from appProyecto.paginacion import actualizar_estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Mueve a las tablas de archivo las denuncias cerradas antiguas y su historial (programar cada noche)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=None, help='Meses sin cambios (por defecto ARCHIVO_MESES)')
+        parser.add_argument('--lote', type=int, default=1000, help='Denuncias movidas por transacción')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes')
+        parser.add_argument('--simular', action='store_true', help='Solo contar las candidatas')
+
+    def handle(self, *args, **options):
+        meses = settings.ARCHIVO_MESES if options['meses'] is None else options['meses']
+        if options['simular']:
+            self.stdout.write(f'ℹ️ {candidatas(meses).count()} denuncias cerradas hace más de {meses} meses.')
+            return
+
+        inicio = time.perf_counter()
+        movidas = archivar(meses, lote=options['lote'], pausa=options['pausa'])
+        if movidas:
+            # El admin pagina estas tablas con la estimación del motor
+            for modelo in chain.from_iterable(PARES):
+                actualizar_estadisticas([modelo], using=router.db_for_write(modelo))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {movidas} denuncias archivadas ({time.perf_counter() - inicio:.1f}s).'
+        ))
@@ -0,0 +1,65 @@
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from appProyecto.basedatos import atomico
+from appProyecto.elevacion import raster
+from appProyecto.models import Ubicacion
+
+
+class Command(BaseCommand):
+    help = 'Completa por lotes la altitud de las ubicaciones muestreando el raster de elevación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20000, help='Ubicaciones por lote')
+        parser.add_argument('--todas', action='store_true', help='Recalcular también las que ya tienen altitud')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes')
+
+    def handle(self, *args, **options):
+        actual = raster()
+        if actual is None:
+            raise CommandError('❌ No hay raster de elevación (ELEVACION_RASTER y su .json).')
+
+        queryset = Ubicacion.objects.all() if options['todas'] else Ubicacion.objects.filter(altitud__isnull=True)
+        conexion = connections[router.db_for_write(Ubicacion)]
+        q = conexion.ops.quote_name
+        sql = f'UPDATE {q(Ubicacion._meta.db_table)} SET {q("altitud")} = %s WHERE {q("id")} = %s'
+        inicio = time.perf_counter()
+        revisadas = asignadas = 0
+        ultimo_id = 0
+        while True:
+            filas = list(
+                queryset.filter(pk__gt=ultimo_id)
+                .order_by('pk')
+                .values_list('pk', 'latitud', 'longitud')[:options['lote']]
+            )
+            if not filas:
+                break
+            ids, latitudes, longitudes = zip(*filas)
+            altitudes = actual.muestrear(
+                np.array(latitudes, dtype=np.float64),
+                np.array(longitudes, dtype=np.float64)
+            )
+
+            cambios = [
+                (Decimal(str(round(float(altitud), 2))), pk)
+                for pk, altitud in zip(ids, altitudes)
+                if not np.isnan(altitud)
+            ]
+            # UPDATE por pk con executemany: bulk_update arma un CASE por lote
+            # que el motor evalúa fila a fila y se vuelve cuadrático
+            with atomico(), conexion.cursor() as cursor:
+                cursor.executemany(sql, cambios)
+
+            revisadas += len(ids)
+            asignadas += len(cambios)
+            ultimo_id = ids[-1]
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {asignadas} de {revisadas} ubicaciones con altitud ({time.perf_counter() - inicio:.1f}s).'
+        ))
@@ -0,0 +1,58 @@
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from appProyecto.basedatos import atomico
+from appProyecto.models import Ubicacion
+from appProyecto.regiones import indice
+
+
+class Command(BaseCommand):
+    help = 'Asigna por lotes región y comuna a las ubicaciones con el índice de límites comunales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20000, help='Ubicaciones por lote')
+        parser.add_argument('--todas', action='store_true', help='Recalcular también las que ya tienen región')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes')
+
+    def handle(self, *args, **options):
+        actual = indice()
+        if actual is None:
+            raise CommandError('❌ No hay archivo de límites comunales (REGIONES_GEOJSON).')
+
+        queryset = Ubicacion.objects.all() if options['todas'] else Ubicacion.objects.filter(region__isnull=True)
+        inicio = time.perf_counter()
+        total = 0
+        ultimo_id = 0
+        while True:
+            filas = list(
+                queryset.filter(pk__gt=ultimo_id)
+                .order_by('pk')
+                .values_list('pk', 'latitud', 'longitud')[:options['lote']]
+            )
+            if not filas:
+                break
+            ids, latitudes, longitudes = zip(*filas)
+            asignadas = actual.asignar(
+                np.array(latitudes, dtype=np.float64),
+                np.array(longitudes, dtype=np.float64)
+            )
+
+            # Un UPDATE por comuna presente en el lote, no uno por fila
+            por_codigo = defaultdict(list)
+            for pk, codigos in zip(ids, asignadas):
+                por_codigo[codigos].append(pk)
+            with atomico():
+                for (region, comuna), pks in por_codigo.items():
+                    Ubicacion.objects.filter(pk__in=pks).update(region=region, comuna=comuna)
+
+            total += len(ids)
+            ultimo_id = ids[-1]
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} ubicaciones con región asignada ({time.perf_counter() - inicio:.1f}s).'
+        ))
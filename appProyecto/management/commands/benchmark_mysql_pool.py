@@ -0,0 +1,94 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from appProyecto.db_backends.mysql_pool.base import DatabaseWrapper as PoolDatabaseWrapper, pool_de
+
+MODOS = {
+    'sin_pool': MySQLDatabaseWrapper,
+    'pool': PoolDatabaseWrapper,
+}
+
+
+def _simular(clase, settings_dict, alias, peticiones, consultas, resultados):
+    """Un hilo = un worker atendiendo peticiones: conectar, consultar, cerrar"""
+    conexion = clase(dict(settings_dict), alias)
+    latencias = []
+    errores = 0
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        try:
+            with conexion.cursor() as cursor:
+                for _ in range(consultas):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+        except OperationalError:
+            errores += 1
+        finally:
+            # Lo que hace request_finished con CONN_MAX_AGE = 0
+            conexion.close()
+        latencias.append(time.perf_counter() - inicio)
+    resultados.append((latencias, errores))
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia por petición de MySQL con y sin pool de conexiones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4, help='Peticiones concurrentes')
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones por hilo')
+        parser.add_argument('--consultas', type=int, default=3, help='Consultas por petición')
+        parser.add_argument('--tamano', type=int, default=None, help='Tamaño del pool (por defecto el de settings)')
+        parser.add_argument('--modo', choices=tuple(MODOS) + ('ambos',), default='ambos')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError('El benchmark solo aplica a MySQL (DEBUG=True).')
+
+        settings_dict = dict(connection.settings_dict)
+        settings_dict['POOL'] = dict(settings_dict.get('POOL') or {})
+        if options['tamano']:
+            settings_dict['POOL']['TAMANO'] = options['tamano']
+
+        self.stdout.write(
+            f"Hilos: {options['hilos']} | {options['peticiones']} peticiones por hilo | "
+            f"{options['consultas']} consultas por petición"
+        )
+        modos = tuple(MODOS) if options['modo'] == 'ambos' else (options['modo'],)
+        for modo in modos:
+            alias = f'benchmark_{modo}'
+            resultados = []
+            hilos = [
+                threading.Thread(
+                    target=_simular,
+                    args=(MODOS[modo], settings_dict, alias, options['peticiones'], options['consultas'], resultados)
+                )
+                for _ in range(options['hilos'])
+            ]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+
+            latencias = sorted(latencia for r in resultados for latencia in r[0])
+            errores = sum(r[1] for r in resultados)
+            self._reportar(modo, latencias, errores, duracion)
+            if modo == 'pool':
+                pool = pool_de(alias, settings_dict['POOL'])
+                self.stdout.write(f'{"":>11}  pool: {pool.estado()}')
+                pool.cerrar_todas()
+
+    def _reportar(self, modo, latencias, errores, duracion):
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+
+        self.stdout.write(
+            f'{modo:>11}: {len(latencias) / duracion:7.1f} peticiones/s | '
+            f'p50 {percentil(0.5):6.2f} ms | p95 {percentil(0.95):6.2f} ms | '
+            f'{errores} errores'
+        )
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+
+MOTORES = {
+    'db': 'django.contrib.sessions.backends.db.SessionStore',
+    'cached_db': 'django.contrib.sessions.backends.cached_db.SessionStore',
+    'silvasentinel': 'appProyecto.sesiones.SessionStore',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compara escrituras sobre django_session por cada 1.000 peticiones según el motor de sesión'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=1000)
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos simulados entre peticiones de la misma sesión')
+        parser.add_argument('--modificar-cada', type=int, default=0,
+                            help='Marca la sesión como modificada cada N peticiones (0 = nunca)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Peticiones: {options['peticiones']} | intervalo: {options['intervalo']}s | "
+            f"umbral de renovación: {settings.SESSION_REFRESH_THRESHOLD}s"
+        )
+        for nombre, ruta in MOTORES.items():
+            escrituras, lecturas = self._medir(import_string(ruta), options)
+            por_mil = escrituras * 1000 / options['peticiones']
+            self.stdout.write(
+                f'{nombre:>14}: {escrituras} escrituras, {lecturas} lecturas en BD '
+                f'({por_mil:.1f} escrituras / 1k peticiones)'
+            )
+
+    def _medir(self, Store, options):
+        reloj = {'t': 0.0}
+
+        class StoreSimulado(Store):
+            def _ahora(self):
+                return reloj['t']
+
+        sesion = StoreSimulado()
+        sesion['_auth_user_id'] = '1'
+        sesion.create()
+        clave = sesion.session_key
+
+        escrituras = lecturas = 0
+        try:
+            for i in range(1, options['peticiones'] + 1):
+                reloj['t'] += options['intervalo']
+                with CaptureQueriesContext(connection) as consultas:
+                    # Lo mismo que hacen SessionMiddleware y AuthenticationMiddleware
+                    store = StoreSimulado(clave)
+                    store.get('_auth_user_id')
+                    if options['modificar_cada'] and i % options['modificar_cada'] == 0:
+                        store['ultima_visita'] = i
+                    if store.modified or settings.SESSION_SAVE_EVERY_REQUEST:
+                        store.save()
+                for consulta in consultas.captured_queries:
+                    sql = consulta['sql'].lstrip().upper()
+                    if 'DJANGO_SESSION' not in sql:
+                        continue
+                    if sql.startswith(('UPDATE', 'INSERT')):
+                        escrituras += 1
+                    elif sql.startswith('SELECT'):
+                        lecturas += 1
+        finally:
+            StoreSimulado(clave).delete()
+
+        return escrituras, lecturas
@@ -0,0 +1,183 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from appProyecto.basedatos import es_bloqueo
+from appProyecto.models import Categoria, Denuncia, Usuario
+
+
+PERFILES = ('base', 'produccion')
+
+
+def _preparar_perfil(perfil, ruta):
+    """Apunta la conexión del proceso a la copia y aplica (o quita) el perfil"""
+    conexion = connections['default']
+    conexion.close()
+    conexion.settings_dict['NAME'] = ruta
+    settings.TAREAS_SINCRONAS = True
+    if perfil == 'base':
+        # Lo que había antes: pragmas por defecto, transacciones DEFERRED, sin reintentos
+        conexion.settings_dict['OPTIONS'] = {}
+        settings.SQLITE_PRAGMAS = {}
+        settings.SQLITE_REINTENTOS = 0
+
+
+def _lectura():
+    """Lo que hace pagina6: una página del listado y los contadores"""
+    list(Denuncia.objects.select_related('usuario', 'categoria').order_by('-fecha_creacion')[:50])
+    Denuncia.objects.filter(estado='pendiente').count()
+
+
+def _escritura(rng, usuario, categoria_id, max_id):
+    """Alta por el servicio de pagina2 o triage (lee y luego escribe)"""
+    from appProyecto.servicios import DenunciaCreationService
+    from appProyecto.transiciones import transicionar_lote
+
+    if rng.random() < 0.5:
+        DenunciaCreationService(usuario, '127.0.0.1').crear(
+            categoria_id=categoria_id,
+            titulo='Benchmark',
+            descripcion='Carga concurrente',
+            latitud=f'{-33.4 - rng.random() / 10:.6f}',
+            longitud=f'{-70.6 - rng.random() / 10:.6f}',
+        )
+    else:
+        ids = [rng.randint(1, max_id) for _ in range(5)]
+        transicionar_lote(Denuncia.objects.filter(pk__in=ids), rng.choice(['en_proceso', 'pendiente']), usuario)
+
+
+def _trabajador(perfil, ruta, segundos, proporcion_escrituras, semilla, cola):
+    _preparar_perfil(perfil, ruta)
+    rng = random.Random(semilla)
+    usuario = Usuario.objects.get(username='benchmark_sqlite')
+    categoria_id = Categoria.objects.values_list('id', flat=True).get(slug='benchmark-sqlite')
+    max_id = Denuncia.objects.order_by('-id').values_list('id', flat=True).first()
+
+    completadas = bloqueos = 0
+    latencias = []
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            if rng.random() < proporcion_escrituras:
+                _escritura(rng, usuario, categoria_id, max_id)
+            else:
+                _lectura()
+        except OperationalError as error:
+            if not es_bloqueo(error):
+                raise
+            bloqueos += 1
+            continue
+        completadas += 1
+        latencias.append(time.perf_counter() - inicio)
+
+    connections.close_all()
+    cola.put((completadas, bloqueos, latencias))
+
+
+class Command(BaseCommand):
+    help = 'Mide peticiones/s y errores "database is locked" con N procesos concurrentes, sin y con el perfil SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Procesos concurrentes (como workers de gunicorn)')
+        parser.add_argument('--segundos', type=float, default=10.0, help='Duración de cada medición')
+        parser.add_argument('--escrituras', type=float, default=0.3, help='Proporción de peticiones que escriben')
+        parser.add_argument('--perfil', choices=PERFILES + ('ambos',), default='ambos')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('El benchmark solo aplica a SQLite (DEBUG=False).')
+
+        origen = str(connection.settings_dict['NAME'])
+        nombre_original = connection.settings_dict['NAME']
+        opciones_originales = dict(connection.settings_dict.get('OPTIONS', {}))
+        perfiles = PERFILES if options['perfil'] == 'ambos' else (options['perfil'],)
+
+        self.stdout.write(
+            f"Workers: {options['workers']} | {options['segundos']}s por perfil | "
+            f"escrituras: {options['escrituras']:.0%}"
+        )
+        with tempfile.TemporaryDirectory() as directorio:
+            for perfil in perfiles:
+                ruta = os.path.join(directorio, f'{perfil}.sqlite3')
+                self._copiar(origen, ruta, perfil)
+                try:
+                    self._sembrar(ruta)
+                    completadas, bloqueos, latencias = self._medir(perfil, ruta, options)
+                finally:
+                    connection.close()
+                    connection.settings_dict['NAME'] = nombre_original
+                    connection.settings_dict['OPTIONS'] = opciones_originales
+                self._reportar(perfil, completadas, bloqueos, latencias, options['segundos'])
+
+    def _copiar(self, origen, ruta, perfil):
+        """
+        Copia consistente con la API de backup de sqlite3. El modo de journal
+        queda fijado en el archivo antes de que arranquen los workers.
+        """
+        fuente = sqlite3.connect(origen)
+        destino = sqlite3.connect(ruta)
+        try:
+            fuente.backup(destino)
+            destino.execute(f"PRAGMA journal_mode = {'WAL' if perfil == 'produccion' else 'DELETE'}")
+        finally:
+            fuente.close()
+            destino.close()
+
+    def _sembrar(self, ruta):
+        """Usuario, categoría y denuncias mínimas para el benchmark"""
+        connection.close()
+        connection.settings_dict['NAME'] = ruta
+        with override_settings(SQLITE_PRAGMAS={}):
+            usuario, _ = Usuario.objects.get_or_create(username='benchmark_sqlite', defaults={'rol': 'revisor'})
+            categoria, _ = Categoria.objects.get_or_create(
+                slug='benchmark-sqlite', defaults={'nombre': 'Benchmark SQLite'}
+            )
+            faltantes = 1000 - Denuncia.objects.count()
+            if faltantes > 0:
+                Denuncia.objects.bulk_create([
+                    Denuncia(usuario=usuario, categoria=categoria, titulo=f'Semilla {i}', descripcion='-')
+                    for i in range(faltantes)
+                ])
+            connections.close_all()
+
+    def _medir(self, perfil, ruta, options):
+        contexto = multiprocessing.get_context('fork')
+        cola = contexto.Queue()
+        procesos = [
+            contexto.Process(
+                target=_trabajador,
+                args=(perfil, ruta, options['segundos'], options['escrituras'], semilla, cola)
+            )
+            for semilla in range(options['workers'])
+        ]
+        for proceso in procesos:
+            proceso.start()
+        resultados = [cola.get() for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+
+        completadas = sum(r[0] for r in resultados)
+        bloqueos = sum(r[1] for r in resultados)
+        latencias = sorted(latencia for r in resultados for latencia in r[2])
+        return completadas, bloqueos, latencias
+
+    def _reportar(self, perfil, completadas, bloqueos, latencias, segundos):
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+
+        total = completadas + bloqueos
+        self.stdout.write(
+            f'{perfil:>11}: {completadas / segundos:7.1f} peticiones/s | '
+            f'p50 {percentil(0.5):6.1f} ms | p95 {percentil(0.95):7.1f} ms | '
+            f'{bloqueos} "database is locked" ({bloqueos / total:.1%} de {total})' if total else
+            f'{perfil:>11}: sin peticiones completadas'
+        )
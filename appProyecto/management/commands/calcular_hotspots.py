@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appProyecto.hotspots import actualizar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los focos de denuncias recientes de las categorías con cambios (programar cada 15 minutos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Recalcular todas las categorías aunque no cambien')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        recalculadas = actualizar(todas=options['todas'])
+        if not recalculadas:
+            self.stdout.write('ℹ️ Sin cambios en la ventana: focos al día.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(recalculadas)} categorías recalculadas, {sum(recalculadas.values())} focos '
+            f'({time.perf_counter() - inicio:.1f}s).'
+        ))
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import BigIntegerField, Case, Value, When
+
+from appProyecto.basedatos import atomico
+from appProyecto.models import Ubicacion, clave_ubicacion
+
+
+def _lotes(elementos, tamano):
+    for inicio in range(0, len(elementos), tamano):
+        yield elementos[inicio:inicio + tamano]
+
+
+class Command(BaseCommand):
+    help = (
+        'Fusiona las ubicaciones con la misma clave cuantizada en la más antigua, '
+        'reapunta en bloque las FKs que las referencian y completa la clave'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--decimales', type=int, default=None, help='Precisión (por defecto UBICACION_DECIMALES)')
+        parser.add_argument('--lote', type=int, default=500, help='Duplicadas fusionadas por transacción')
+        parser.add_argument('--simular', action='store_true', help='Solo contar duplicadas')
+
+    def handle(self, *args, **options):
+        decimales = settings.UBICACION_DECIMALES if options['decimales'] is None else options['decimales']
+
+        canonicas = {}   # clave → id de la ubicación que se conserva
+        duplicadas = {}  # id → id canónico
+        claves = {}      # id canónico → (clave actual, clave nueva)
+        filas = Ubicacion.objects.order_by('pk').values_list('pk', 'clave', 'latitud', 'longitud')
+        for pk, actual, latitud, longitud in filas.iterator(chunk_size=5000):
+            clave = clave_ubicacion(latitud, longitud, decimales)
+            canonica = canonicas.setdefault(clave, pk)
+            if canonica == pk:
+                claves[pk] = (actual, clave)
+            else:
+                duplicadas[pk] = canonica
+
+        cambian = {pk: nueva for pk, (actual, nueva) in claves.items() if actual != nueva}
+        if options['simular']:
+            self.stdout.write(
+                f'ℹ️ {len(duplicadas)} duplicadas en {len(canonicas)} ubicaciones; '
+                f'{len(cambian)} claves por completar (decimales={decimales}).'
+            )
+            return
+
+        relaciones = [
+            relacion for relacion in Ubicacion._meta.related_objects
+            if relacion.one_to_many or relacion.one_to_one
+        ]
+        reapuntadas = 0
+        for lote in _lotes(list(duplicadas.items()), options['lote']):
+            ids = [pk for pk, _ in lote]
+            with atomico():
+                for relacion in relaciones:
+                    campo = relacion.field.attname
+                    reapuntadas += relacion.related_model._base_manager.filter(**{f'{campo}__in': ids}).update(**{
+                        campo: Case(
+                            *(When(**{campo: pk}, then=Value(canonica)) for pk, canonica in lote),
+                            output_field=BigIntegerField()
+                        )
+                    })
+                Ubicacion.objects.filter(pk__in=ids).delete()
+
+        # Sin duplicadas ya no hay choques; se anulan primero las claves que cambian
+        # por si la precisión es otra y una clave vieja coincide con una nueva
+        with atomico():
+            for ids in _lotes(list(cambian), options['lote']):
+                Ubicacion.objects.filter(pk__in=ids).update(clave=None)
+            Ubicacion.objects.bulk_update(
+                [Ubicacion(pk=pk, clave=clave) for pk, clave in cambian.items()],
+                ['clave'],
+                batch_size=options['lote']
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(duplicadas)} ubicaciones duplicadas fusionadas ({reapuntadas} referencias reapuntadas); '
+            f'{len(cambian)} claves actualizadas.'
+        ))
@@ -0,0 +1,74 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appProyecto.basedatos import atomico
+from appProyecto.models import Denuncia, Ubicacion
+from appProyecto.nomenclator import geocodificar, nomenclator, normalizar
+
+
+class Command(BaseCommand):
+    help = 'Geocodifica sin red las denuncias sin ubicación a partir del lugar que escribió el denunciante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Denuncias por lote')
+        parser.add_argument('--descripcion', action='store_true',
+                            help='Sin ubicacion_texto, buscar el lugar en el título y la descripción')
+        parser.add_argument('--simular', action='store_true', help='Solo informar lo que se geocodificaría')
+
+    def handle(self, *args, **options):
+        if nomenclator() is None:
+            raise CommandError('❌ No hay nomenclátor (NOMENCLATOR_ARCHIVO).')
+
+        queryset = Denuncia.objects.filter(ubicacion__isnull=True)
+        if not options['descripcion']:
+            queryset = queryset.filter(ubicacion_texto__gt='')
+
+        inicio = time.perf_counter()
+        revisadas = geocodificadas = 0
+        resultados = {}   # texto normalizado → Resultado (los textos se repiten mucho)
+        ubicaciones = {}  # (latitud, longitud) → id de Ubicacion
+        ultimo_id = 0
+        while True:
+            filas = list(
+                queryset.filter(pk__gt=ultimo_id)
+                .order_by('pk')
+                .values_list('pk', 'ubicacion_texto', 'titulo', 'descripcion')[:options['lote']]
+            )
+            if not filas:
+                break
+
+            por_lugar = defaultdict(list)
+            for pk, texto, titulo, descripcion in filas:
+                texto = texto or f'{titulo} {descripcion}'
+                clave = normalizar(texto)
+                if clave not in resultados:
+                    resultados[clave] = geocodificar(texto)
+                lugar = resultados[clave]
+                if lugar is not None:
+                    por_lugar[lugar].append(pk)
+
+            revisadas += len(filas)
+            geocodificadas += sum(len(pks) for pks in por_lugar.values())
+            ultimo_id = filas[-1][0]
+            if options['simular']:
+                continue
+
+            # Un UPDATE por lugar del lote; la Ubicacion se interna una sola vez
+            with atomico():
+                for lugar, pks in por_lugar.items():
+                    coordenadas = (round(lugar.latitud, 6), round(lugar.longitud, 6))
+                    if coordenadas not in ubicaciones:
+                        ubicaciones[coordenadas] = Ubicacion.objects.internar(
+                            *coordenadas, lugar.nombre, origen='nomenclator', confianza=lugar.confianza
+                        ).pk
+                    Denuncia.objects.filter(pk__in=pks, ubicacion__isnull=True).update(
+                        ubicacion_id=ubicaciones[coordenadas]
+                    )
+
+        verbo = 'se geocodificarían' if options['simular'] else 'geocodificadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {geocodificadas} de {revisadas} denuncias {verbo} '
+            f'({len(ubicaciones)} ubicaciones, {time.perf_counter() - inicio:.1f}s).'
+        ))
@@ -0,0 +1,83 @@
+import time
+from xml.etree.ElementTree import ParseError
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appProyecto.basedatos import atomico
+from appProyecto.catalogo import RANGOS_ESPECIE, leer_catalogo, publicar_version
+from appProyecto.models import NombreTaxon, Taxon
+from appProyecto.nomenclator import normalizar
+
+
+class Command(BaseCommand):
+    help = 'Importa el catálogo local de especies desde un Darwin Core Archive de taxonomía (iNaturalist o GBIF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help='inaturalist-taxonomy.dwca.zip, backbone de GBIF o carpeta con meta.xml')
+        parser.add_argument('--fuente', choices=('inaturalist', 'gbif'), default='inaturalist',
+                            help='Origen de los ids (solo los de iNaturalist sirven para pedir fotos)')
+        parser.add_argument('--rangos', default=','.join(RANGOS_ESPECIE),
+                            help='Rangos a importar, separados por coma (p. ej. species,genus)')
+        parser.add_argument('--todos', action='store_true',
+                            help='Incluir también los taxones sin nombre común en español')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            taxones = leer_catalogo(
+                options['ruta'],
+                rangos=tuple(rango.strip().lower() for rango in options['rangos'].split(',')),
+                solo_con_nombre=not options['todos'],
+            )
+        except (OSError, KeyError, ValueError, ParseError) as error:
+            raise CommandError(f'❌ No se pudo leer el archivo: {error}')
+        if not taxones:
+            raise CommandError('❌ El archivo no tiene taxones de Plantae ni Animalia con esos filtros.')
+        self.stdout.write(f'ℹ️ {len(taxones)} taxones leídos ({time.perf_counter() - inicio:.1f}s).')
+
+        # Las fotos ya encontradas sobreviven a la reimportación
+        fotos = {
+            pk: (url, revisada)
+            for pk, url, revisada in Taxon.objects.exclude(foto_revisada=None)
+            .values_list('pk', 'foto_url', 'foto_revisada').iterator()
+        }
+
+        nombres = 0
+        with atomico():
+            NombreTaxon.objects.all().delete()
+            Taxon.objects.all().delete()
+            lote_taxones, lote_nombres = [], []
+            for taxon_id, datos in taxones.items():
+                foto_url, foto_revisada = fotos.get(taxon_id, ('', None))
+                lote_taxones.append(Taxon(
+                    id=taxon_id,
+                    fuente=options['fuente'],
+                    nombre_cientifico=datos['nombre_cientifico'],
+                    rango=datos['rango'],
+                    grupo=datos['grupo'],
+                    clase=datos['clase'],
+                    nombre_comun=datos['nombres'][0][:255] if datos['nombres'] else '',
+                    foto_url=foto_url,
+                    foto_revisada=foto_revisada,
+                ))
+                vistos = set()
+                for nombre, cientifico in [(datos['nombre_cientifico'], True)] + [(n, False) for n in datos['nombres']]:
+                    normalizado = normalizar(nombre)[:255]
+                    if normalizado and normalizado not in vistos:
+                        vistos.add(normalizado)
+                        lote_nombres.append(NombreTaxon(
+                            taxon_id=taxon_id, nombre=nombre[:255], normalizado=normalizado, cientifico=cientifico
+                        ))
+                if len(lote_taxones) >= options['lote']:
+                    Taxon.objects.bulk_create(lote_taxones)
+                    nombres += len(NombreTaxon.objects.bulk_create(lote_nombres))
+                    lote_taxones, lote_nombres = [], []
+            Taxon.objects.bulk_create(lote_taxones)
+            nombres += len(NombreTaxon.objects.bulk_create(lote_nombres))
+
+        publicar_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Catálogo importado: {len(taxones)} taxones, {nombres} nombres '
+            f'({time.perf_counter() - inicio:.1f}s).'
+        ))
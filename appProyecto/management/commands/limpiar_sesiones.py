@@ -0,0 +1,34 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Elimina por lotes las sesiones expiradas (evita bloqueos largos en SQLite)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Sesiones borradas por transacción')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes')
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        Session = engine.SessionStore.get_model_class()
+        ahora = timezone.now()
+
+        total = 0
+        while True:
+            claves = list(
+                Session.objects.filter(expire_date__lt=ahora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not claves:
+                break
+            borradas, _ = Session.objects.filter(session_key__in=claves).delete()
+            total += borradas
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} sesiones expiradas eliminadas.'))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from appProyecto.inaturalist import METRICAS, metricas, reiniciar_metricas
+
+
+class Command(BaseCommand):
+    help = 'Muestra los aciertos de la caché de búsquedas de iNaturalist (para ajustar sus TTL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reiniciar', action='store_true', help='Poner los contadores en cero después de mostrarlos')
+
+    def handle(self, *args, **options):
+        actuales = metricas()
+        for nombre in METRICAS:
+            self.stdout.write(f'{nombre:>20}: {actuales[nombre]}')
+        if actuales['tasa_aciertos'] is None:
+            self.stdout.write('ℹ️ Aún no hay búsquedas registradas.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Tasa de aciertos: {actuales['tasa_aciertos']:.1%}"))
+        backend = settings.CACHES['default']['BACKEND']
+        if 'redis' not in backend and 'memcached' not in backend:
+            self.stdout.write('⚠️ La caché no incrementa de forma atómica: con varios workers los contadores son aproximados.')
+        if options['reiniciar']:
+            reiniciar_metricas()
+            self.stdout.write('ℹ️ Contadores reiniciados.')
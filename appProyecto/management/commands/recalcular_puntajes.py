@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from appProyecto.priorizacion import recalcular_todas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en lotes vectorizados el puntaje de urgencia (programar cada hora)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Denuncias por lote')
+        parser.add_argument('--todas', action='store_true', help='Incluir denuncias resueltas y rechazadas')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        procesadas, actualizadas = recalcular_todas(lote=options['lote'], incluir_cerradas=options['todas'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {procesadas} denuncias puntuadas, {actualizadas} con puntaje nuevo '
+            f'({time.perf_counter() - inicio:.1f}s).'
+        ))
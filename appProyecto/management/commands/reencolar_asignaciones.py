@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from appProyecto.cola_trabajo import reencolar_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Devuelve a la cola de trabajo las denuncias con reclamo vencido'
+
+    def handle(self, *args, **options):
+        total = reencolar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} denuncias devueltas a la cola.'))
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+try:
+    import zstandard
+except ImportError:  # opcional: sin él solo hay gzip
+    zstandard = None
+
+BLOQUE = 1024 * 1024  # bytes leídos por vez al comprimir y verificar
+EXTENSIONES = {'gzip': '.gz', 'zstd': '.zst'}
+MAX_REINICIOS = 3
+
+
+class _CopiaReiniciada(Exception):
+    pass
+
+
+def _abrir_comprimido(ruta, formato, modo):
+    if formato == 'gzip':
+        return gzip.open(ruta, modo, compresslevel=6)
+    if modo == 'wb':
+        return zstandard.ZstdCompressor(level=10, threads=-1).stream_writer(open(ruta, 'wb'), closefd=True)
+    return zstandard.ZstdDecompressor().stream_reader(open(ruta, 'rb'), closefd=True)
+
+
+def _bloques(archivo):
+    while True:
+        bloque = archivo.read(BLOQUE)
+        if not bloque:
+            return
+        yield bloque
+
+
+class Command(BaseCommand):
+    help = 'Respaldo en caliente de la base SQLite (API de backup por pasos), comprimido, verificado y con rotación'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias de la base a respaldar')
+        parser.add_argument('--destino', default=None, help='Directorio de respaldos (por defecto RESPALDOS_DIR)')
+        parser.add_argument('--paginas', type=int, default=256, help='Páginas copiadas por paso')
+        parser.add_argument('--pausa', type=float, default=0.05, help='Segundos de espera entre pasos (deja escribir a la app)')
+        parser.add_argument('--compresion', choices=tuple(EXTENSIONES), default='gzip')
+        parser.add_argument('--conservar', type=int, default=None, help='Respaldos a conservar (por defecto RESPALDOS_CONSERVAR; 0 = no rotar)')
+
+    def handle(self, *args, **options):
+        conexion = connections[options['database']]
+        if conexion.vendor != 'sqlite':
+            raise CommandError('El respaldo en caliente solo aplica a SQLite (DEBUG=False).')
+        if options['compresion'] == 'zstd' and zstandard is None:
+            raise CommandError('Falta el paquete zstandard: usa --compresion gzip o instálalo.')
+
+        origen = str(conexion.settings_dict['NAME'])
+        destino = options['destino'] or settings.RESPALDOS_DIR
+        os.makedirs(destino, exist_ok=True)
+
+        prefijo = os.path.splitext(os.path.basename(origen))[0]
+        nombre = f"{prefijo}-{datetime.now():%Y%m%d-%H%M%S}.sqlite3{EXTENSIONES[options['compresion']]}"
+        copia = os.path.join(destino, f'.{nombre}.copia')
+        final = os.path.join(destino, nombre)
+        parcial = f'{final}.parcial'
+
+        try:
+            inicio = time.monotonic()
+            paginas = self._copiar(origen, copia, options['paginas'], options['pausa'])
+            self._verificar_integridad(copia)
+            huella = self._comprimir(copia, parcial, options['compresion'])
+            if self._huella_comprimido(parcial, options['compresion']) != huella:
+                raise CommandError('❌ El archivo comprimido no coincide con la copia: respaldo descartado.')
+            os.replace(parcial, final)
+            # Formato de sha256sum: `sha256sum -c` verifica el archivo comprimido
+            with open(f'{final}.sha256', 'w') as archivo:
+                archivo.write(f'{self._huella_archivo(final)}  {nombre}\n')
+        finally:
+            for temporal in (copia, parcial):
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+
+        tamano = os.path.getsize(final) / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Respaldo {final}: {paginas} páginas, {tamano:.1f} MB comprimido, '
+            f'{time.monotonic() - inicio:.1f}s (sha256 de la copia {huella[:12]}…)'
+        ))
+
+        conservar = options['conservar'] if options['conservar'] is not None else settings.RESPALDOS_CONSERVAR
+        for eliminado in self._rotar(destino, prefijo, conservar):
+            self.stdout.write(f'ℹ️ Rotación: eliminado {eliminado}')
+
+    def _copiar(self, origen, copia, paginas, pausa):
+        """
+        API de backup de SQLite: copia `paginas` por paso y suelta el lock de
+        lectura entre pasos; la pausa deja pasar a los escritores. Si otra
+        conexión escribe entre pasos, SQLite reinicia la copia (el resultado
+        siempre es una instantánea consistente); tras MAX_REINICIOS se copia
+        en un solo paso, que en WAL no bloquea a los escritores.
+        """
+        total = 0
+        restantes_previas = None
+        reinicios = 0
+
+        def progreso(estado, restantes, paginas_totales):
+            nonlocal total, restantes_previas, reinicios
+            total = paginas_totales
+            # Tras un reinicio lo restante no baja (vuelve a "todo menos un paso")
+            if restantes_previas is not None and restantes >= restantes_previas:
+                reinicios += 1
+                if reinicios > MAX_REINICIOS:
+                    raise _CopiaReiniciada
+            restantes_previas = restantes
+            if restantes and pausa:
+                time.sleep(pausa)
+
+        if not os.path.exists(origen):
+            raise CommandError(f'❌ No existe la base {origen}')
+        fuente = sqlite3.connect(origen)
+        copia_db = sqlite3.connect(copia)
+        try:
+            try:
+                fuente.backup(copia_db, pages=paginas, progress=progreso, sleep=pausa or 0.05)
+            except _CopiaReiniciada:
+                self.stdout.write(f'ℹ️ La copia se reinició {reinicios} veces por escrituras: se completa en un paso')
+                fuente.backup(copia_db)
+            # Un solo archivo autocontenido (sin -wal al lado)
+            copia_db.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            fuente.close()
+            copia_db.close()
+        return total
+
+    def _verificar_integridad(self, copia):
+        conexion = sqlite3.connect(copia)
+        try:
+            resultado = [fila[0] for fila in conexion.execute('PRAGMA integrity_check')]
+        finally:
+            conexion.close()
+        if resultado != ['ok']:
+            raise CommandError(f'❌ integrity_check falló en la copia: {"; ".join(resultado[:5])}')
+
+    def _comprimir(self, copia, parcial, formato):
+        """Comprime por bloques (memoria constante) y retorna el sha256 de la copia"""
+        huella = hashlib.sha256()
+        with open(copia, 'rb') as entrada, _abrir_comprimido(parcial, formato, 'wb') as salida:
+            for bloque in _bloques(entrada):
+                huella.update(bloque)
+                salida.write(bloque)
+        return huella.hexdigest()
+
+    def _huella_comprimido(self, ruta, formato):
+        """sha256 del contenido descomprimido, también por bloques"""
+        huella = hashlib.sha256()
+        with _abrir_comprimido(ruta, formato, 'rb') as entrada:
+            for bloque in _bloques(entrada):
+                huella.update(bloque)
+        return huella.hexdigest()
+
+    def _huella_archivo(self, ruta):
+        huella = hashlib.sha256()
+        with open(ruta, 'rb') as entrada:
+            for bloque in _bloques(entrada):
+                huella.update(bloque)
+        return huella.hexdigest()
+
+    def _rotar(self, destino, prefijo, conservar):
+        """Deja los `conservar` respaldos más recientes de esta base"""
+        respaldos = sorted(
+            nombre for nombre in os.listdir(destino)
+            if nombre.startswith(f'{prefijo}-') and nombre.endswith(tuple(EXTENSIONES.values()))
+        )
+        eliminados = respaldos[:-conservar] if conservar > 0 else []
+        for nombre in eliminados:
+            for ruta in (os.path.join(destino, nombre), os.path.join(destino, f'{nombre}.sha256')):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        return eliminados
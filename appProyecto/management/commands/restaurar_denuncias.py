@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appProyecto.archivo import restaurar
+from appProyecto.models import DenunciaArchivada
+
+
+class Command(BaseCommand):
+    help = 'Devuelve denuncias archivadas (con su historial) a la tabla principal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', default='', help='IDs separados por comas')
+        parser.add_argument('--todas', action='store_true', help='Restaurar todo el archivo')
+        parser.add_argument('--lote', type=int, default=1000, help='Denuncias movidas por transacción')
+
+    def handle(self, *args, **options):
+        if options['todas']:
+            queryset = DenunciaArchivada.objects.all()
+        elif options['ids']:
+            try:
+                ids = [int(valor) for valor in options['ids'].split(',') if valor.strip()]
+            except ValueError:
+                raise CommandError('--ids debe ser una lista de números separados por comas.')
+            queryset = DenunciaArchivada.objects.filter(pk__in=ids)
+        else:
+            raise CommandError('Indica --ids o --todas.')
+
+        restauradas = restaurar(queryset, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {restauradas} denuncias restauradas.'))
@@ -7,6 +7,11 @@ import django.utils.timezone
 from django.conf import settings
 from django.db import migrations, models
 
+from appProyecto.enrutador import auditoria_separada
+
+# Con la auditoría en otra base la FK no puede existir en el motor
+AUDITORIA_SEPARADA = auditoria_separada()
+
 
 class Migration(migrations.Migration):
 
@@ -100,8 +105,8 @@ class Migration(migrations.Migration):
                 ('tipo_accion', models.CharField(choices=[('creacion', 'Creación'), ('edicion', 'Edición'), ('cambio_estado', 'Cambio de Estado'), ('comentario', 'Comentario'), ('asignacion', 'Asignación')], max_length=50)),
                 ('cambio_descripcion', models.TextField(blank=True, null=True)),
                 ('fecha', models.DateTimeField(auto_now_add=True)),
-                ('denuncia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial', to='appProyecto.denuncia')),
-                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='acciones_denuncias', to=settings.AUTH_USER_MODEL)),
+                ('denuncia', models.ForeignKey(db_constraint=not AUDITORIA_SEPARADA, on_delete=django.db.models.deletion.CASCADE, related_name='historial', to='appProyecto.denuncia')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=not AUDITORIA_SEPARADA, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='acciones_denuncias', to=settings.AUTH_USER_MODEL)),
             ],
             options={
                 'db_table': 'historial_denuncias',
@@ -115,7 +120,7 @@ class Migration(migrations.Migration):
                 ('accion', models.CharField(max_length=255)),
                 ('ip_origen', models.CharField(blank=True, max_length=50, null=True)),
                 ('fecha', models.DateTimeField(auto_now_add=True)),
-                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs_actividad', to=settings.AUTH_USER_MODEL)),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=not AUDITORIA_SEPARADA, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs_actividad', to=settings.AUTH_USER_MODEL)),
             ],
             options={
                 'db_table': 'logs_actividad',
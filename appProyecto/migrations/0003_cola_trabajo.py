@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0002_alter_categoria_options_alter_denuncia_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='denuncia',
+            name='asignacion_expira',
+            field=models.DateTimeField(blank=True, help_text='Vencimiento del reclamo; después vuelve a la cola', null=True),
+        ),
+        migrations.AddField(
+            model_name='denuncia',
+            name='asignado_a',
+            field=models.ForeignKey(blank=True, help_text='Revisor que reclamó la denuncia desde la cola de trabajo', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='denuncias_asignadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='denuncia',
+            index=models.Index(fields=['estado', 'asignacion_expira'], name='denuncias_cola_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0003_cola_trabajo'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='denuncia',
+            name='fecha_creacion',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, help_text='Fecha de creación'),
+        ),
+        migrations.AlterField(
+            model_name='historialdenuncia',
+            name='fecha',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, help_text='Fecha de la acción'),
+        ),
+        migrations.AlterField(
+            model_name='logactividad',
+            name='fecha',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, help_text='Fecha y hora de la acción'),
+        ),
+        migrations.AddIndex(
+            model_name='denuncia',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='denuncias_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['date_joined'], name='usuarios_alta_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0004_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='peso',
+            field=models.FloatField(default=1.0, help_text='Multiplicador de la categoría en el puntaje de urgencia'),
+        ),
+        migrations.AddField(
+            model_name='denuncia',
+            name='puntaje',
+            field=models.FloatField(db_index=True, default=0.0, help_text='Urgencia calculada (categoría, densidad local, evidencia y antigüedad)'),
+        ),
+    ]
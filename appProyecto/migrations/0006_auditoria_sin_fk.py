@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0005_puntaje_urgencia'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialdenuncia',
+            name='denuncia',
+            field=models.ForeignKey(db_constraint=False, help_text='Denuncia afectada', on_delete=django.db.models.deletion.DO_NOTHING, related_name='historial', to='appProyecto.denuncia'),
+        ),
+        migrations.AlterField(
+            model_name='historialdenuncia',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Usuario que realizó la acción', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='acciones_denuncias', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='logactividad',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Usuario que realizó la acción', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='logs_actividad', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:37
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0006_auditoria_sin_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DenunciaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Mismo id que tenía en denuncias', primary_key=True, serialize=False)),
+                ('titulo', models.CharField(help_text='Título breve de la denuncia', max_length=150)),
+                ('descripcion', models.TextField(help_text='Descripción detallada del problema')),
+                ('evidencia', models.FileField(blank=True, help_text='Archivo de evidencia (imagen o video)', null=True, upload_to='evidencias/%Y/%m/%d/')),
+                ('evidencia_url', models.CharField(blank=True, help_text='URL alternativa de evidencia', max_length=255, null=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('resuelta', 'Resuelta'), ('rechazada', 'Rechazada')], help_text='Estado al archivarse', max_length=50)),
+                ('prioridad', models.CharField(choices=[('baja', 'Baja'), ('media', 'Media'), ('alta', 'Alta')], help_text='Nivel de prioridad', max_length=20)),
+                ('puntaje', models.FloatField(default=0.0, help_text='Último puntaje de urgencia')),
+                ('fecha_creacion', models.DateTimeField(help_text='Fecha de creación')),
+                ('fecha_actualizacion', models.DateTimeField(help_text='Última actualización antes de archivarse')),
+                ('asignacion_expira', models.DateTimeField(blank=True, help_text='Vencimiento del último reclamo', null=True)),
+                ('fecha_archivo', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True, help_text='Fecha en que se movió al archivo')),
+                ('asignado_a', models.ForeignKey(blank=True, help_text='Último revisor asignado', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='denuncias_archivadas_asignadas', to=settings.AUTH_USER_MODEL)),
+                ('categoria', models.ForeignKey(blank=True, help_text='Categoría de la denuncia', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='denuncias_archivadas', to='appProyecto.categoria')),
+                ('ubicacion', models.ForeignKey(blank=True, help_text='Ubicación GPS del incidente', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='denuncias_archivadas', to='appProyecto.ubicacion')),
+                ('usuario', models.ForeignKey(help_text='Usuario que creó la denuncia', on_delete=django.db.models.deletion.CASCADE, related_name='denuncias_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Denuncia archivada',
+                'verbose_name_plural': 'Denuncias archivadas',
+                'db_table': 'denuncias_archivo',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HistorialDenunciaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Mismo id que tenía en historial_denuncias', primary_key=True, serialize=False)),
+                ('tipo_accion', models.CharField(choices=[('creacion', 'Creación'), ('edicion', 'Edición'), ('cambio_estado', 'Cambio de Estado'), ('comentario', 'Comentario'), ('asignacion', 'Asignación')], help_text='Tipo de acción realizada', max_length=50)),
+                ('cambio_descripcion', models.TextField(blank=True, help_text='Descripción detallada del cambio', null=True)),
+                ('fecha', models.DateTimeField(help_text='Fecha de la acción')),
+                ('denuncia', models.ForeignKey(db_constraint=False, help_text='Denuncia archivada', on_delete=django.db.models.deletion.DO_NOTHING, related_name='historial', to='appProyecto.denunciaarchivada')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, help_text='Usuario que realizó la acción', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='acciones_denuncias_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Historial de denuncia archivada',
+                'verbose_name_plural': 'Historial de denuncias archivadas',
+                'db_table': 'historial_denuncias_archivo',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='denunciaarchivada',
+            index=models.Index(fields=['usuario', 'fecha_creacion'], name='archivo_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='denunciaarchivada',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='archivo_estado_fecha_idx'),
+        ),
+    ]
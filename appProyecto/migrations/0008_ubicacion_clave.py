@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0007_archivo_denuncias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ubicacion',
+            name='clave',
+            field=models.BigIntegerField(editable=False, help_text='Coordenadas cuantizadas (ver clave_ubicacion); NULL hasta correr fusionar_ubicaciones', null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0008_ubicacion_clave'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ubicacion',
+            name='comuna',
+            field=models.CharField(blank=True, db_index=True, help_text='Código de comuna (CUT)', max_length=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='ubicacion',
+            name='region',
+            field=models.CharField(blank=True, db_index=True, help_text='Código de región (appProyecto.regiones); vacío si cae fuera de toda comuna, NULL sin calcular', max_length=2, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0009_ubicacion_region'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='denuncia',
+            name='ubicacion_texto',
+            field=models.CharField(blank=True, help_text='Lugar escrito por el denunciante (se geocodifica si no hay GPS)', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='denunciaarchivada',
+            name='ubicacion_texto',
+            field=models.CharField(blank=True, help_text='Lugar escrito por el denunciante', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='ubicacion',
+            name='confianza',
+            field=models.FloatField(blank=True, help_text='Confianza de la geocodificación (0 a 1); vacía para GPS', null=True),
+        ),
+        migrations.AddField(
+            model_name='ubicacion',
+            name='origen',
+            field=models.CharField(choices=[('gps', 'GPS'), ('nomenclator', 'Nomenclátor')], default='gps', help_text='GPS del reporte o geocodificada desde el texto (appProyecto.nomenclator)', max_length=20),
+        ),
+    ]
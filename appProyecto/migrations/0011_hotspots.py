@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0010_geocodificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hotspot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitud', models.DecimalField(decimal_places=8, help_text='Latitud del centroide', max_digits=10)),
+                ('longitud', models.DecimalField(decimal_places=8, help_text='Longitud del centroide', max_digits=11)),
+                ('radio_metros', models.FloatField(help_text='Distancia del centroide a la denuncia más lejana del foco')),
+                ('denuncias', models.PositiveIntegerField(help_text='Denuncias del foco dentro de la ventana')),
+                ('recientes', models.PositiveIntegerField(help_text='Denuncias del foco en el último cuarto de la ventana')),
+                ('primera', models.DateTimeField(help_text='Denuncia más antigua del foco')),
+                ('ultima', models.DateTimeField(help_text='Denuncia más reciente del foco')),
+                ('calculado_en', models.DateTimeField(auto_now_add=True, help_text='Fecha del cálculo')),
+                ('categoria', models.ForeignKey(blank=True, help_text='Categoría del foco (vacía: denuncias sin categoría)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hotspots', to='appProyecto.categoria')),
+            ],
+            options={
+                'verbose_name': 'Foco de denuncias',
+                'verbose_name_plural': 'Focos de denuncias',
+                'db_table': 'hotspots',
+                'ordering': ['-recientes', '-denuncias'],
+            },
+        ),
+    ]
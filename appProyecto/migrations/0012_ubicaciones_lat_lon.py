@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0011_hotspots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ubicacion',
+            index=models.Index(fields=['latitud', 'longitud'], name='ubicaciones_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0012_ubicaciones_lat_lon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Taxon',
+            fields=[
+                ('id', models.BigIntegerField(help_text='taxonID del volcado de origen', primary_key=True, serialize=False)),
+                ('fuente', models.CharField(choices=[('inaturalist', 'iNaturalist'), ('gbif', 'GBIF')], help_text='Taxonomía de la que se importó', max_length=20)),
+                ('nombre_cientifico', models.CharField(db_index=True, help_text='Nombre científico', max_length=255)),
+                ('rango', models.CharField(help_text='Rango taxonómico (species, genus, ...)', max_length=30)),
+                ('grupo', models.CharField(choices=[('flora', 'Flora'), ('fauna', 'Fauna')], help_text='Plantae → flora, Animalia → fauna', max_length=10)),
+                ('clase', models.CharField(blank=True, help_text='Clase (Aves, Mammalia, Magnoliopsida, ...)', max_length=100)),
+                ('nombre_comun', models.CharField(blank=True, help_text='Nombre común preferido en español', max_length=255)),
+                ('foto_url', models.URLField(blank=True, help_text='Foto representativa (se completa desde iNaturalist)', max_length=500)),
+                ('foto_revisada', models.DateTimeField(blank=True, help_text='Última vez que se buscó su foto', null=True)),
+            ],
+            options={
+                'verbose_name': 'Taxón',
+                'verbose_name_plural': 'Taxones',
+                'db_table': 'taxones',
+            },
+        ),
+        migrations.CreateModel(
+            name='NombreTaxon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre tal como viene en el volcado', max_length=255)),
+                ('normalizado', models.CharField(db_index=True, help_text='Minúsculas sin tildes (nomenclator.normalizar): búsqueda por prefijo con el índice', max_length=255)),
+                ('cientifico', models.BooleanField(default=False, help_text='Es el nombre científico')),
+                ('taxon', models.ForeignKey(help_text='Taxón nombrado', on_delete=django.db.models.deletion.CASCADE, related_name='nombres', to='appProyecto.taxon')),
+            ],
+            options={
+                'verbose_name': 'Nombre de taxón',
+                'verbose_name_plural': 'Nombres de taxón',
+                'db_table': 'nombres_taxon',
+            },
+        ),
+    ]
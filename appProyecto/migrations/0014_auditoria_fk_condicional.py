@@ -0,0 +1,70 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from appProyecto.enrutador import auditoria_separada
+
+# 0006 quitó las FK de auditoría para poder moverla a otra base. Si vive en
+# la principal se restauran (CASCADE / SET_NULL en el ORM y en el motor)
+SEPARADA = auditoria_separada()
+CASCADE = django.db.models.deletion.DO_NOTHING if SEPARADA else django.db.models.deletion.CASCADE
+SET_NULL = django.db.models.deletion.DO_NOTHING if SEPARADA else django.db.models.deletion.SET_NULL
+
+
+def limpiar_huerfanos(apps, schema_editor):
+    """Sin FK pudo quedar historial de denuncias borradas: la restricción fallaría"""
+    if SEPARADA:
+        return
+    alias = schema_editor.connection.alias
+    Usuario = apps.get_model(settings.AUTH_USER_MODEL)
+    usuarios = Usuario.objects.using(alias).values('pk')
+    for nombre, padre in (
+        ('HistorialDenuncia', 'Denuncia'),
+        ('HistorialDenunciaArchivada', 'DenunciaArchivada'),
+    ):
+        Historial = apps.get_model('appProyecto', nombre)
+        Padre = apps.get_model('appProyecto', padre)
+        historial = Historial.objects.using(alias)
+        historial.exclude(denuncia_id__in=Padre.objects.using(alias).values('pk')).delete()
+        historial.filter(usuario__isnull=False).exclude(usuario_id__in=usuarios).update(usuario=None)
+    LogActividad = apps.get_model('appProyecto', 'LogActividad')
+    LogActividad.objects.using(alias).filter(usuario__isnull=False).exclude(
+        usuario_id__in=usuarios
+    ).update(usuario=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0013_catalogo_especies'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(limpiar_huerfanos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='historialdenuncia',
+            name='denuncia',
+            field=models.ForeignKey(db_constraint=not SEPARADA, help_text='Denuncia afectada', on_delete=CASCADE, related_name='historial', to='appProyecto.denuncia'),
+        ),
+        migrations.AlterField(
+            model_name='historialdenuncia',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=not SEPARADA, help_text='Usuario que realizó la acción', null=True, on_delete=SET_NULL, related_name='acciones_denuncias', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='historialdenunciaarchivada',
+            name='denuncia',
+            field=models.ForeignKey(db_constraint=not SEPARADA, help_text='Denuncia archivada', on_delete=CASCADE, related_name='historial', to='appProyecto.denunciaarchivada'),
+        ),
+        migrations.AlterField(
+            model_name='historialdenunciaarchivada',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=not SEPARADA, help_text='Usuario que realizó la acción', null=True, on_delete=SET_NULL, related_name='acciones_denuncias_archivadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='logactividad',
+            name='usuario',
+            field=models.ForeignKey(blank=True, db_constraint=not SEPARADA, help_text='Usuario que realizó la acción', null=True, on_delete=SET_NULL, related_name='logs_actividad', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:39
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def registrar_existentes(apps, schema_editor):
+    """Una sola pasada por el storage para las miniaturas ya generadas"""
+    Denuncia = apps.get_model('appProyecto', 'Denuncia')
+    denuncias = Denuncia.objects.using(schema_editor.connection.alias).exclude(evidencia='').exclude(evidencia__isnull=True)
+    for pk, evidencia in denuncias.values_list('pk', 'evidencia').iterator():
+        ruta = f'miniaturas/{evidencia}.webp'
+        if default_storage.exists(ruta):
+            Denuncia.objects.using(schema_editor.connection.alias).filter(pk=pk).update(miniatura=ruta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appProyecto', '0014_auditoria_fk_condicional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='denuncia',
+            name='miniatura',
+            field=models.CharField(blank=True, help_text='Ruta de la miniatura WebP de la evidencia (la guarda generar_miniatura); NULL si aún no existe', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='denunciaarchivada',
+            name='miniatura',
+            field=models.CharField(blank=True, help_text='Ruta de la miniatura WebP de la evidencia', max_length=255, null=True),
+        ),
+        migrations.RunPython(registrar_existentes, migrations.RunPython.noop),
+    ]
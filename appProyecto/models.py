@@ -1,8 +1,16 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Now
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import default_storage
 from django.utils import timezone
 from decimal import Decimal
 
+from .elevacion import altitud_de
+from .enrutador import auditoria_separada
+from .regiones import region_de
+
 
 class Usuario(AbstractUser):
 
@@ -34,6 +42,9 @@ class Usuario(AbstractUser):
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
         ordering = ['-date_joined']
+        indexes = [
+            models.Index(fields=['date_joined'], name='usuarios_alta_idx'),
+        ]
     
     def __str__(self):
         return f"{self.username} ({self.get_rol_display()})"
@@ -92,8 +103,51 @@ class TokenRecuperacion(models.Model):
 
 
 
+def clave_ubicacion(latitud, longitud, decimales=None):
+    """
+    Coordenadas redondeadas a `decimales` (UBICACION_DECIMALES) empaquetadas
+    en un entero: los puntos que caen en la misma celda comparten clave.
+    """
+    decimales = settings.UBICACION_DECIMALES if decimales is None else decimales
+    escala = 10 ** decimales
+
+    def cuantizar(valor):
+        return int((Decimal(str(valor)) * escala).to_integral_value())
+
+    fila = cuantizar(latitud) + 90 * escala
+    columna = cuantizar(longitud) + 180 * escala
+    return fila * (360 * escala + 1) + columna
+
+
+class UbicacionManager(models.Manager):
+
+    def internar(self, latitud, longitud, descripcion=None, **campos):
+        """
+        La ubicación ya registrada en esas coordenadas (cuantizadas) o una
+        nueva. Conserva las coordenadas y la descripción del primer reporte;
+        el texto de cada reporte queda en Denuncia.ubicacion_texto.
+        La fila es compartida: sus coordenadas no se editan (ver clean).
+        """
+        ubicacion, _ = self.get_or_create(
+            clave=clave_ubicacion(latitud, longitud),
+            defaults={'latitud': latitud, 'longitud': longitud, 'descripcion': descripcion, **campos}
+        )
+        return ubicacion
+
+
 class Ubicacion(models.Model):
+
+    ORIGENES = (
+        ('gps', 'GPS'),
+        ('nomenclator', 'Nomenclátor'),
+    )
     
+    clave = models.BigIntegerField(
+        unique=True,
+        null=True,
+        editable=False,
+        help_text='Coordenadas cuantizadas (ver clave_ubicacion); NULL hasta correr fusionar_ubicaciones'
+    )
     latitud = models.DecimalField(
         max_digits=10,
         decimal_places=8,
@@ -116,16 +170,47 @@ class Ubicacion(models.Model):
         null=True,
         help_text='Descripción textual del lugar'
     )
+    region = models.CharField(
+        max_length=2,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='Código de región (appProyecto.regiones); vacío si cae fuera de toda comuna, NULL sin calcular'
+    )
+    comuna = models.CharField(
+        max_length=5,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='Código de comuna (CUT)'
+    )
+    origen = models.CharField(
+        max_length=20,
+        choices=ORIGENES,
+        default='gps',
+        help_text='GPS del reporte o geocodificada desde el texto (appProyecto.nomenclator)'
+    )
+    confianza = models.FloatField(
+        blank=True,
+        null=True,
+        help_text='Confianza de la geocodificación (0 a 1); vacía para GPS'
+    )
     fecha_registro = models.DateTimeField(
         auto_now_add=True,
         help_text='Fecha de registro de la ubicación'
     )
+
+    objects = UbicacionManager()
     
     class Meta:
         db_table = 'ubicaciones'
         verbose_name = 'Ubicación'
         verbose_name_plural = 'Ubicaciones'
         ordering = ['-fecha_registro']
+        indexes = [
+            # Filtro por bbox de /api/denuncias.geojson: rango en latitud, luego longitud
+            models.Index(fields=['latitud', 'longitud'], name='ubicaciones_lat_lon_idx'),
+        ]
     
     def __str__(self):
         return f"Lat: {self.latitud}, Lon: {self.longitud}"
@@ -133,6 +218,45 @@ class Ubicacion(models.Model):
     def coordenadas_str(self):
         return f"{self.latitud}, {self.longitud}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._coordenadas_bd = (instancia.__dict__.get('latitud'), instancia.__dict__.get('longitud'))
+        return instancia
+
+    def coordenadas_cambiaron(self):
+        """True si latitud o longitud difieren de lo leído de la base (o es nueva)"""
+        return getattr(self, '_coordenadas_bd', None) != (self.latitud, self.longitud)
+
+    def clean(self):
+        if self.latitud is None or self.longitud is None:
+            return
+        if self.clave is not None and self.pk is not None and self.coordenadas_cambiaron():
+            # Internada: la comparten todos los reportes, archivados y
+            # dispositivos de la celda; moverla los movería a todos
+            raise ValidationError(
+                'Esta ubicación es compartida por todos los reportes de su celda y sus '
+                'coordenadas no se editan: asigna otra ubicación a la denuncia.'
+            )
+        otra = Ubicacion.objects.filter(
+            clave=clave_ubicacion(self.latitud, self.longitud)
+        ).exclude(pk=self.pk).first()
+        if otra:
+            raise ValidationError(f'Esas coordenadas ya corresponden a la ubicación #{otra.pk}.')
+
+    def save(self, *args, **kwargs):
+        self.clave = clave_ubicacion(self.latitud, self.longitud)
+        # Región, comuna y altitud solo dependen de las coordenadas: se
+        # recalculan al crearla o moverla, no en cada save
+        if self.coordenadas_cambiaron():
+            region, comuna = region_de(self.latitud, self.longitud)
+            if region is not None:
+                self.region, self.comuna = region, comuna
+            altitud = altitud_de(self.latitud, self.longitud)
+            self.altitud = Decimal(str(altitud)) if altitud is not None else None
+        super().save(*args, **kwargs)
+        self._coordenadas_bd = (self.latitud, self.longitud)
+
 
 class Categoria(models.Model):
     
@@ -151,6 +275,10 @@ class Categoria(models.Model):
         null=True,
         help_text='Descripción de la categoría'
     )
+    peso = models.FloatField(
+        default=1.0,
+        help_text='Multiplicador de la categoría en el puntaje de urgencia'
+    )
     
     class Meta:
         db_table = 'categorias'
@@ -233,9 +361,15 @@ class Denuncia(models.Model):
         default='media',
         help_text='Nivel de prioridad'
     )
+    puntaje = models.FloatField(
+        default=0.0,
+        db_index=True,
+        help_text='Urgencia calculada (categoría, densidad local, evidencia y antigüedad)'
+    )
     
     fecha_creacion = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         help_text='Fecha de creación'
     )
     fecha_actualizacion = models.DateTimeField(
@@ -243,11 +377,42 @@ class Denuncia(models.Model):
         help_text='Última actualización'
     )
     
+    asignado_a = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='denuncias_asignadas',
+        help_text='Revisor que reclamó la denuncia desde la cola de trabajo'
+    )
+    asignacion_expira = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='Vencimiento del reclamo; después vuelve a la cola'
+    )
+    ubicacion_texto = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text='Lugar escrito por el denunciante (se geocodifica si no hay GPS)'
+    )
+    miniatura = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text='Ruta de la miniatura WebP de la evidencia (la guarda generar_miniatura); NULL si aún no existe'
+    )
+    
     class Meta:
         db_table = 'denuncias'
         verbose_name = 'Denuncia'
         verbose_name_plural = 'Denuncias'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'asignacion_expira'], name='denuncias_cola_idx'),
+            # Listados filtrados por estado y ordenados por fecha (admin, pagina6)
+            models.Index(fields=['estado', 'fecha_creacion'], name='denuncias_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.get_estado_display()}"
@@ -257,9 +422,106 @@ class Denuncia(models.Model):
     
     def tiene_evidencia(self):
         return bool(self.evidencia or self.evidencia_url)
+    
+    def ruta_miniatura(self):
+        return f'miniaturas/{self.evidencia.name}.webp' if self.evidencia else None
+    
+    def url_miniatura(self):
+        """Miniatura generada tras la creación; si aún no existe, la evidencia original"""
+        if not self.evidencia:
+            return None
+        if self.miniatura:
+            return default_storage.url(self.miniatura)
+        return self.evidencia.url
 
 
 
+class DenunciaArchivada(models.Model):
+    """
+    Denuncia cerrada movida fuera de la tabla caliente (appProyecto.archivo).
+    Mismas columnas y en el mismo orden que Denuncia (el UNION de
+    incluir_archivo depende de eso) más la fecha de archivo al final.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        help_text='Mismo id que tenía en denuncias'
+    )
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='denuncias_archivadas',
+        help_text='Usuario que creó la denuncia'
+    )
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='denuncias_archivadas',
+        help_text='Categoría de la denuncia'
+    )
+    ubicacion = models.ForeignKey(
+        Ubicacion,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='denuncias_archivadas',
+        help_text='Ubicación GPS del incidente'
+    )
+    titulo = models.CharField(max_length=150, help_text='Título breve de la denuncia')
+    descripcion = models.TextField(help_text='Descripción detallada del problema')
+    evidencia = models.FileField(
+        upload_to='evidencias/%Y/%m/%d/',
+        blank=True,
+        null=True,
+        help_text='Archivo de evidencia (imagen o video)'
+    )
+    evidencia_url = models.CharField(max_length=255, blank=True, null=True, help_text='URL alternativa de evidencia')
+    estado = models.CharField(max_length=50, choices=Denuncia.ESTADOS, help_text='Estado al archivarse')
+    prioridad = models.CharField(max_length=20, choices=Denuncia.PRIORIDADES, help_text='Nivel de prioridad')
+    puntaje = models.FloatField(default=0.0, help_text='Último puntaje de urgencia')
+    fecha_creacion = models.DateTimeField(help_text='Fecha de creación')
+    fecha_actualizacion = models.DateTimeField(help_text='Última actualización antes de archivarse')
+    asignado_a = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='denuncias_archivadas_asignadas',
+        help_text='Último revisor asignado'
+    )
+    asignacion_expira = models.DateTimeField(blank=True, null=True, help_text='Vencimiento del último reclamo')
+    ubicacion_texto = models.CharField(max_length=255, blank=True, null=True, help_text='Lugar escrito por el denunciante')
+    miniatura = models.CharField(max_length=255, blank=True, null=True, help_text='Ruta de la miniatura WebP de la evidencia')
+
+    fecha_archivo = models.DateTimeField(
+        db_default=Now(),
+        db_index=True,
+        help_text='Fecha en que se movió al archivo'
+    )
+
+    class Meta:
+        db_table = 'denuncias_archivo'
+        verbose_name = 'Denuncia archivada'
+        verbose_name_plural = 'Denuncias archivadas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_creacion'], name='archivo_usuario_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_creacion'], name='archivo_estado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.titulo} - {self.get_estado_display()} (archivada)"
+
+
+# Auditoría en otra base (appProyecto.enrutador): sin FK en el motor; el
+# borrado en cascada y el SET_NULL los hacen las señales. En una sola base
+# son FK normales con CASCADE y SET_NULL.
+AUDITORIA_SEPARADA = auditoria_separada()
+AUDITORIA_CASCADE = models.DO_NOTHING if AUDITORIA_SEPARADA else models.CASCADE
+AUDITORIA_SET_NULL = models.DO_NOTHING if AUDITORIA_SEPARADA else models.SET_NULL
+
+
 class HistorialDenuncia(models.Model):
     
     TIPOS_ACCION = (
@@ -272,13 +534,15 @@ class HistorialDenuncia(models.Model):
     
     denuncia = models.ForeignKey(
         Denuncia,
-        on_delete=models.CASCADE,
+        on_delete=AUDITORIA_CASCADE,
+        db_constraint=not AUDITORIA_SEPARADA,
         related_name='historial',
         help_text='Denuncia afectada'
     )
     usuario = models.ForeignKey(
         Usuario,
-        on_delete=models.SET_NULL,
+        on_delete=AUDITORIA_SET_NULL,
+        db_constraint=not AUDITORIA_SEPARADA,
         blank=True,
         null=True,
         related_name='acciones_denuncias',
@@ -296,6 +560,7 @@ class HistorialDenuncia(models.Model):
     )
     fecha = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         help_text='Fecha de la acción'
     )
     
@@ -309,10 +574,44 @@ class HistorialDenuncia(models.Model):
         return f"{self.get_tipo_accion_display()} - {self.denuncia.titulo}"
 
 
+class HistorialDenunciaArchivada(models.Model):
+    """Historial de una denuncia archivada; vive junto al historial (base de auditoría)"""
+    id = models.BigIntegerField(primary_key=True, help_text='Mismo id que tenía en historial_denuncias')
+    denuncia = models.ForeignKey(
+        DenunciaArchivada,
+        on_delete=AUDITORIA_CASCADE,
+        db_constraint=not AUDITORIA_SEPARADA,
+        related_name='historial',
+        help_text='Denuncia archivada'
+    )
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=AUDITORIA_SET_NULL,
+        db_constraint=not AUDITORIA_SEPARADA,
+        blank=True,
+        null=True,
+        related_name='acciones_denuncias_archivadas',
+        help_text='Usuario que realizó la acción'
+    )
+    tipo_accion = models.CharField(max_length=50, choices=HistorialDenuncia.TIPOS_ACCION, help_text='Tipo de acción realizada')
+    cambio_descripcion = models.TextField(blank=True, null=True, help_text='Descripción detallada del cambio')
+    fecha = models.DateTimeField(help_text='Fecha de la acción')
+
+    class Meta:
+        db_table = 'historial_denuncias_archivo'
+        verbose_name = 'Historial de denuncia archivada'
+        verbose_name_plural = 'Historial de denuncias archivadas'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.get_tipo_accion_display()} - #{self.denuncia_id} (archivada)"
+
+
 class LogActividad(models.Model):
     usuario = models.ForeignKey(
         Usuario,
-        on_delete=models.SET_NULL,
+        on_delete=AUDITORIA_SET_NULL,
+        db_constraint=not AUDITORIA_SEPARADA,
         blank=True,
         null=True,
         related_name='logs_actividad',
@@ -330,6 +629,7 @@ class LogActividad(models.Model):
     )
     fecha = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         help_text='Fecha y hora de la acción'
     )
     
@@ -517,3 +817,86 @@ class Reporte(models.Model):
     
     def __str__(self):
         return f"{self.titulo} - {self.fecha_creacion.strftime('%d/%m/%Y')}"
+
+
+class Hotspot(models.Model):
+    """Foco de denuncias cercanas de una categoría en la ventana reciente (appProyecto.hotspots)"""
+
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='hotspots',
+        help_text='Categoría del foco (vacía: denuncias sin categoría)'
+    )
+    latitud = models.DecimalField(max_digits=10, decimal_places=8, help_text='Latitud del centroide')
+    longitud = models.DecimalField(max_digits=11, decimal_places=8, help_text='Longitud del centroide')
+    radio_metros = models.FloatField(help_text='Distancia del centroide a la denuncia más lejana del foco')
+    denuncias = models.PositiveIntegerField(help_text='Denuncias del foco dentro de la ventana')
+    recientes = models.PositiveIntegerField(help_text='Denuncias del foco en el último cuarto de la ventana')
+    primera = models.DateTimeField(help_text='Denuncia más antigua del foco')
+    ultima = models.DateTimeField(help_text='Denuncia más reciente del foco')
+    calculado_en = models.DateTimeField(auto_now_add=True, help_text='Fecha del cálculo')
+
+    class Meta:
+        db_table = 'hotspots'
+        verbose_name = 'Foco de denuncias'
+        verbose_name_plural = 'Focos de denuncias'
+        ordering = ['-recientes', '-denuncias']
+
+    def __str__(self):
+        categoria = self.categoria.nombre if self.categoria else 'Sin categoría'
+        return f"{categoria}: {self.denuncias} denuncias en {self.radio_metros:.0f} m"
+
+
+class Taxon(models.Model):
+    """Especie (u otro rango) del catálogo local importado con importar_catalogo"""
+
+    GRUPOS = (
+        ('flora', 'Flora'),
+        ('fauna', 'Fauna'),
+    )
+    FUENTES = (
+        ('inaturalist', 'iNaturalist'),
+        ('gbif', 'GBIF'),
+    )
+
+    id = models.BigIntegerField(primary_key=True, help_text='taxonID del volcado de origen')
+    fuente = models.CharField(max_length=20, choices=FUENTES, help_text='Taxonomía de la que se importó')
+    nombre_cientifico = models.CharField(max_length=255, db_index=True, help_text='Nombre científico')
+    rango = models.CharField(max_length=30, help_text='Rango taxonómico (species, genus, ...)')
+    grupo = models.CharField(max_length=10, choices=GRUPOS, help_text='Plantae → flora, Animalia → fauna')
+    clase = models.CharField(max_length=100, blank=True, help_text='Clase (Aves, Mammalia, Magnoliopsida, ...)')
+    nombre_comun = models.CharField(max_length=255, blank=True, help_text='Nombre común preferido en español')
+    foto_url = models.URLField(max_length=500, blank=True, help_text='Foto representativa (se completa desde iNaturalist)')
+    foto_revisada = models.DateTimeField(blank=True, null=True, help_text='Última vez que se buscó su foto')
+
+    class Meta:
+        db_table = 'taxones'
+        verbose_name = 'Taxón'
+        verbose_name_plural = 'Taxones'
+
+    def __str__(self):
+        return f"{self.nombre_comun or self.nombre_cientifico} ({self.rango})"
+
+
+class NombreTaxon(models.Model):
+    """Nombre buscable de un taxón: común en español o científico, normalizado sin tildes"""
+
+    taxon = models.ForeignKey(Taxon, on_delete=models.CASCADE, related_name='nombres', help_text='Taxón nombrado')
+    nombre = models.CharField(max_length=255, help_text='Nombre tal como viene en el volcado')
+    normalizado = models.CharField(
+        max_length=255,
+        db_index=True,
+        help_text='Minúsculas sin tildes (nomenclator.normalizar): búsqueda por prefijo con el índice'
+    )
+    cientifico = models.BooleanField(default=False, help_text='Es el nombre científico')
+
+    class Meta:
+        db_table = 'nombres_taxon'
+        verbose_name = 'Nombre de taxón'
+        verbose_name_plural = 'Nombres de taxón'
+
+    def __str__(self):
+        return self.nombre
@@ -0,0 +1,243 @@
+"""
+Geocodificación sin red de textos como "basural junto al río Mapocho, Cerro Navia".
+
+Carga NOMENCLATOR_ARCHIVO (volcado de GeoNames por país, p. ej. CL.txt:
+TSV con geonameid, name, asciiname, alternatenames, latitude, longitude,
+feature class, ..., population) en memoria:
+- un diccionario nombre normalizado → lugares, para coincidencias exactas;
+- un índice de trigramas sobre los mismos nombres, para errores de tipeo;
+  solo se usa si ningún tramo del texto coincide exacto, y los trigramas
+  de demasiados nombres ("san", "la ") no se recorren.
+Los nombres se normalizan sin tildes ni mayúsculas, así "Concepcion" y
+"CONCEPCIÓN" son la misma clave.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger(__name__)
+
+# P: ciudades y pueblos, A: divisiones administrativas, L: parques y áreas,
+# H: ríos y lagos, T: cerros y quebradas, V: bosques. El orden es la
+# preferencia ante homónimos.
+CLASES = 'PALHTV'
+MAX_PALABRAS = 5           # largo máximo de un nombre buscado en el texto
+SIMILITUD_MINIMA = 0.7     # Dice entre trigramas para aceptar un nombre con errores
+LARGO_MINIMO_PARECIDA = 5  # letras de un tramo para buscarlo con errores
+FRECUENCIA_MAXIMA = 0.01   # trigramas en más de esta parte de los nombres no generan candidatas
+PALABRAS_VACIAS = frozenset(
+    'a al cerca de del desde el en entre frente hacia junto la las lo los por sector '
+    'sobre un una y calle camino avenida pasaje km kilometro altura'.split()
+)
+
+Resultado = namedtuple('Resultado', 'nombre latitud longitud confianza')
+
+
+def normalizar(texto):
+    """Minúsculas sin tildes, solo letras, dígitos y espacios simples"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+
+def trigramas_de(clave):
+    """Trigramas de un nombre normalizado (con espacios de relleno en los bordes)"""
+    relleno = f'  {clave} '
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class Nomenclator:
+
+    def __init__(self, lugares):
+        """`lugares`: iterable de (nombres, latitud, longitud, clase, población)"""
+        self.lugares = []
+        self.claves = []       # nombres normalizados distintos
+        self.por_clave = {}    # nombre normalizado → índice en self.claves
+        self.lugares_de = []   # por clave: índices de lugares
+        self.trigramas = {}    # trigrama → índices de claves
+        self.tamanos = []      # trigramas por clave
+
+        for nombres, latitud, longitud, clase, poblacion in lugares:
+            if clase not in CLASES:
+                continue
+            indice = len(self.lugares)
+            self.lugares.append((nombres[0], latitud, longitud, clase, poblacion))
+            for nombre in set(filter(None, map(normalizar, nombres))):
+                if nombre in PALABRAS_VACIAS or len(nombre) < 3:
+                    continue
+                clave = self.por_clave.get(nombre)
+                if clave is None:
+                    clave = self.por_clave[nombre] = len(self.claves)
+                    self.claves.append(nombre)
+                    self.lugares_de.append([])
+                    trigramas = trigramas_de(nombre)
+                    self.tamanos.append(len(trigramas))
+                    for trigrama in trigramas:
+                        self.trigramas.setdefault(trigrama, []).append(clave)
+                self.lugares_de[clave].append(indice)
+        self.frecuencia_maxima = max(100, int(FRECUENCIA_MAXIMA * len(self.claves)))
+
+    @classmethod
+    def desde_geonames(cls, ruta):
+        def lugares():
+            with open(ruta, encoding='utf-8') as archivo:
+                for linea in archivo:
+                    campos = linea.rstrip('\n').split('\t')
+                    if len(campos) < 15:
+                        continue
+                    nombres = [campos[1], campos[2]] + [n for n in campos[3].split(',') if n]
+                    yield (
+                        nombres,
+                        float(campos[4]),
+                        float(campos[5]),
+                        campos[6],
+                        int(campos[14] or 0),
+                    )
+        return cls(lugares())
+
+    # --------------------------------------------------------------------------
+    # Búsqueda
+    # --------------------------------------------------------------------------
+
+    def _frases(self, texto):
+        """Tramos de 1 a MAX_PALABRAS palabras seguidas, del más largo al más corto"""
+        palabras = normalizar(texto).split()
+        for largo in range(min(MAX_PALABRAS, len(palabras)), 0, -1):
+            for inicio in range(len(palabras) - largo + 1):
+                tramo = palabras[inicio:inicio + largo]
+                if tramo[0] in PALABRAS_VACIAS or tramo[-1] in PALABRAS_VACIAS:
+                    continue
+                frase = ' '.join(tramo)
+                if len(frase) >= 3:
+                    yield frase, largo
+
+    def _parecidas(self, frase):
+        """
+        [(clave, similitud)] de nombres con trigramas en común (coeficiente de
+        Dice). Las candidatas salen solo de los trigramas poco frecuentes; a
+        las que pueden llegar al mínimo se les calcula la similitud exacta.
+        """
+        trigramas = trigramas_de(frase)
+        comunes = Counter()
+        frecuentes = 0
+        for trigrama in trigramas:
+            claves = self.trigramas.get(trigrama, ())
+            if len(claves) > self.frecuencia_maxima:
+                frecuentes += 1
+            else:
+                comunes.update(claves)
+        # Aun compartiendo todos los frecuentes, hacen falta estos en común
+        minimo = max(1, SIMILITUD_MINIMA * len(trigramas) / 2 - frecuentes)
+        parecidas = []
+        for clave, n in comunes.items():
+            if n >= minimo:
+                similitud = 2 * len(trigramas & trigramas_de(self.claves[clave])) / (
+                    len(trigramas) + self.tamanos[clave]
+                )
+                if similitud >= SIMILITUD_MINIMA:
+                    parecidas.append((clave, similitud))
+        return parecidas
+
+    def _lugar(self, clave):
+        """Lugar preferido entre homónimos y qué parte del peso total se lleva"""
+        pesos = [
+            (len(CLASES) - CLASES.index(self.lugares[i][3]) + math.log1p(self.lugares[i][4]), i)
+            for i in self.lugares_de[clave]
+        ]
+        peso, indice = max(pesos)
+        return indice, peso / sum(p for p, _ in pesos)
+
+    def geocodificar(self, texto):
+        """
+        Mejor lugar nombrado en el texto, o None. La confianza (0 a 1) combina
+        la similitud del nombre, cuántas palabras cubre y si tiene homónimos.
+        Primero se prueban los tramos exactos; con errores, solo si ninguno coincide.
+        """
+        frases = list(self._frases(texto))
+        exactas = [
+            (self.por_clave[frase], 1.0, largo) for frase, largo in frases if frase in self.por_clave
+        ]
+        candidatas = exactas or (
+            (clave, similitud, largo)
+            for frase, largo in frases
+            if len(frase.replace(' ', '')) >= LARGO_MINIMO_PARECIDA
+            for clave, similitud in self._parecidas(frase)
+        )
+        mejor = None
+        for clave, similitud, largo in candidatas:
+            indice, cuota = self._lugar(clave)
+            cobertura = min(1.0, 0.6 + 0.2 * largo)
+            confianza = round(similitud * cobertura * (0.5 + 0.5 * cuota), 3)
+            if mejor is None or confianza > mejor[0]:
+                mejor = (confianza, indice)
+        if mejor is None:
+            return None
+        confianza, indice = mejor
+        nombre, latitud, longitud, _, _ = self.lugares[indice]
+        return Resultado(nombre, latitud, longitud, confianza)
+
+
+_nomenclator = None
+_cargado = False
+_lock = threading.Lock()
+
+
+def nomenclator():
+    """Nomenclátor del proceso, cargado una vez; None si no hay archivo"""
+    global _nomenclator, _cargado
+    if not _cargado:
+        with _lock:
+            if not _cargado:
+                ruta = settings.NOMENCLATOR_ARCHIVO
+                if os.path.exists(ruta):
+                    _nomenclator = Nomenclator.desde_geonames(ruta)
+                    logger.info(
+                        'Nomenclátor cargado: %s lugares, %s nombres',
+                        len(_nomenclator.lugares), len(_nomenclator.claves)
+                    )
+                _cargado = True
+    return _nomenclator
+
+
+def _despues_del_fork():
+    # Un fork a mitad de la carga deja el candado tomado en el hijo
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_despues_del_fork)
+
+
+def precargar():
+    """Carga el nomenclátor en un hilo al arrancar, no en la primera petición"""
+    if settings.NOMENCLATOR_PRECARGAR and os.path.exists(settings.NOMENCLATOR_ARCHIVO):
+        threading.Thread(target=nomenclator, name='nomenclator', daemon=True).start()
+
+
+def geocodificar(texto):
+    """Resultado con confianza ≥ NOMENCLATOR_CONFIANZA_MINIMA, o None"""
+    actual = nomenclator()
+    if actual is None or not texto:
+        return None
+    resultado = actual.geocodificar(texto)
+    if resultado is None or resultado.confianza < settings.NOMENCLATOR_CONFIANZA_MINIMA:
+        return None
+    return resultado
+
+
+@checks.register()
+def revisar_nomenclator(app_configs, **kwargs):
+    if os.path.exists(settings.NOMENCLATOR_ARCHIVO):
+        return []
+    return [checks.Warning(
+        f'No existe {settings.NOMENCLATOR_ARCHIVO}: las denuncias sin GPS no se geocodificarán',
+        hint='Descarga el volcado de GeoNames de Chile (CL.txt) y define NOMENCLATOR_ARCHIVO.',
+        id='appProyecto.W002',
+    )]
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def filas_estimadas(modelo, using='default'):
+    """
+    Número aproximado de filas de la tabla del modelo, leído de las
+    estadísticas del motor (sin recorrer la tabla). None si no se puede estimar.
+
+    Las estadísticas derivan entre actualizaciones (borrados masivos,
+    archivo): MySQL muestrea TABLE_ROWS (puede errar en decenas de %),
+    PostgreSQL y SQLite reflejan el último ANALYZE (ver actualizar_estadisticas).
+    SQLite sin ANALYZE no tiene estadísticas: None y el paginador cuenta exacto.
+    """
+    connection = connections[using]
+    tabla = modelo._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [tabla]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [tabla])
+        elif connection.vendor == 'sqlite':
+            # MAX(rowid) no baja con los borrados: se usa sqlite_stat1, cuyo
+            # primer número es el total de filas de la tabla (o de un índice)
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s ORDER BY idx IS NOT NULL LIMIT 1',
+                [tabla]
+            )
+        else:
+            return None
+        fila = cursor.fetchone()
+
+    if not fila or fila[0] is None or fila[0] < 0:
+        return None
+    return int(fila[0])
+
+
+def actualizar_estadisticas(modelos, using='default'):
+    """ANALYZE de las tablas de `modelos`: corrige la deriva de filas_estimadas"""
+    connection = connections[using]
+    sentencia = 'ANALYZE TABLE {}' if connection.vendor == 'mysql' else 'ANALYZE {}'
+    with connection.cursor() as cursor:
+        for modelo in modelos:
+            cursor.execute(sentencia.format(connection.ops.quote_name(modelo._meta.db_table)))
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginador para tablas grandes:
+    - Sin filtros y sobre el umbral: usa la estimación del motor en vez de COUNT(*).
+      Como puede quedarse corta o larga, cada página leída la corrige y se
+      aceptan páginas más allá de la última estimada.
+    - Con filtros: COUNT exacto (el filtro ya acota lo que se recorre).
+    """
+
+    estimado = False
+
+    @cached_property
+    def umbral(self):
+        return getattr(settings, 'ADMIN_CONTEO_EXACTO_HASTA', 10000)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+
+        if not queryset.query.where:
+            estimado = filas_estimadas(queryset.model, using=queryset.db)
+            if estimado is not None and estimado > self.umbral:
+                self.estimado = True
+                return estimado
+        return queryset.count()
+
+    def validate_number(self, number):
+        if self.count and self.estimado:
+            # Sin tope superior: la página se lee y, si está vacía, no existe
+            try:
+                number = int(number)
+            except (TypeError, ValueError):
+                raise PageNotAnInteger(self.error_messages['invalid_page'])
+            if number < 1:
+                raise EmptyPage(self.error_messages['min_page'])
+            return number
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimado:
+            return super().page(number)
+        inicio = (number - 1) * self.per_page
+        # Una fila de más dice si hay página siguiente
+        filas = list(self.object_list[inicio:inicio + self.per_page + 1])
+        if not filas and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        # La estimación se pudo quedar corta o larga: se ajusta a lo leído
+        if len(filas) > self.per_page:
+            self.__dict__['count'] = max(self.count, inicio + len(filas))
+        else:
+            self.__dict__['count'] = inicio + len(filas)
+        self.__dict__.pop('num_pages', None)
+        self.__dict__.pop('page_range', None)
+        return self._get_page(filas[:self.per_page], number, self)
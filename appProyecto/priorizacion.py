@@ -0,0 +1,235 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connections, router
+from django.utils import timezone
+
+from .basedatos import atomico
+from .models import Denuncia
+
+
+# ==============================================================================
+# PARÁMETROS DEL PUNTAJE DE URGENCIA
+# ==============================================================================
+
+CELDA_GRADOS = 0.01                     # ~1,1 km de lado
+VENTANA_DENSIDAD = timedelta(hours=48)  # denuncias recientes en la misma celda
+HORAS_ANTIGUEDAD_MAXIMA = 72            # la antigüedad deja de sumar pasado este plazo
+
+PESO_DENSIDAD = 1.0
+PESO_EVIDENCIA = 0.5
+PESO_ANTIGUEDAD = 0.5
+
+ESTADOS_PUNTUABLES = ('pendiente', 'en_proceso')
+
+CAMPOS = (
+    'id',
+    'categoria__peso',
+    'ubicacion__latitud',
+    'ubicacion__longitud',
+    'evidencia',
+    'evidencia_url',
+    'fecha_creacion',
+)
+
+
+# ==============================================================================
+# CÁLCULO VECTORIZADO
+# ==============================================================================
+
+def celdas(latitudes, longitudes):
+    """Clave entera de la celda de cada punto (NaN = sin ubicación → -1)"""
+    fila = np.floor(latitudes / CELDA_GRADOS)
+    columna = np.floor(longitudes / CELDA_GRADOS)
+    claves = (fila + 100_000) * 1_000_000 + (columna + 100_000)
+    return np.where(np.isnan(claves), -1, claves).astype(np.int64)
+
+
+def puntajes(pesos, densidades, evidencias, edades_horas):
+    """
+    Urgencia = peso de la categoría × (1 + densidad local + evidencia + antigüedad).
+    Todos los argumentos son arreglos del mismo largo.
+    """
+    antiguedad = np.clip(edades_horas / HORAS_ANTIGUEDAD_MAXIMA, 0.0, 1.0)
+    return np.round(pesos * (
+        1.0
+        + PESO_DENSIDAD * np.log1p(densidades)
+        + PESO_EVIDENCIA * evidencias
+        + PESO_ANTIGUEDAD * antiguedad
+    ), 4)
+
+
+def _arreglos(filas):
+    """Columnas NumPy a partir de filas values_list(*CAMPOS)"""
+    ids, pesos, lats, lons, archivos, urls, fechas = zip(*filas)
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'pesos': np.array([1.0 if p is None else p for p in pesos], dtype=np.float64),
+        'latitudes': np.array([np.nan if v is None else float(v) for v in lats], dtype=np.float64),
+        'longitudes': np.array([np.nan if v is None else float(v) for v in lons], dtype=np.float64),
+        'evidencias': np.array([bool(a or u) for a, u in zip(archivos, urls)], dtype=np.float64),
+        'fechas': np.array([f.timestamp() for f in fechas], dtype=np.float64),
+    }
+
+
+def _decimal(valor):
+    return Decimal(str(round(float(valor), 8)))
+
+
+def _recientes_por_celda(ahora, latitudes=None, longitudes=None):
+    """
+    Conteo de denuncias de la ventana de densidad por celda. Si se pasan
+    puntos, solo lee el rectángulo que los cubre.
+    Retorna (claves, conteos) con las claves ordenadas.
+    """
+    recientes = Denuncia.objects.filter(
+        fecha_creacion__gte=ahora - VENTANA_DENSIDAD,
+        ubicacion__isnull=False,
+    )
+    if latitudes is not None:
+        validos = ~np.isnan(latitudes)
+        if not validos.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        recientes = recientes.filter(
+            ubicacion__latitud__gte=_decimal(latitudes[validos].min() - CELDA_GRADOS),
+            ubicacion__latitud__lte=_decimal(latitudes[validos].max() + CELDA_GRADOS),
+            ubicacion__longitud__gte=_decimal(longitudes[validos].min() - CELDA_GRADOS),
+            ubicacion__longitud__lte=_decimal(longitudes[validos].max() + CELDA_GRADOS),
+        )
+    recientes = recientes.order_by().values_list('ubicacion__latitud', 'ubicacion__longitud')
+
+    coordenadas = np.array(
+        [(float(lat), float(lon)) for lat, lon in recientes.iterator(chunk_size=5000)],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    return np.unique(celdas(coordenadas[:, 0], coordenadas[:, 1]), return_counts=True)
+
+
+def _puntuar(filas, ahora, recientes=None):
+    """Puntajes de un lote de filas values_list(*CAMPOS)"""
+    datos = _arreglos(filas)
+    claves = celdas(datos['latitudes'], datos['longitudes'])
+    if recientes is None:
+        recientes = _recientes_por_celda(ahora, datos['latitudes'], datos['longitudes'])
+    claves_recientes, conteos = recientes
+
+    densidades = np.zeros(len(claves), dtype=np.float64)
+    if len(claves_recientes):
+        posiciones = np.clip(np.searchsorted(claves_recientes, claves), 0, len(claves_recientes) - 1)
+        encontradas = (claves_recientes[posiciones] == claves) & (claves >= 0)
+        densidades[encontradas] = conteos[posiciones[encontradas]]
+        # La propia denuncia no cuenta para su densidad
+        propias = encontradas & (datos['fechas'] >= (ahora - VENTANA_DENSIDAD).timestamp())
+        densidades[propias] -= 1
+
+    edades = (ahora.timestamp() - datos['fechas']) / 3600.0
+    return datos['ids'], puntajes(datos['pesos'], densidades, datos['evidencias'], edades)
+
+
+def _guardar(ids, valores, actuales):
+    """
+    Escribe solo los puntajes que cambiaron, con un UPDATE por clave primaria
+    en executemany (bulk_update arma un CASE por fila y es mucho más lento).
+    """
+    cambiadas = [
+        (float(valor), int(denuncia_id))
+        for denuncia_id, valor in zip(ids, valores)
+        if actuales.get(int(denuncia_id)) != float(valor)
+    ]
+    if cambiadas:
+        conexion = connections[router.db_for_write(Denuncia)]
+        tabla = conexion.ops.quote_name(Denuncia._meta.db_table)
+        with atomico(), conexion.cursor() as cursor:
+            cursor.executemany(f'UPDATE {tabla} SET puntaje = %s WHERE id = %s', cambiadas)
+    return len(cambiadas)
+
+
+# ==============================================================================
+# RECÁLCULO INCREMENTAL Y COMPLETO
+# ==============================================================================
+
+def recalcular(queryset, ahora=None):
+    """Recalcula el puntaje de las denuncias abiertas de `queryset`"""
+    ahora = ahora or timezone.now()
+    filas = list(
+        queryset.filter(estado__in=ESTADOS_PUNTUABLES)
+        .order_by()
+        .values_list(*CAMPOS, 'puntaje')
+    )
+    if not filas:
+        return 0
+    actuales = {fila[0]: fila[-1] for fila in filas}
+    ids, valores = _puntuar([fila[:-1] for fila in filas], ahora)
+    return _guardar(ids, valores, actuales)
+
+
+def recalcular_ids(ids, lote=1000):
+    """Por lotes de ids: un IN con toda la selección pasa el límite de variables de SQLite"""
+    ids = list(ids)
+    return sum(
+        recalcular(Denuncia.objects.filter(pk__in=ids[i:i + lote]))
+        for i in range(0, len(ids), lote)
+    )
+
+
+def recalcular_vecindad(denuncia_id):
+    """
+    Una denuncia nueva cambia la densidad de su celda: recalcula la propia
+    denuncia y las abiertas de la misma celda.
+    """
+    fila = Denuncia.objects.filter(pk=denuncia_id).values_list(
+        'ubicacion__latitud', 'ubicacion__longitud'
+    ).first()
+    if fila is None:
+        return 0
+    latitud, longitud = fila
+    if latitud is None:
+        return recalcular_ids([denuncia_id])
+
+    # Rectángulo de la celda con un margen mínimo: recalcular una vecina de
+    # más no altera nada, dejar fuera una del borde sí
+    margen = 1e-6
+    inicio_lat = np.floor(float(latitud) / CELDA_GRADOS) * CELDA_GRADOS
+    inicio_lon = np.floor(float(longitud) / CELDA_GRADOS) * CELDA_GRADOS
+    vecinas = Denuncia.objects.filter(
+        ubicacion__latitud__gte=_decimal(inicio_lat - margen),
+        ubicacion__latitud__lte=_decimal(inicio_lat + CELDA_GRADOS + margen),
+        ubicacion__longitud__gte=_decimal(inicio_lon - margen),
+        ubicacion__longitud__lte=_decimal(inicio_lon + CELDA_GRADOS + margen),
+    )
+    return recalcular(vecinas | Denuncia.objects.filter(pk=denuncia_id))
+
+
+def recalcular_categoria(categoria_id):
+    """Cambió el peso de una categoría"""
+    return recalcular(Denuncia.objects.filter(categoria_id=categoria_id))
+
+
+def recalcular_todas(lote=5000, incluir_cerradas=False):
+    """
+    Recálculo completo en lotes vectorizados (la antigüedad y la ventana de
+    densidad avanzan con el tiempo aunque no haya eventos).
+    Retorna (procesadas, actualizadas).
+    """
+    ahora = timezone.now()
+    base = Denuncia.objects.all() if incluir_cerradas else Denuncia.objects.filter(estado__in=ESTADOS_PUNTUABLES)
+    recientes = _recientes_por_celda(ahora)
+    procesadas = actualizadas = 0
+    ultimo_id = 0
+
+    while True:
+        filas = list(
+            base.filter(pk__gt=ultimo_id)
+            .order_by('pk')
+            .values_list(*CAMPOS, 'puntaje')[:lote]
+        )
+        if not filas:
+            break
+        actuales = {fila[0]: fila[-1] for fila in filas}
+        ids, valores = _puntuar([fila[:-1] for fila in filas], ahora, recientes)
+        actualizadas += _guardar(ids, valores, actuales)
+        procesadas += len(filas)
+        ultimo_id = filas[-1][0]
+
+    return procesadas, actualizadas
@@ -0,0 +1,215 @@
+"""
+Región y comuna de una coordenada sin GIS externo.
+
+Lee los límites comunales de REGIONES_GEOJSON (GeoJSON en WGS84, un
+Feature Polygon/MultiPolygon por comuna con el código de región y de comuna
+en las propiedades REGIONES_CAMPO_REGION y REGIONES_CAMPO_COMUNA) y arma en
+memoria un árbol de cajas empaquetado con Sort-Tile-Recursive. Las consultas
+van por lotes: cada nodo filtra con NumPy los puntos que caen en su caja y
+en las hojas se hace punto-en-polígono vectorizado (regla par-impar).
+"""
+import json
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core import checks
+
+logger = logging.getLogger(__name__)
+
+CAPACIDAD = 8                     # hijos por nodo del árbol
+ELEMENTOS_POR_BLOQUE = 2_000_000  # puntos × aristas evaluados de una vez
+FUERA = ''                        # región de un punto que no cae en ninguna comuna
+
+
+# ==============================================================================
+# GEOMETRÍA VECTORIZADA
+# ==============================================================================
+
+def _aristas(geometria):
+    """(x1, y1, x2, y2) de todos los anillos, incluidos huecos y partes múltiples"""
+    if geometria['type'] == 'Polygon':
+        poligonos = [geometria['coordinates']]
+    elif geometria['type'] == 'MultiPolygon':
+        poligonos = geometria['coordinates']
+    else:
+        raise ValueError(f'Geometría no soportada: {geometria["type"]}')
+
+    segmentos = []
+    for poligono in poligonos:
+        for anillo in poligono:
+            puntos = np.asarray(anillo, dtype=np.float64)[:, :2]
+            segmentos.append(np.hstack([puntos, np.roll(puntos, -1, axis=0)]))
+    return np.vstack(segmentos).T.copy()
+
+
+def contiene(aristas, x, y):
+    """Máscara de los puntos (x, y) dentro del polígono, por regla par-impar"""
+    x1, y1, x2, y2 = aristas
+    dentro = np.zeros(len(x), dtype=bool)
+    bloque = max(1, ELEMENTOS_POR_BLOQUE // max(1, len(x1)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for inicio in range(0, len(x), bloque):
+            px = x[inicio:inicio + bloque, None]
+            py = y[inicio:inicio + bloque, None]
+            cruza = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+            dentro[inicio:inicio + bloque] = np.count_nonzero(cruza, axis=1) % 2 == 1
+    return dentro
+
+
+def _en_caja(caja, x, y):
+    return (x >= caja[0]) & (y >= caja[1]) & (x <= caja[2]) & (y <= caja[3])
+
+
+# ==============================================================================
+# ÁRBOL STR (SORT-TILE-RECURSIVE)
+# ==============================================================================
+
+class _Nodo:
+    __slots__ = ('caja', 'hijos', 'hoja')
+
+    def __init__(self, caja, hijos, hoja):
+        self.caja = caja
+        self.hijos = hijos  # índices de polígono en las hojas, nodos en el resto
+        self.hoja = hoja
+
+
+def _empaquetar(cajas):
+    """Grupos de índices de `cajas` (n×4): franjas por x, y dentro de cada una por y"""
+    hojas = math.ceil(len(cajas) / CAPACIDAD)
+    por_franja = math.ceil(math.sqrt(hojas)) * CAPACIDAD
+    centros_x = (cajas[:, 0] + cajas[:, 2]) / 2
+    centros_y = (cajas[:, 1] + cajas[:, 3]) / 2
+
+    orden = np.argsort(centros_x, kind='stable')
+    grupos = []
+    for inicio in range(0, len(orden), por_franja):
+        franja = orden[inicio:inicio + por_franja]
+        franja = franja[np.argsort(centros_y[franja], kind='stable')]
+        grupos.extend(franja[j:j + CAPACIDAD] for j in range(0, len(franja), CAPACIDAD))
+    return grupos
+
+
+def _arbol(cajas):
+    nivel = [
+        _Nodo(np.concatenate([cajas[g, :2].min(axis=0), cajas[g, 2:].max(axis=0)]), list(g), True)
+        for g in _empaquetar(cajas)
+    ]
+    while len(nivel) > 1:
+        cajas_nivel = np.array([nodo.caja for nodo in nivel])
+        nivel = [
+            _Nodo(
+                np.concatenate([cajas_nivel[g, :2].min(axis=0), cajas_nivel[g, 2:].max(axis=0)]),
+                [nivel[i] for i in g],
+                False
+            )
+            for g in _empaquetar(cajas_nivel)
+        ]
+    return nivel[0]
+
+
+# ==============================================================================
+# ÍNDICE DE COMUNAS
+# ==============================================================================
+
+class IndiceRegiones:
+
+    def __init__(self, features, campo_region, campo_comuna):
+        self.codigos = []  # (región, comuna) por polígono
+        self.aristas = []
+        cajas = []
+        for feature in features:
+            propiedades = feature.get('properties') or {}
+            if not feature.get('geometry') or propiedades.get(campo_region) is None:
+                continue
+            aristas = _aristas(feature['geometry'])
+            comuna = propiedades.get(campo_comuna)
+            self.codigos.append((str(propiedades[campo_region]), None if comuna is None else str(comuna)))
+            self.aristas.append(aristas)
+            cajas.append((aristas[0].min(), aristas[1].min(), aristas[0].max(), aristas[1].max()))
+        if not cajas:
+            raise ValueError('El GeoJSON no tiene polígonos con código de región')
+        self.cajas = np.array(cajas, dtype=np.float64)
+        self.raiz = _arbol(self.cajas)
+
+    @classmethod
+    def desde_archivo(cls, ruta, campo_region, campo_comuna):
+        with open(ruta, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        return cls(datos.get('features', []), campo_region, campo_comuna)
+
+    def poligonos(self, latitudes, longitudes):
+        """Índice del polígono de cada punto (-1 si no cae en ninguno o no tiene coordenadas)"""
+        x = np.asarray(longitudes, dtype=np.float64)
+        y = np.asarray(latitudes, dtype=np.float64)
+        resultado = np.full(len(x), -1, dtype=np.int64)
+        validos = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        if validos.size:
+            self._buscar(self.raiz, x, y, validos, resultado)
+        return resultado
+
+    def _buscar(self, nodo, x, y, indices, resultado):
+        indices = indices[_en_caja(nodo.caja, x[indices], y[indices])]
+        if not indices.size:
+            return
+        if not nodo.hoja:
+            for hijo in nodo.hijos:
+                self._buscar(hijo, x, y, indices, resultado)
+            return
+        for poligono in nodo.hijos:
+            # Un punto queda en el primer polígono que lo contiene (bordes compartidos)
+            candidatos = indices[resultado[indices] == -1]
+            candidatos = candidatos[_en_caja(self.cajas[poligono], x[candidatos], y[candidatos])]
+            if candidatos.size:
+                dentro = contiene(self.aristas[poligono], x[candidatos], y[candidatos])
+                resultado[candidatos[dentro]] = poligono
+
+    def asignar(self, latitudes, longitudes):
+        """[(región, comuna)] por punto; (FUERA, None) si no cae en ninguna comuna"""
+        return [
+            self.codigos[p] if p >= 0 else (FUERA, None)
+            for p in self.poligonos(latitudes, longitudes)
+        ]
+
+
+_indice = None
+_cargado = False
+_lock = threading.Lock()
+
+
+def indice():
+    """Índice del proceso, cargado una vez; None si no hay archivo de límites"""
+    global _indice, _cargado
+    if not _cargado:
+        with _lock:
+            if not _cargado:
+                ruta = settings.REGIONES_GEOJSON
+                if os.path.exists(ruta):
+                    _indice = IndiceRegiones.desde_archivo(
+                        ruta, settings.REGIONES_CAMPO_REGION, settings.REGIONES_CAMPO_COMUNA
+                    )
+                    logger.info('Límites comunales cargados: %s polígonos', len(_indice.codigos))
+                _cargado = True
+    return _indice
+
+
+def region_de(latitud, longitud):
+    """(región, comuna) de una coordenada, o (None, None) sin archivo de límites"""
+    actual = indice()
+    if actual is None or latitud is None or longitud is None:
+        return None, None
+    return actual.asignar([float(latitud)], [float(longitud)])[0]
+
+
+@checks.register()
+def revisar_limites_regiones(app_configs, **kwargs):
+    if os.path.exists(settings.REGIONES_GEOJSON):
+        return []
+    return [checks.Warning(
+        f'No existe {settings.REGIONES_GEOJSON}: las ubicaciones quedarán sin región ni comuna',
+        hint='Descarga los límites comunales en GeoJSON (WGS84) y define REGIONES_GEOJSON.',
+        id='appProyecto.W001',
+    )]
@@ -33,6 +33,14 @@ class UbicacionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'fecha_registro']
 
+    def validate(self, attrs):
+        # Internada: la comparten todos los reportes de la celda
+        if self.instance is not None and self.instance.clave is not None:
+            for campo in ('latitud', 'longitud'):
+                if campo in attrs and attrs[campo] != getattr(self.instance, campo):
+                    raise serializers.ValidationError({campo: 'Ubicación compartida: las coordenadas no se editan.'})
+        return attrs
+
 
 class DenunciaSerializer(serializers.ModelSerializer):
     usuario_username = serializers.CharField(source='usuario.username', read_only=True)
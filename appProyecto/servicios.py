@@ -0,0 +1,187 @@
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .basedatos import atomico, reintentar_si_bloqueada
+from .models import Denuncia, HistorialDenuncia, LogActividad, Ubicacion
+from .nomenclator import geocodificar
+from .priorizacion import recalcular_vecindad
+from .tareas import al_confirmar
+
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.gif')
+TAMANO_MINIATURA = (320, 320)
+
+
+# ==============================================================================
+# EFECTOS DIFERIDOS (se ejecutan tras el commit, fuera de la petición)
+# ==============================================================================
+
+def registrar_log_creacion(denuncia_id, usuario_id, ip):
+    titulo = Denuncia.objects.filter(pk=denuncia_id).values_list('titulo', flat=True).first()
+    if titulo is None:
+        return
+    LogActividad.objects.create(
+        usuario_id=usuario_id,
+        accion=f'Creó denuncia: {titulo}',
+        ip_origen=ip
+    )
+
+
+def generar_miniatura(denuncia_id, usuario_id, ip):
+    """Miniatura WebP de la evidencia (si es imagen) para los listados"""
+    denuncia = Denuncia.objects.filter(pk=denuncia_id).only('id', 'evidencia').first()
+    if denuncia is None or not denuncia.evidencia:
+        return
+    if os.path.splitext(denuncia.evidencia.name)[1].lower() not in EXTENSIONES_IMAGEN:
+        return
+
+    with denuncia.evidencia.open('rb') as archivo:
+        imagen = Image.open(archivo)
+        imagen.thumbnail(TAMANO_MINIATURA)
+        salida = BytesIO()
+        imagen.convert('RGB').save(salida, 'WEBP', quality=80)
+
+    ruta = denuncia.ruta_miniatura()
+    if default_storage.exists(ruta):
+        default_storage.delete(ruta)
+    ruta = default_storage.save(ruta, ContentFile(salida.getvalue()))
+    # Los listados leen la ruta de la fila en vez de consultar el storage;
+    # si la evidencia cambió mientras tanto, la fila no se toca
+    Denuncia.objects.filter(pk=denuncia_id, evidencia=denuncia.evidencia.name).update(miniatura=ruta)
+
+
+def detectar_duplicados(denuncia_id, usuario_id, ip):
+    """Marca en el historial posibles duplicados recientes del mismo usuario"""
+    denuncia = Denuncia.objects.filter(pk=denuncia_id).only(
+        'id', 'usuario_id', 'categoria_id', 'ubicacion_id', 'titulo', 'fecha_creacion'
+    ).first()
+    if denuncia is None:
+        return
+
+    recientes = Denuncia.objects.filter(
+        usuario_id=denuncia.usuario_id,
+        categoria_id=denuncia.categoria_id,
+        fecha_creacion__gte=denuncia.fecha_creacion - timedelta(hours=24),
+        fecha_creacion__lte=denuncia.fecha_creacion,
+    ).exclude(pk=denuncia.pk)
+    duplicada = recientes.filter(titulo__iexact=denuncia.titulo).values_list('id', flat=True).first()
+    if duplicada is None and denuncia.ubicacion_id:
+        duplicada = recientes.filter(ubicacion_id=denuncia.ubicacion_id).values_list('id', flat=True).first()
+
+    if duplicada is not None:
+        HistorialDenuncia.objects.create(
+            denuncia=denuncia,
+            usuario=None,
+            tipo_accion='comentario',
+            cambio_descripcion=f'Posible duplicado de la denuncia #{duplicada}'
+        )
+
+
+def ubicar_por_texto(denuncia_id, usuario_id, ip):
+    """Sin GPS: ubicación del lugar nombrado en ubicacion_texto (nomenclátor, sin red)"""
+    denuncia = Denuncia.objects.filter(pk=denuncia_id, ubicacion__isnull=True).only(
+        'id', 'ubicacion_texto'
+    ).first()
+    if denuncia is None or not denuncia.ubicacion_texto:
+        return
+    lugar = geocodificar(denuncia.ubicacion_texto)
+    if lugar is None:
+        return
+
+    with atomico():
+        ubicacion = Ubicacion.objects.internar(
+            round(lugar.latitud, 6), round(lugar.longitud, 6), lugar.nombre,
+            origen='nomenclator', confianza=lugar.confianza
+        )
+        actualizadas = Denuncia.objects.filter(pk=denuncia_id, ubicacion__isnull=True).update(
+            ubicacion=ubicacion
+        )
+    if actualizadas:
+        # El puntaje depende de la celda: se recalcula con la ubicación nueva
+        recalcular_vecindad(denuncia_id)
+
+
+def actualizar_puntajes(denuncia_id, usuario_id, ip):
+    """Puntaje de la nueva denuncia y de las abiertas de su celda"""
+    recalcular_vecindad(denuncia_id)
+
+
+# ==============================================================================
+# SERVICIO DE CREACIÓN
+# ==============================================================================
+
+class DenunciaCreationService:
+    """
+    Crea denuncias en una sola transacción (ubicación, denuncia e historial)
+    y deja el trabajo secundario en la cola de tareas tras el commit.
+    Lo comparten pagina2, el admin y cualquier API.
+    """
+
+    efectos = (
+        ubicar_por_texto,
+        registrar_log_creacion,
+        generar_miniatura,
+        detectar_duplicados,
+        actualizar_puntajes,
+    )
+
+    def __init__(self, usuario, ip=None):
+        self.usuario = usuario
+        self.ip = ip
+
+    def crear(self, *, categoria_id, titulo, descripcion, ubicacion_texto=None,
+              latitud=None, longitud=None, evidencia=None, evidencia_url=None,
+              prioridad='media'):
+        denuncia = Denuncia(
+            usuario=self.usuario,
+            categoria_id=categoria_id,
+            titulo=titulo,
+            descripcion=descripcion,
+            evidencia=evidencia,
+            evidencia_url=evidencia_url if evidencia_url else None,
+            estado='pendiente',
+            prioridad=prioridad,
+            ubicacion_texto=ubicacion_texto or None
+        )
+
+        ubicacion = None
+        if latitud and longitud:
+            ubicacion = Ubicacion(
+                latitud=latitud,
+                longitud=longitud,
+                descripcion=ubicacion_texto
+            )
+        # Sin GPS, el lugar nombrado en ubicacion_texto se busca tras el commit
+        # (ubicar_por_texto): el nomenclátor no se consulta dentro de la petición
+
+        return self.guardar(denuncia, ubicacion)
+
+    @reintentar_si_bloqueada
+    def guardar(self, denuncia, ubicacion=None):
+        """Persiste una denuncia ya construida (p. ej. desde el admin)"""
+        with atomico():
+            if ubicacion is not None:
+                if ubicacion.pk is None:
+                    # Reportes desde el mismo punto comparten la fila
+                    ubicacion = Ubicacion.objects.internar(
+                        ubicacion.latitud, ubicacion.longitud, ubicacion.descripcion,
+                        origen=ubicacion.origen, confianza=ubicacion.confianza
+                    )
+                denuncia.ubicacion = ubicacion
+            denuncia.save()
+
+            HistorialDenuncia.objects.create(
+                denuncia=denuncia,
+                usuario=self.usuario,
+                tipo_accion='creacion',
+                cambio_descripcion=f'Denuncia creada: {denuncia.titulo}'
+            )
+
+            for efecto in self.efectos:
+                al_confirmar(efecto, denuncia.pk, self.usuario.pk, self.ip)
+
+        return denuncia
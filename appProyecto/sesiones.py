@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from .basedatos import reintentar_si_bloqueada
+
+
+# Marca (epoch) de la última escritura de la sesión en la base de datos
+CLAVE_RENOVACION = '_renovada_en'
+
+
+class SessionStore(CachedDBStore):
+    """
+    Sesiones en caché con respaldo en BD que solo se reescriben si cambiaron
+    o si la última renovación supera SESSION_REFRESH_THRESHOLD segundos.
+    Mantiene la expiración deslizante de SESSION_COOKIE_AGE sin un UPDATE
+    sobre django_session en cada petición.
+    """
+
+    def _ahora(self):
+        return time.time()
+
+    def _requiere_renovacion(self):
+        renovada_en = self._get_session().get(CLAVE_RENOVACION)
+        if renovada_en is None:
+            return True
+        umbral = getattr(settings, 'SESSION_REFRESH_THRESHOLD', 300)
+        return self._ahora() - renovada_en >= umbral
+
+    @reintentar_si_bloqueada
+    def save(self, must_create=False):
+        if (
+            self.session_key is not None
+            and not must_create
+            and not self.modified
+            and not self._requiere_renovacion()
+        ):
+            return
+        self._get_session(no_load=must_create)[CLAVE_RENOVACION] = int(self._ahora())
+        super().save(must_create)
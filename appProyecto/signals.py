@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .autenticacion import invalidar_usuarios
+from .basedatos import aplicar_pragmas_sqlite
+from .enrutador import auditoria_separada
+from .dispositivos import publicar_cambio
+from .models import (
+    Categoria, Denuncia, DenunciaArchivada, Dispositivo, HistorialDenuncia, HistorialDenunciaArchivada,
+    LogActividad, Usuario,
+)
+from .priorizacion import recalcular_categoria
+from .tareas import al_confirmar
+
+
+# ==============================================================================
+# PERFIL SQLITE
+# ==============================================================================
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        aplicar_pragmas_sqlite(connection)
+
+
+# ==============================================================================
+# SNAPSHOT DE USUARIO EN CACHÉ
+# ==============================================================================
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_snapshot_usuario(sender, instance, **kwargs):
+    """Cambios de rol, activación o contraseña descartan el snapshot"""
+    invalidar_usuarios([instance.pk])
+
+
+@receiver(m2m_changed, sender=Usuario.groups.through)
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+def invalidar_permisos_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    """Cambios en grupos o permisos directos del usuario"""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        if pk_set:
+            invalidar_usuarios(pk_set)
+    else:
+        invalidar_usuarios([instance.pk])
+
+
+# ==============================================================================
+# PUNTAJE DE URGENCIA
+# ==============================================================================
+
+@receiver(post_save, sender=Categoria)
+def recalcular_puntajes_categoria(sender, instance, created, **kwargs):
+    """El peso de la categoría multiplica el puntaje de sus denuncias"""
+    if not created:
+        al_confirmar(recalcular_categoria, instance.pk)
+
+
+# ==============================================================================
+# ÍNDICE DE DISPOSITIVOS
+# ==============================================================================
+
+@receiver(post_save, sender=Dispositivo)
+def publicar_dispositivo_movido(sender, instance, using, **kwargs):
+    transaction.on_commit(publicar_cambio, using=using)
+
+
+@receiver(post_delete, sender=Dispositivo)
+def publicar_dispositivo_borrado(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: publicar_cambio(baja=True), using=using)
+
+
+# ==============================================================================
+# CASCADAS HACIA LA BASE DE AUDITORÍA
+# ==============================================================================
+
+HISTORIAL_DE = {Denuncia: HistorialDenuncia, DenunciaArchivada: HistorialDenunciaArchivada}
+
+
+@receiver(post_delete, sender=Denuncia)
+@receiver(post_delete, sender=DenunciaArchivada)
+def borrar_historial_denuncia(sender, instance, using, **kwargs):
+    """Con la auditoría en otra base no hay FK: el historial se borra al confirmar"""
+    if not auditoria_separada():
+        return  # CASCADE del ORM
+    denuncia_id = instance.pk  # Django lo deja en None al terminar el delete
+    historial = HISTORIAL_DE[sender]
+    transaction.on_commit(
+        lambda: historial.objects.filter(denuncia_id=denuncia_id).delete(),
+        using=using
+    )
+
+
+@receiver(post_delete, sender=Usuario)
+def desvincular_auditoria_usuario(sender, instance, using, **kwargs):
+    """Historial y logs se conservan sin usuario (SET_NULL sin FK en el motor)"""
+    if not auditoria_separada():
+        return  # SET_NULL del ORM
+    usuario_id = instance.pk
+
+    def desvincular():
+        HistorialDenuncia.objects.filter(usuario_id=usuario_id).update(usuario=None)
+        HistorialDenunciaArchivada.objects.filter(usuario_id=usuario_id).update(usuario=None)
+        LogActividad.objects.filter(usuario_id=usuario_id).update(usuario=None)
+
+    transaction.on_commit(desvincular, using=using)
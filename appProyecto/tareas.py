@@ -0,0 +1,48 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+from .basedatos import reintentar_si_bloqueada
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _obtener_executor():
+    """Pool de hilos por proceso, creado después del fork de gunicorn"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TAREAS_WORKERS', 2),
+                    thread_name_prefix='silvasentinel-tarea',
+                )
+    return _executor
+
+
+def _ejecutar(func, args, kwargs):
+    close_old_connections()
+    try:
+        return reintentar_si_bloqueada(func)(*args, **kwargs)
+    except Exception:
+        logger.exception('Error en tarea en segundo plano %s', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def encolar(func, *args, **kwargs):
+    """Ejecuta `func` fuera del ciclo de la petición"""
+    if getattr(settings, 'TAREAS_SINCRONAS', False):
+        return func(*args, **kwargs)
+    return _obtener_executor().submit(_ejecutar, func, args, kwargs)
+
+
+def al_confirmar(func, *args, using=None, **kwargs):
+    """Encola `func` solo si la transacción actual se confirma"""
+    transaction.on_commit(lambda: encolar(func, *args, **kwargs), using=using)
@@ -1,3 +1,293 @@
-from django.test import TestCase
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from . import imagenes
+from .inaturalist import Circuito, ClienteINaturalist, ServicioNoDisponible, TimeoutAdaptativo
+
+
+# ==============================================================================
+# SERVIDOR HTTP DE PRUEBA
+# ==============================================================================
+
+class ServidorFalso:
+    """
+    Servidor HTTP local en un hilo. `rutas` asocia cada ruta (sin query) a
+    (estado, cabeceras, cuerpo, demora en s); `pedidos` cuenta lo recibido.
+    """
+
+    def __init__(self):
+        self.rutas = {}
+        self.pedidos = Counter()
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                ruta = self.path.split('?')[0]
+                servidor.pedidos[ruta] += 1
+                estado, cabeceras, cuerpo, demora = servidor.rutas.get(ruta, (404, {}, b'', 0))
+                if demora:
+                    time.sleep(demora)
+                try:
+                    self.send_response(estado)
+                    for nombre, valor in cabeceras.items():
+                        self.send_header(nombre, valor)
+                    self.send_header('Content-Length', str(len(cuerpo)))
+                    self.end_headers()
+                    self.wfile.write(cuerpo)
+                except (BrokenPipeError, ConnectionResetError):  # el cliente ya se rindió
+                    pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.http.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.http.server_port}'
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+class ConServidorFalso(SimpleTestCase):
+
+    def setUp(self):
+        self.servidor = ServidorFalso()
+        self.addCleanup(self.servidor.cerrar)
+
+
+# ==============================================================================
+# CIRCUITO Y TIMEOUT DE INATURALIST
+# ==============================================================================
+
+class CircuitoTests(SimpleTestCase):
+
+    def test_abre_tras_fallas_seguidas(self):
+        circuito = Circuito(fallas_para_abrir=3, enfriamiento=60)
+        for _ in range(2):
+            circuito.falla()
+        self.assertTrue(circuito.permitir())
+        circuito.falla()
+        self.assertTrue(circuito.abierto)
+        self.assertFalse(circuito.permitir())
+
+    def test_semiabierto_deja_pasar_una_sola_prueba(self):
+        circuito = Circuito(fallas_para_abrir=1, enfriamiento=0)
+        circuito.falla()
+        self.assertTrue(circuito.semiabierto)
+        self.assertTrue(circuito.permitir())
+        self.assertFalse(circuito.permitir())  # la prueba sigue en curso
+        circuito.exito()
+        self.assertTrue(circuito.permitir())
+        self.assertTrue(circuito.permitir())
+
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        circuito = Circuito(fallas_para_abrir=1, enfriamiento=0)
+        circuito.falla()
+        self.assertTrue(circuito.permitir())
+        circuito.enfriamiento = 60
+        circuito.falla()
+        self.assertTrue(circuito.abierto)
+        self.assertFalse(circuito.permitir())
+
+
+class TimeoutAdaptativoTests(SimpleTestCase):
+
+    def test_sin_muestras_usa_el_maximo(self):
+        self.assertEqual(TimeoutAdaptativo(1, 10).actual(), 10)
+
+    def test_converge_a_la_latencia_acotado_por_el_minimo(self):
+        timeout = TimeoutAdaptativo(0.5, 10)
+        for _ in range(50):
+            timeout.registrar(0.1)
+        self.assertAlmostEqual(timeout.actual(), 0.5)
+        for _ in range(50):
+            timeout.registrar(2.0)
+        self.assertGreater(timeout.actual(), 2.0)
+        self.assertLess(timeout.actual(), 10)
+
+    def test_expiro_duplica_hasta_el_maximo(self):
+        timeout = TimeoutAdaptativo(0.1, 3)
+        timeout.registrar(1.0)
+        timeout.expiro()
+        self.assertEqual(timeout.media, 2.0)
+        timeout.expiro()
+        self.assertEqual(timeout.media, 3)
+
+
+@override_settings(
+    INATURALIST_FALLAS_PARA_ABRIR=2,
+    INATURALIST_ENFRIAMIENTO=0.3,
+    INATURALIST_TIMEOUT=2,
+    INATURALIST_TIMEOUT_MINIMO=0.2,
+)
+class ClienteINaturalistTests(ConServidorFalso):
+
+    def consultar(self, *corrutinas):
+        """Corre las consultas de un cliente nuevo contra el servidor falso"""
+        async def correr():
+            with override_settings(INATURALIST_URL=self.servidor.url):
+                cliente = ClienteINaturalist()
+            try:
+                return cliente, [await corrutina(cliente) for corrutina in corrutinas]
+            finally:
+                await cliente.http.aclose()
+        return asyncio.run(correr())
+
+    @staticmethod
+    async def intentar(consulta):
+        try:
+            return await consulta
+        except ServicioNoDisponible as error:
+            return error
+
+    def test_circuito_abre_y_deja_de_llamar(self):
+        self.servidor.rutas['/observations'] = (500, {}, b'', 0)
+        pedir = lambda cliente: self.intentar(cliente.consultar('/observations'))
+        cliente, resultados = self.consultar(pedir, pedir, pedir)
+        self.assertTrue(all(isinstance(r, ServicioNoDisponible) for r in resultados))
+        self.assertEqual(str(resultados[2]), 'circuito abierto')
+        self.assertEqual(self.servidor.pedidos['/observations'], 2)
+        self.assertTrue(cliente.circuito.abierto)
+
+    def test_semiabierto_envia_una_sola_prueba(self):
+        self.servidor.rutas['/observations'] = (500, {}, b'', 0)
+
+        async def abrir(cliente):
+            for _ in range(2):
+                await self.intentar(cliente.consultar('/observations'))
+
+        async def probar_en_paralelo(cliente):
+            await asyncio.sleep(0.35)  # fin del enfriamiento
+            self.servidor.rutas['/observations'] = (200, {'Content-Type': 'application/json'}, b'{"results": []}', 0.1)
+            return await asyncio.gather(*(
+                self.intentar(cliente.consultar('/observations')) for _ in range(3)
+            ))
+
+        async def despues(cliente):
+            return await cliente.consultar('/observations')
+
+        cliente, (_, en_paralelo, siguiente) = self.consultar(abrir, probar_en_paralelo, despues)
+        self.assertEqual(sum(not isinstance(r, ServicioNoDisponible) for r in en_paralelo), 1)
+        self.assertEqual(siguiente, {'results': []})
+        self.assertEqual(self.servidor.pedidos['/observations'], 2 + 1 + 1)
+        self.assertFalse(cliente.circuito.abierto)
+
+    def test_4xx_no_abre_el_circuito(self):
+        self.servidor.rutas['/observations'] = (422, {}, b'', 0)
+        pedir = lambda cliente: self.intentar(cliente.consultar('/observations'))
+        cliente, _ = self.consultar(pedir, pedir, pedir)
+        self.assertEqual(self.servidor.pedidos['/observations'], 3)
+        self.assertEqual(cliente.circuito.fallas, 0)
+
+    def test_timeout_adaptativo_corta_la_respuesta_lenta(self):
+        self.servidor.rutas['/rapida'] = (200, {'Content-Type': 'application/json'}, b'{}', 0)
+        self.servidor.rutas['/lenta'] = (200, {'Content-Type': 'application/json'}, b'{}', 1)
+
+        async def aprender(cliente):
+            for _ in range(10):
+                await cliente.consultar('/rapida')
+            return cliente.timeout.actual()
+
+        async def lenta(cliente):
+            inicio = time.monotonic()
+            error = await self.intentar(cliente.consultar('/lenta'))
+            return error, time.monotonic() - inicio
+
+        cliente, (aprendido, (error, demora)) = self.consultar(aprender, lenta)
+        self.assertAlmostEqual(aprendido, 0.2)
+        self.assertIsInstance(error, ServicioNoDisponible)
+        self.assertLess(demora, 0.9)
+        self.assertEqual(cliente.circuito.fallas, 1)
+
+
+# ==============================================================================
+# PROXY DE IMÁGENES
+# ==============================================================================
+
+def jpeg(ancho=800, alto=600):
+    salida = BytesIO()
+    Image.new('RGB', (ancho, alto), 'green').save(salida, 'JPEG')
+    return salida.getvalue()
+
+
+class ImagenProxyTests(ConServidorFalso):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(IMAGENES_CACHE_DIR=directorio, IMAGENES_HOSTS_REDIRECCION=[])
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.directorio = directorio
+
+    def pedir(self, ruta, **cabeceras):
+        return self.client.get(imagenes.url_proxy(self.servidor.url + ruta), headers=cabeceras)
+
+    def test_convierte_a_webp_y_sirve_desde_disco(self):
+        self.servidor.rutas['/foto.jpg'] = (200, {'Content-Type': 'image/jpeg'}, jpeg(), 0)
+        for _ in range(2):
+            respuesta = self.pedir('/foto.jpg')
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta['Content-Type'], 'image/webp')
+            self.assertEqual(respuesta['Cache-Control'], imagenes.CACHE_CONTROL)
+        imagen = Image.open(BytesIO(respuesta.content))
+        self.assertLessEqual(imagen.width, 800)
+        self.assertEqual(self.servidor.pedidos['/foto.jpg'], 1)
+
+    def test_304_con_el_etag_sin_descargar(self):
+        self.servidor.rutas['/foto.jpg'] = (200, {}, jpeg(), 0)
+        etag = self.pedir('/foto.jpg')['ETag']
+        respuesta = self.pedir('/foto.jpg', if_none_match=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+        self.assertEqual(self.servidor.pedidos['/foto.jpg'], 1)
+
+    def test_502_si_el_origen_falla(self):
+        self.servidor.rutas['/foto.jpg'] = (500, {}, b'', 0)
+        self.assertEqual(self.pedir('/foto.jpg').status_code, 502)
+        self.servidor.rutas['/foto.jpg'] = (200, {}, b'no es una imagen', 0)
+        self.assertEqual(self.pedir('/foto.jpg').status_code, 502)
+
+    def test_502_si_supera_el_tamano_maximo(self):
+        original = jpeg(2000, 2000)
+        self.servidor.rutas['/grande.jpg'] = (200, {}, original, 0)
+        with override_settings(IMAGENES_MAX_BYTES=len(original) - 1):
+            self.assertEqual(self.pedir('/grande.jpg').status_code, 502)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_redirecciones_solo_al_mismo_host(self):
+        self.servidor.rutas['/foto.jpg'] = (200, {}, jpeg(), 0)
+        self.servidor.rutas['/movida'] = (302, {'Location': '/foto.jpg'}, b'', 0)
+        self.servidor.rutas['/afuera'] = (302, {'Location': 'http://169.254.169.254/latest/'}, b'', 0)
+        self.assertEqual(self.pedir('/movida').status_code, 200)
+        self.assertEqual(self.pedir('/afuera').status_code, 502)
+
+    def test_firma_invalida(self):
+        respuesta = self.client.get('/api/imagenes/', {'u': f'{self.servidor.url}/foto.jpg'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_recorte_mide_lo_escrito_por_otros_procesos(self):
+        # Archivos de otro worker que este proceso no contó
+        for numero in range(10):
+            ruta = os.path.join(self.directorio, 'aa', f'{numero:064d}.webp')
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'x' * 1000)
+        with override_settings(IMAGENES_CACHE_MAX_BYTES=5000):
+            imagenes._escritos = 0
+            imagenes.guardar('b' * 64, b'y' * 1000)
+        total = sum(tamano for _, tamano, _ in imagenes._archivos())
+        self.assertLessEqual(total, 5000)
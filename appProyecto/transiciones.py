@@ -0,0 +1,240 @@
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .basedatos import atomico, reintentar_si_bloqueada
+from .models import Denuncia, HistorialDenuncia, LogActividad
+from .priorizacion import ESTADOS_PUNTUABLES, recalcular_ids
+from .tareas import al_confirmar
+
+
+# ==============================================================================
+# GRAFO DE ESTADOS
+# ==============================================================================
+
+TRANSICIONES = {
+    'pendiente': ('en_proceso', 'resuelta', 'rechazada'),
+    'en_proceso': ('pendiente', 'resuelta', 'rechazada'),
+    'resuelta': ('en_proceso',),   # reapertura
+    'rechazada': ('pendiente',),   # reconsideración
+}
+
+# Al cerrarse, la denuncia sale de la cola de trabajo
+ESTADOS_CERRADOS = ('resuelta', 'rechazada')
+
+
+class TransicionInvalida(Exception):
+    """El estado destino no existe o no es alcanzable desde el estado actual"""
+
+
+class ConflictoConcurrencia(Exception):
+    """La denuncia cambió de estado desde que se leyó"""
+
+
+def puede_transicionar(origen, destino):
+    return destino in TRANSICIONES.get(origen, ())
+
+
+def origenes_para(destino):
+    """Estados desde los que se puede llegar a `destino`"""
+    return [origen for origen, destinos in TRANSICIONES.items() if destino in destinos]
+
+
+def validar_transicion(origen, destino):
+    if destino not in dict(Denuncia.ESTADOS):
+        raise TransicionInvalida('Estado inválido')
+    if not puede_transicionar(origen, destino):
+        raise TransicionInvalida(
+            f'No se puede pasar de {Denuncia(estado=origen).get_estado_display()} '
+            f'a {Denuncia(estado=destino).get_estado_display()}'
+        )
+
+
+# ==============================================================================
+# TRANSICIONES INDIVIDUALES (compare-and-set)
+# ==============================================================================
+
+@reintentar_si_bloqueada
+def actualizar_denuncia(denuncia, usuario, cambios, ip=None, log=None, tipo_accion='edicion'):
+    """
+    Aplica `cambios` con un único UPDATE condicionado al estado leído
+    (WHERE id=? AND estado=?) que solo toca las columnas modificadas.
+    Historial y log se escriben en la misma transacción.
+    Retorna la lista de cambios registrados en el historial.
+    """
+    cambios = {
+        campo: valor for campo, valor in cambios.items()
+        if getattr(denuncia, campo) != valor
+    }
+    if 'estado' in cambios:
+        validar_transicion(denuncia.estado, cambios['estado'])
+
+    descripcion = []
+    for campo, etiqueta in (('estado', 'Estado'), ('prioridad', 'Prioridad')):
+        if campo in cambios:
+            descripcion.append(f'{etiqueta}: {getattr(denuncia, campo)} → {cambios[campo]}')
+
+    with atomico():
+        if cambios:
+            if cambios.get('estado') in ESTADOS_CERRADOS:
+                cambios.update(asignado_a=None, asignacion_expira=None)
+            cambios['fecha_actualizacion'] = timezone.now()
+            filas = Denuncia.objects.filter(
+                pk=denuncia.pk,
+                estado=denuncia.estado,
+            ).update(**cambios)
+            if filas == 0:
+                raise ConflictoConcurrencia(f'La denuncia #{denuncia.pk} fue modificada por otro usuario')
+
+        if descripcion:
+            HistorialDenuncia.objects.create(
+                denuncia=denuncia,
+                usuario=usuario,
+                tipo_accion=tipo_accion,
+                cambio_descripcion=', '.join(descripcion)
+            )
+        if log:
+            LogActividad.objects.create(usuario=usuario, accion=log, ip_origen=ip)
+        if 'categoria_id' in cambios or cambios.get('estado') in ESTADOS_PUNTUABLES:
+            al_confirmar(recalcular_ids, [denuncia.pk])
+
+    for campo, valor in cambios.items():
+        setattr(denuncia, campo, valor)
+    return descripcion
+
+
+def transicionar(denuncia, nuevo_estado, usuario, ip=None, log=None):
+    """Cambia solo el estado de una denuncia"""
+    return actualizar_denuncia(
+        denuncia, usuario, {'estado': nuevo_estado},
+        ip=ip, log=log, tipo_accion='cambio_estado'
+    )
+
+
+# ==============================================================================
+# TRANSICIONES MASIVAS
+# ==============================================================================
+
+@reintentar_si_bloqueada
+def _aplicar_lote(queryset, usuario, ip=None, estado=None, prioridad=None, batch_size=1000):
+    """
+    Núcleo de las operaciones masivas: un único UPDATE con expresiones
+    condicionales (el estado solo cambia donde la transición es válida)
+    más historial y log por denuncia insertados con bulk_create.
+    Retorna {denuncia_id: (estado_anterior, prioridad_anterior)} de las modificadas.
+    """
+    if estado is not None and estado not in dict(Denuncia.ESTADOS):
+        raise TransicionInvalida('Estado inválido')
+    if prioridad is not None and prioridad not in dict(Denuncia.PRIORIDADES):
+        raise TransicionInvalida('Prioridad inválida')
+
+    origenes = origenes_para(estado) if estado else []
+    condicion = Q(pk__in=[])
+    cambios = {'fecha_actualizacion': timezone.now()}
+    if estado:
+        condicion |= Q(estado__in=origenes)
+        cambios['estado'] = Case(When(estado__in=origenes, then=Value(estado)), default=F('estado'))
+        if estado in ESTADOS_CERRADOS:
+            cambios['asignado_a'] = Case(When(estado__in=origenes, then=None), default=F('asignado_a'))
+            cambios['asignacion_expira'] = Case(When(estado__in=origenes, then=None), default=F('asignacion_expira'))
+    if prioridad:
+        condicion |= ~Q(prioridad=prioridad)
+        cambios['prioridad'] = Value(prioridad)
+
+    afectadas = queryset.filter(condicion)
+
+    with atomico():
+        previas = {
+            denuncia_id: (estado_anterior, prioridad_anterior)
+            for denuncia_id, estado_anterior, prioridad_anterior
+            in afectadas.select_for_update().values_list('id', 'estado', 'prioridad')
+        }
+        if not previas:
+            return {}
+
+        filas = afectadas.update(**cambios)
+        if filas != len(previas):
+            raise ConflictoConcurrencia('Otras denuncias cambiaron durante la operación')
+
+        historial = []
+        logs = []
+        for denuncia_id, (estado_anterior, prioridad_anterior) in previas.items():
+            cambio_estado = bool(estado) and estado_anterior in origenes
+            cambio_prioridad = bool(prioridad) and prioridad_anterior != prioridad
+
+            descripcion = []
+            if cambio_estado:
+                descripcion.append(f'Estado: {estado_anterior} → {estado}')
+            if cambio_prioridad:
+                descripcion.append(f'Prioridad: {prioridad_anterior} → {prioridad}')
+
+            if cambio_estado and cambio_prioridad:
+                accion = f'Cambió estado de denuncia #{denuncia_id} a {estado} y prioridad a {prioridad}'
+            elif cambio_estado:
+                accion = f'Cambió estado de denuncia #{denuncia_id} a {estado}'
+            else:
+                accion = f'Cambió prioridad de denuncia #{denuncia_id} a {prioridad}'
+
+            historial.append(HistorialDenuncia(
+                denuncia_id=denuncia_id,
+                usuario=usuario,
+                tipo_accion='edicion' if cambio_prioridad else 'cambio_estado',
+                cambio_descripcion=', '.join(descripcion)
+            ))
+            logs.append(LogActividad(usuario=usuario, accion=accion, ip_origen=ip))
+
+        HistorialDenuncia.objects.bulk_create(historial, batch_size=batch_size)
+        LogActividad.objects.bulk_create(logs, batch_size=batch_size)
+        if estado in ESTADOS_PUNTUABLES:
+            # Reaperturas: las cerradas no se puntúan
+            al_confirmar(recalcular_ids, list(previas))
+
+    return previas
+
+
+def transicionar_lote(queryset, nuevo_estado, usuario, ip=None):
+    """
+    Mueve en un solo UPDATE todas las denuncias de `queryset` cuyo estado
+    actual permite llegar a `nuevo_estado`. Las demás quedan intactas.
+    Retorna {denuncia_id: estado_anterior} de las denuncias movidas.
+    """
+    previas = _aplicar_lote(queryset, usuario, ip, estado=nuevo_estado)
+    return {denuncia_id: estado_anterior for denuncia_id, (estado_anterior, _) in previas.items()}
+
+
+def cambiar_prioridad_lote(queryset, nueva_prioridad, usuario, ip=None):
+    """
+    Cambia en un solo UPDATE la prioridad de las denuncias de `queryset`.
+    Retorna {denuncia_id: prioridad_anterior} de las denuncias modificadas.
+    """
+    previas = _aplicar_lote(queryset, usuario, ip, prioridad=nueva_prioridad)
+    return {denuncia_id: prioridad_anterior for denuncia_id, (_, prioridad_anterior) in previas.items()}
+
+
+@reintentar_si_bloqueada
+def triage_lote(queryset, usuario, estado=None, prioridad=None, ip=None):
+    """
+    Triage masivo: aplica estado y/o prioridad a todas las denuncias de
+    `queryset` en un solo UPDATE. Retorna el resultado por denuncia:
+    {id: {'estado': 'actualizada' | 'sin_cambios' | 'transicion_invalida',
+          'prioridad': 'actualizada' | 'sin_cambios'}}
+    """
+    with atomico():
+        actuales = dict(queryset.select_for_update().values_list('id', 'estado'))
+        previas = _aplicar_lote(queryset, usuario, ip, estado=estado, prioridad=prioridad)
+
+    origenes = origenes_para(estado) if estado else []
+    resultados = {}
+    for denuncia_id, estado_actual in actuales.items():
+        resultado = {}
+        if estado:
+            if estado_actual in origenes:
+                resultado['estado'] = 'actualizada'
+            elif estado_actual == estado:
+                resultado['estado'] = 'sin_cambios'
+            else:
+                resultado['estado'] = 'transicion_invalida'
+        if prioridad:
+            anterior = previas.get(denuncia_id)
+            resultado['prioridad'] = 'actualizada' if anterior and anterior[1] != prioridad else 'sin_cambios'
+        resultados[denuncia_id] = resultado
+    return resultados
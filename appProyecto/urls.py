@@ -56,6 +56,9 @@ urlpatterns = [
     path('editar-denuncia/<int:denuncia_id>/', views.editar_denuncia, name='editar_denuncia'),
     path('cambiar-estado/<int:denuncia_id>/', views.cambiar_estado_denuncia, name='cambiar_estado_denuncia'),
     path('historial-denuncia/<int:denuncia_id>/', views.ver_historial_denuncia, name='ver_historial_denuncia'),
+    path('triage-masivo/', views.triage_masivo, name='triage_masivo'),
+    path('cola-trabajo/reclamar/', views.reclamar_denuncias, name='reclamar_denuncias'),
+    path('cola-trabajo/liberar/<int:denuncia_id>/', views.liberar_denuncia, name='liberar_denuncia'),
     
     # ========================================
     # SOLO ADMIN (gestión de usuarios y sistema)
@@ -73,8 +76,12 @@ urlpatterns = [
     # API JSON (acceso público/autenticado según endpoint)
     # ========================================
     path('api/denuncias/lista/', views.lista_denuncias, name='lista_denuncias'),
+    path('api/denuncias.geojson', views.denuncias_geojson, name='denuncias_geojson'),
     path('api/denuncias/estadisticas/', views.estadisticas_denuncias, name='estadisticas_denuncias'),
     path('api/denuncias/recientes/', views.denuncias_recientes, name='denuncias_recientes'),
+    path('api/denuncias/<int:denuncia_id>/dispositivos/', views.dispositivos_cercanos, name='dispositivos_cercanos'),
+    path('api/hotspots/', views.hotspots_geojson, name='hotspots_geojson'),
+    path('api/imagenes/', views.imagen_proxy, name='imagen_proxy'),
     
     # ========================================
     # REST FRAMEWORK ROUTER 
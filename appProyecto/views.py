@@ -1,10 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import router
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.gzip import gzip_page
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-import requests
+import json
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import render
 
@@ -13,26 +23,44 @@ from .models import (
     Categoria,
     Ubicacion,
     Denuncia,
+    DenunciaArchivada,
     HistorialDenuncia,
     LogActividad,
     Mensaje,
     Observacion,
     Dispositivo,
     Reporte,
-    TokenRecuperacion
+    TokenRecuperacion,
+    Hotspot
 )
 
 # ✅ IMPORTAR DECORADORES PERSONALIZADOS
 from .decorators import rol_requerido, solo_admin, admin_o_revisor, usuario_autenticado
+from .archivo import con_archivo, con_relaciones, contar, incluir_archivo
+from . import catalogo, dispositivos, imagenes, inaturalist
+from .enrutador import lectura_en_replica
+from . import cola_trabajo
+from .servicios import DenunciaCreationService, generar_miniatura
+from .tareas import al_confirmar
+from .transiciones import (
+    ConflictoConcurrencia,
+    TransicionInvalida,
+    actualizar_denuncia,
+    transicionar,
+    triage_lote,
+)
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+DENUNCIAS_POR_PAGINA = 50
+
 # ========================================
 # VISTAS PÚBLICAS (sin autenticación)
 # ========================================
 
+@lectura_en_replica
 def index(request):
     """Página principal - Acceso público"""
     from django.db.models import Count
@@ -90,48 +118,20 @@ def pagina2(request):
             messages.error(request, '⚠️ Debes seleccionar una categoría.')
             return render(request, 'pagina2.html', {'categorias': categorias})
 
-        # Crear ubicación si hay coordenadas
-        ubicacion = None
-        if latitud and longitud:
-            try:
-                ubicacion = Ubicacion.objects.create(
-                    latitud=latitud,
-                    longitud=longitud,
-                    descripcion=ubicacion_texto
-                )
-            except Exception as e:
-                messages.error(request, f'⚠️ Error al guardar ubicación: {str(e)}')
-                return render(request, 'pagina2.html', {'categorias': categorias})
-
-        # Crear denuncia
+        # Ubicación, denuncia e historial en una transacción; log y demás efectos tras el commit
         try:
-            denuncia = Denuncia.objects.create(
-                usuario=request.user,
+            DenunciaCreationService(request.user, ip=request.META.get('REMOTE_ADDR')).crear(
                 categoria_id=categoria_id,
-                ubicacion=ubicacion,
                 titulo=titulo,
                 descripcion=descripcion,
+                ubicacion_texto=ubicacion_texto,
+                latitud=latitud,
+                longitud=longitud,
                 evidencia=evidencia_file,
-                evidencia_url=evidencia_url if evidencia_url else None,
-                estado='pendiente',
+                evidencia_url=evidencia_url,
                 prioridad=prioridad
             )
 
-            # Registrar en historial
-            HistorialDenuncia.objects.create(
-                denuncia=denuncia,
-                usuario=request.user,
-                tipo_accion='creacion',
-                cambio_descripcion=f'Denuncia creada: {titulo}'
-            )
-
-            # Registrar en log de actividad
-            LogActividad.objects.create(
-                usuario=request.user,
-                accion=f'Creó denuncia: {titulo}',
-                ip_origen=request.META.get('REMOTE_ADDR')
-            )
-
             messages.success(request, '✅ ¡Denuncia enviada exitosamente!')
             return redirect('mis_denuncias')
 
@@ -146,14 +146,26 @@ def mis_denuncias(request):
     """
     Ver SOLO las denuncias propias del usuario
     Cada usuario ve únicamente sus propias denuncias
+    Con ?incluir_archivo=1 suma también las archivadas
     """
-    denuncias = Denuncia.objects.filter(usuario=request.user).select_related('categoria', 'ubicacion').order_by('-fecha_creacion')
+    incluir = incluir_archivo(request)
+    if incluir:
+        denuncias = con_relaciones(
+            con_archivo(
+                Denuncia.objects.filter(usuario=request.user),
+                DenunciaArchivada.objects.filter(usuario=request.user)
+            ).order_by('-fecha_creacion'),
+            'categoria', 'ubicacion'
+        )
+    else:
+        denuncias = Denuncia.objects.filter(usuario=request.user).select_related('categoria', 'ubicacion').order_by('-fecha_creacion')
 
     context = {
         'denuncias': denuncias,
-        'total': denuncias.count(),
-        'pendientes': denuncias.filter(estado='pendiente').count(),
-        'resueltas': denuncias.filter(estado='resuelta').count(),
+        'total': contar(incluir, usuario=request.user),
+        'pendientes': contar(incluir, usuario=request.user, estado='pendiente'),
+        'resueltas': contar(incluir, usuario=request.user, estado='resuelta'),
+        'incluir_archivo': incluir,
     }
 
     return render(request, 'mis_denuncias.html', context)
@@ -185,12 +197,15 @@ def editar_mi_denuncia(request, denuncia_id):
         evidencia_file = request.FILES.get('evidencia')
         if evidencia_file:
             denuncia.evidencia = evidencia_file
+            denuncia.miniatura = None
 
         evidencia_url = request.POST.get('evidencia_url')
         if evidencia_url:
             denuncia.evidencia_url = evidencia_url
 
         denuncia.save()
+        if evidencia_file:
+            al_confirmar(generar_miniatura, denuncia.pk, request.user.pk, None)
 
         # Registrar en historial
         HistorialDenuncia.objects.create(
@@ -238,50 +253,189 @@ def eliminar_mi_denuncia(request, denuncia_id):
 # VISTAS PARA REVISOR Y ADMIN
 # ========================================
 
-@admin_o_revisor
-def pagina6(request):
-    """
-    Gestión de TODAS las denuncias - SOLO revisor y admin
-    Permite ver, filtrar y gestionar todas las denuncias del sistema
-    """
-    denuncias = Denuncia.objects.all().select_related('usuario', 'categoria', 'ubicacion').order_by('-fecha_creacion')
-
-    # Filtros
-    estado_filtro = request.GET.get('estado')
-    prioridad_filtro = request.GET.get('prioridad')
-    categoria_filtro = request.GET.get('categoria')
-    busqueda = request.GET.get('q')
-
+def _filtrar_denuncias(denuncias, params, usuario):
+    """Filtros de pagina6 (GET) reutilizados por el triage masivo (POST)"""
+    estado_filtro = params.get('estado')
+    prioridad_filtro = params.get('prioridad')
+    categoria_filtro = params.get('categoria')
+    busqueda = params.get('q')
+    asignadas_filtro = params.get('asignadas')
+    region_filtro = params.get('region')
+
+    if asignadas_filtro == 'mias':
+        denuncias = cola_trabajo.en_orden(denuncias.filter(
+            asignado_a=usuario,
+            asignacion_expira__gt=timezone.now()
+        ))
     if estado_filtro:
         denuncias = denuncias.filter(estado=estado_filtro)
     if prioridad_filtro:
         denuncias = denuncias.filter(prioridad=prioridad_filtro)
     if categoria_filtro:
         denuncias = denuncias.filter(categoria_id=categoria_filtro)
+    if region_filtro:
+        denuncias = denuncias.filter(ubicacion__region=region_filtro)
     if busqueda:
-        denuncias = denuncias.filter(titulo__icontains=busqueda) | denuncias.filter(descripcion__icontains=busqueda)
+        denuncias = denuncias.filter(Q(titulo__icontains=busqueda) | Q(descripcion__icontains=busqueda))
+
+    return denuncias
+
+@admin_o_revisor
+def pagina6(request):
+    """
+    Gestión de TODAS las denuncias - SOLO revisor y admin
+    Permite ver, filtrar y gestionar todas las denuncias del sistema
+    Con ?incluir_archivo=1 lista también las archivadas (solo lectura)
+    """
+    orden = ('-puntaje', '-fecha_creacion') if request.GET.get('orden') == 'urgencia' else ('-fecha_creacion',)
+    denuncias = Denuncia.objects.all().select_related('usuario', 'categoria', 'ubicacion', 'asignado_a').order_by('-fecha_creacion')
+    denuncias = _filtrar_denuncias(denuncias, request.GET, request.user)
+    if request.GET.get('orden') == 'urgencia':
+        denuncias = denuncias.order_by(*orden)
+
+    # Las archivadas no tienen asignación: "mis asignadas" nunca las incluye
+    incluir = incluir_archivo(request) and request.GET.get('asignadas') != 'mias'
+    if incluir:
+        archivadas = _filtrar_denuncias(DenunciaArchivada.objects.all(), request.GET, request.user)
+        denuncias = con_archivo(denuncias, archivadas).order_by(*orden)
+
+    paginator = Paginator(denuncias, DENUNCIAS_POR_PAGINA)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    if incluir:
+        page_obj.object_list = con_relaciones(page_obj.object_list, 'usuario', 'categoria', 'ubicacion', 'asignado_a')
+    page_obj.object_list = dispositivos.anotar(list(page_obj.object_list))
+
+    # Conservar los filtros en los enlaces de paginación
+    filtros = request.GET.copy()
+    filtros.pop('page', None)
 
     categorias = Categoria.objects.all()
 
     # Estadísticas rápidas
-    total = Denuncia.objects.count()
-    pendientes = Denuncia.objects.filter(estado='pendiente').count()
-    en_proceso = Denuncia.objects.filter(estado='en_proceso').count()
-    resueltas = Denuncia.objects.filter(estado='resuelta').count()
+    total = contar(incluir)
+    pendientes = contar(incluir, estado='pendiente')
+    en_proceso = contar(incluir, estado='en_proceso')
+    resueltas = contar(incluir, estado='resuelta')
 
     context = {
-        'denuncias': denuncias,
+        'denuncias': page_obj,
+        'page_obj': page_obj,
+        'filtros_query': filtros.urlencode(),
         'categorias': categorias,
+        'regiones': Ubicacion.objects.exclude(region__isnull=True).exclude(region='')
+                    .order_by('region').values_list('region', flat=True).distinct(),
         'estados': Denuncia.ESTADOS,
         'prioridades': Denuncia.PRIORIDADES,
         'total': total,
         'pendientes': pendientes,
         'en_proceso': en_proceso,
         'resueltas': resueltas,
+        'mis_reclamadas': cola_trabajo.reclamadas_por(request.user).count(),
+        'ahora': timezone.now(),
     }
 
     return render(request, 'pagina6.html', context)
 
+@admin_o_revisor
+def triage_masivo(request):
+    """
+    Triage masivo - SOLO revisor y admin
+    Cambia estado y/o prioridad de una lista de ids o de todas las denuncias
+    que coinciden con los filtros de pagina6, con UPDATEs por conjunto.
+    Responde JSON con el resultado por id si se pide (Accept: application/json).
+    """
+    if request.method != 'POST':
+        return redirect('pagina6')
+
+    quiere_json = 'application/json' in request.headers.get('Accept', '')
+    estado = request.POST.get('estado_destino') or None
+    prioridad = request.POST.get('prioridad_destino') or None
+
+    ids = []
+    for valor in request.POST.getlist('ids'):
+        ids.extend(int(parte) for parte in valor.split(',') if parte.strip().isdigit())
+
+    if ids:
+        queryset = Denuncia.objects.filter(pk__in=ids)
+    elif request.POST.get('usar_filtro'):
+        queryset = _filtrar_denuncias(Denuncia.objects.all(), request.POST, request.user)
+    else:
+        queryset = None
+
+    error = None
+    if queryset is None:
+        error = 'Selecciona denuncias o aplica el cambio al filtro actual.'
+    elif not estado and not prioridad:
+        error = 'Indica un estado o una prioridad de destino.'
+    else:
+        try:
+            resultados = triage_lote(
+                queryset,
+                request.user,
+                estado=estado,
+                prioridad=prioridad,
+                ip=request.META.get('REMOTE_ADDR')
+            )
+        except TransicionInvalida as e:
+            error = str(e)
+        except ConflictoConcurrencia:
+            error = 'Otro usuario modificó algunas denuncias. Vuelve a intentarlo.'
+
+    if error:
+        if quiere_json:
+            return JsonResponse({'error': error}, status=400)
+        messages.error(request, f'⚠️ {error}')
+    else:
+        no_encontradas = sorted(set(ids) - set(resultados))
+        actualizadas = sum(1 for r in resultados.values() if 'actualizada' in r.values())
+        if quiere_json:
+            return JsonResponse({
+                'resultados': {str(k): v for k, v in resultados.items()},
+                'no_encontradas': no_encontradas,
+                'actualizadas': actualizadas,
+            })
+        messages.success(request, f'✅ Triage aplicado: {actualizadas} de {len(resultados)} denuncias actualizadas.')
+        if no_encontradas:
+            messages.warning(request, f'⚠️ {len(no_encontradas)} ids no existen.')
+
+    siguiente = request.POST.get('siguiente')
+    if siguiente and url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+        return redirect(siguiente)
+    return redirect('pagina6')
+
+@admin_o_revisor
+def reclamar_denuncias(request):
+    """
+    Cola de trabajo: reclama las siguientes N denuncias libres
+    (prioridad y antigüedad) por un tiempo limitado
+    """
+    if request.method == 'POST':
+        try:
+            cantidad = max(1, min(int(request.POST.get('cantidad', 10)), 50))
+        except ValueError:
+            cantidad = 10
+
+        ids = cola_trabajo.reclamar_siguientes(request.user, cantidad)
+        if ids:
+            messages.success(request, f'✅ Reclamaste {len(ids)} denuncias.')
+        else:
+            messages.info(request, 'ℹ️ No hay denuncias libres en la cola.')
+
+    return redirect(f"{reverse('pagina6')}?asignadas=mias")
+
+@admin_o_revisor
+def liberar_denuncia(request, denuncia_id):
+    """
+    Devuelve a la cola una denuncia reclamada por el usuario
+    """
+    if request.method == 'POST':
+        if cola_trabajo.liberar(request.user, [denuncia_id]):
+            messages.success(request, f'✅ Denuncia #{denuncia_id} devuelta a la cola.')
+        else:
+            messages.error(request, '⚠️ La denuncia no está reclamada por ti.')
+
+    return redirect(f"{reverse('pagina6')}?asignadas=mias")
+
 @admin_o_revisor
 def editar_denuncia(request, denuncia_id):
     """
@@ -292,41 +446,32 @@ def editar_denuncia(request, denuncia_id):
     categorias = Categoria.objects.all()
 
     if request.method == 'POST':
-        estado_anterior = denuncia.estado
-        prioridad_anterior = denuncia.prioridad
-
-        denuncia.titulo = request.POST.get('titulo')
-        denuncia.descripcion = request.POST.get('descripcion')
-        denuncia.estado = request.POST.get('estado')
-        denuncia.prioridad = request.POST.get('prioridad')
+        cambios = {
+            'titulo': request.POST.get('titulo'),
+            'descripcion': request.POST.get('descripcion'),
+            'estado': request.POST.get('estado'),
+            'prioridad': request.POST.get('prioridad'),
+        }
 
         categoria_id = request.POST.get('categoria')
         if categoria_id:
-            denuncia.categoria_id = categoria_id
+            cambios['categoria_id'] = int(categoria_id)
 
-        denuncia.save()
-
-        # Registrar cambios en historial
-        cambios = []
-        if estado_anterior != denuncia.estado:
-            cambios.append(f'Estado: {estado_anterior} → {denuncia.estado}')
-        if prioridad_anterior != denuncia.prioridad:
-            cambios.append(f'Prioridad: {prioridad_anterior} → {denuncia.prioridad}')
-
-        if cambios:
-            HistorialDenuncia.objects.create(
-                denuncia=denuncia,
-                usuario=request.user,
-                tipo_accion='edicion',
-                cambio_descripcion=', '.join(cambios)
+        # UPDATE condicionado al estado leído; historial y log en la misma transacción
+        try:
+            actualizar_denuncia(
+                denuncia,
+                request.user,
+                cambios,
+                ip=request.META.get('REMOTE_ADDR'),
+                log=f'Editó denuncia #{denuncia.id}: {cambios["titulo"]}'
             )
-
-        # Registrar en log
-        LogActividad.objects.create(
-            usuario=request.user,
-            accion=f'Editó denuncia #{denuncia.id}: {denuncia.titulo}',
-            ip_origen=request.META.get('REMOTE_ADDR')
-        )
+        except TransicionInvalida as e:
+            messages.error(request, f'⚠️ {e}')
+            return redirect('editar_denuncia', denuncia_id=denuncia.id)
+        except ConflictoConcurrencia:
+            messages.error(request, '⚠️ Otro usuario modificó esta denuncia. Revisa su estado actual.')
+            return redirect('editar_denuncia', denuncia_id=denuncia.id)
 
         messages.success(request, '✅ Denuncia actualizada.')
         return	redirect('pagina6')
@@ -343,31 +488,22 @@ def cambiar_estado_denuncia(request, denuncia_id):
     Para cambios rápidos desde la lista
     """
     if request.method == 'POST':
-        denuncia = get_object_or_404(Denuncia, id=denuncia_id)
+        denuncia = get_object_or_404(Denuncia.objects.only('id', 'estado'), id=denuncia_id)
         nuevo_estado = request.POST.get('estado')
 
-        if nuevo_estado in dict(Denuncia.ESTADOS).keys():
-            estado_anterior = denuncia.estado
-            denuncia.estado = nuevo_estado
-            denuncia.save()
-
-            # Registrar en historial
-            HistorialDenuncia.objects.create(
-                denuncia=denuncia,
-                usuario=request.user,
-                tipo_accion='cambio_estado',
-                cambio_descripcion=f'Estado: {estado_anterior} → {nuevo_estado}'
-            )
-
-            LogActividad.objects.create(
-                usuario=request.user,
-                accion=f'Cambió estado de denuncia #{denuncia.id} a {nuevo_estado}',
-                ip_origen=request.META.get('REMOTE_ADDR')
+        try:
+            transicionar(
+                denuncia,
+                nuevo_estado,
+                request.user,
+                ip=request.META.get('REMOTE_ADDR'),
+                log=f'Cambió estado de denuncia #{denuncia.id} a {nuevo_estado}'
             )
-
             messages.success(request, f'✅ Estado cambiado a {denuncia.get_estado_display()}')
-        else:
-            messages.error(request, '⚠️ Estado inválido')
+        except TransicionInvalida as e:
+            messages.error(request, f'⚠️ {e}')
+        except ConflictoConcurrencia:
+            messages.error(request, '⚠️ Otro usuario cambió el estado de esta denuncia. Revisa su estado actual.')
 
     return redirect('pagina6')
 
@@ -377,7 +513,7 @@ def ver_historial_denuncia(request, denuncia_id):
     Ver historial completo de cambios de una denuncia
     """
     denuncia = get_object_or_404(Denuncia, id=denuncia_id)
-    historial = HistorialDenuncia.objects.filter(denuncia=denuncia).select_related('usuario').order_by('-fecha')
+    historial = HistorialDenuncia.objects.filter(denuncia=denuncia).prefetch_related('usuario').order_by('-fecha')
 
     return render(request, 'historial_denuncia.html', {
         'denuncia': denuncia,
@@ -487,7 +623,7 @@ def ver_logs(request):
     Ver logs de actividad - SOLO admin
     Registro de todas las acciones importantes del sistema
     """
-    logs = LogActividad.objects.select_related('usuario').order_by('-fecha')[:200]
+    logs = LogActividad.objects.prefetch_related('usuario').order_by('-fecha')[:200]
 
     # Filtros
     usuario_filtro = request.GET.get('usuario')
@@ -506,6 +642,7 @@ def ver_logs(request):
     })
 
 @solo_admin
+@lectura_en_replica
 def estadisticas_admin(request):
     """
     Estadísticas y reportes - SOLO admin
@@ -585,6 +722,7 @@ def estadisticas_admin(request):
         'top_categorias': categorias_list,
         'top_usuarios': top_usuarios,
         'denuncias_recientes': denuncias_recientes,
+        'hotspots': Hotspot.objects.select_related('categoria')[:10],
     }
 
     return render(request, 'estadisticas_admin.html', context)
@@ -731,9 +869,13 @@ def perfil_view(request):
 # API REST (JSON)
 # ========================================
 
+@lectura_en_replica
 def lista_denuncias(request):
-    """Lista de denuncias en formato JSON - Acceso público"""
-    denuncias = Denuncia.objects.all().select_related('usuario', 'categoria')
+    """Lista de denuncias en formato JSON - Acceso público (?incluir_archivo=1 suma las archivadas)"""
+    if incluir_archivo(request):
+        denuncias = con_relaciones(con_archivo(Denuncia.objects.all(), DenunciaArchivada.objects.all()), 'usuario', 'categoria')
+    else:
+        denuncias = Denuncia.objects.all().select_related('usuario', 'categoria')
     datos = []
 
     for denuncia in denuncias:
@@ -745,24 +887,127 @@ def lista_denuncias(request):
             'estado': denuncia.get_estado_display(),
             'prioridad': denuncia.get_prioridad_display(),
             'usuario': denuncia.usuario.username,
-            'fecha_creacion': denuncia.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S')
+            'fecha_creacion': denuncia.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S'),
+            'archivada': getattr(denuncia, 'archivada', False)
         })
 
     return JsonResponse(datos, safe=False)
 
+def _fecha_parametro(valor, fin_del_dia=False):
+    """'2025-01-31' o ISO con hora → datetime consciente; None si no se entiende"""
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            return None
+        fecha = datetime.combine(dia, time.max if fin_del_dia else time.min)
+    if settings.USE_TZ and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+@gzip_page
+@lectura_en_replica
+def denuncias_geojson(request):
+    """
+    Denuncias con ubicación como GeoJSON para clientes GIS (QGIS), en streaming.
+    Filtros: bbox=oeste,sur,este,norte  desde/hasta (fecha_creacion)
+    estado, prioridad, categoria (id), region; precision=0..8 decimales.
+    Las filas se leen con iterator() por bloques: en SQLite y PostgreSQL se
+    traen de a poco, pero el backend MySQL de Django carga el resultado
+    completo en el cliente (solo se evita armar todo el JSON en memoria).
+    """
+    denuncias = Denuncia.objects.filter(ubicacion__isnull=False)
+    categoria = request.GET.get('categoria')
+    if categoria:
+        try:
+            denuncias = denuncias.filter(categoria_id=int(categoria))
+        except ValueError:
+            return JsonResponse({'error': 'categoria debe ser un id entero'}, status=400)
+    bbox = request.GET.get('bbox')
+    if bbox:
+        try:
+            oeste, sur, este, norte = (float(valor) for valor in bbox.split(','))
+        except ValueError:
+            return JsonResponse({'error': 'bbox debe ser oeste,sur,este,norte'}, status=400)
+        denuncias = denuncias.filter(
+            ubicacion__latitud__range=(sur, norte),
+            ubicacion__longitud__range=(oeste, este),
+        )
+    for parametro, lookup in (('desde', 'fecha_creacion__gte'), ('hasta', 'fecha_creacion__lte')):
+        if request.GET.get(parametro):
+            fecha = _fecha_parametro(request.GET[parametro], fin_del_dia=parametro == 'hasta')
+            if fecha is None:
+                return JsonResponse({'error': f'{parametro} debe ser una fecha ISO'}, status=400)
+            denuncias = denuncias.filter(**{lookup: fecha})
+    for parametro, campo in (('estado', 'estado'), ('prioridad', 'prioridad'), ('region', 'ubicacion__region')):
+        if request.GET.get(parametro):
+            denuncias = denuncias.filter(**{campo: request.GET[parametro]})
+    try:
+        precision = min(max(int(request.GET.get('precision', 8)), 0), 8)
+    except ValueError:
+        return JsonResponse({'error': 'precision debe ser un entero de 0 a 8'}, status=400)
+
+    # La réplica se fija aquí: el generador corre después de salir de la vista
+    filas = (
+        denuncias.using(router.db_for_read(Denuncia))
+        .order_by('pk')
+        .values_list('pk', 'titulo', 'categoria__nombre', 'estado', 'prioridad', 'fecha_creacion',
+                     'ubicacion__latitud', 'ubicacion__longitud', 'ubicacion__region')
+        .iterator(chunk_size=2000)
+    )
+
+    def features():
+        yield '{"type":"FeatureCollection","features":['
+        separador = ''
+        bloque = []
+        for pk, titulo, categoria, estado, prioridad, fecha, latitud, longitud, region in filas:
+            bloque.append(separador + json.dumps({
+                'type': 'Feature',
+                'id': pk,
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [round(float(longitud), precision), round(float(latitud), precision)],
+                },
+                'properties': {
+                    'titulo': titulo,
+                    'categoria': categoria,
+                    'estado': estado,
+                    'prioridad': prioridad,
+                    'fecha_creacion': fecha.isoformat(),
+                    'region': region or None,
+                },
+            }, ensure_ascii=False, separators=(',', ':')))
+            separador = ','
+            if len(bloque) >= 500:
+                yield ''.join(bloque)
+                bloque = []
+        yield ''.join(bloque) + ']}'
+
+    return StreamingHttpResponse(features(), content_type='application/geo+json; charset=utf-8')
+
 @api_view(['GET'])
+@lectura_en_replica
 def estadisticas_denuncias(request):
-    """Estadísticas de denuncias - API REST"""
-
-    total = Denuncia.objects.count()
-    pendientes = Denuncia.objects.filter(estado='pendiente').count()
-    en_proceso = Denuncia.objects.filter(estado='en_proceso').count()
-    resueltas = Denuncia.objects.filter(estado='resuelta').count()
-    rechazadas = Denuncia.objects.filter(estado='rechazada').count()
-
-    baja = Denuncia.objects.filter(prioridad='baja').count()
-    media = Denuncia.objects.filter(prioridad='media').count()
-    alta = Denuncia.objects.filter(prioridad='alta').count()
+    """Estadísticas de denuncias - API REST (?incluir_archivo=1 suma las archivadas)"""
+    incluir = incluir_archivo(request)
+
+    total = contar(incluir)
+    pendientes = contar(incluir, estado='pendiente')
+    en_proceso = contar(incluir, estado='en_proceso')
+    resueltas = contar(incluir, estado='resuelta')
+    rechazadas = contar(incluir, estado='rechazada')
+
+    baja = contar(incluir, prioridad='baja')
+    media = contar(incluir, prioridad='media')
+    alta = contar(incluir, prioridad='alta')
+
+    # GROUP BY sobre la columna indexada ubicaciones.region
+    por_region = {}
+    modelos = (Denuncia, DenunciaArchivada) if incluir else (Denuncia,)
+    for modelo in modelos:
+        filas = modelo.objects.filter(ubicacion__region__gt='').values_list('ubicacion__region').annotate(total=Count('id')).order_by()
+        for region, cantidad in filas:
+            por_region[region] = por_region.get(region, 0) + cantidad
 
     return Response({
         'total_denuncias': total,
@@ -776,7 +1021,8 @@ def estadisticas_denuncias(request):
             'baja': baja,
             'media': media,
             'alta': alta
-        }
+        },
+        'por_region': dict(sorted(por_region.items()))
     })
 
 @api_view(['GET'])
@@ -799,6 +1045,53 @@ def denuncias_recientes(request):
 
     return Response(datos)
 
+@admin_o_revisor
+def dispositivos_cercanos(request, denuncia_id):
+    """Dispositivos más cercanos a la ubicación de una denuncia (?k=3&max_metros=10000)"""
+    denuncia = get_object_or_404(Denuncia.objects.select_related('ubicacion'), pk=denuncia_id)
+    if denuncia.ubicacion is None:
+        return JsonResponse({'denuncia': denuncia.id, 'dispositivos': []})
+    try:
+        k = min(int(request.GET.get('k', settings.DISPOSITIVOS_CERCANOS)), 50)
+        max_metros = float(request.GET.get('max_metros', settings.DISPOSITIVOS_DISTANCIA_MAXIMA))
+    except ValueError:
+        return JsonResponse({'error': 'k y max_metros deben ser números'}, status=400)
+
+    cercanos = dispositivos.cercanos(denuncia.ubicacion.latitud, denuncia.ubicacion.longitud, k, max_metros)
+    return JsonResponse({
+        'denuncia': denuncia.id,
+        'dispositivos': [{
+            'id': dispositivo.id,
+            'identificador': dispositivo.identificador,
+            'tipo': dispositivo.tipo,
+            'metros': distancia,
+        } for dispositivo, distancia in cercanos],
+    })
+
+@admin_o_revisor
+@lectura_en_replica
+def hotspots_geojson(request):
+    """Focos de denuncias recientes como GeoJSON (FeatureCollection de puntos)"""
+    hotspots = Hotspot.objects.select_related('categoria')
+    categoria = request.GET.get('categoria', '')
+    if categoria.isdigit():
+        hotspots = hotspots.filter(categoria_id=int(categoria))
+
+    features = [{
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [float(h.longitud), float(h.latitud)]},
+        'properties': {
+            'id': h.id,
+            'categoria': h.categoria.nombre if h.categoria else None,
+            'denuncias': h.denuncias,
+            'recientes': h.recientes,
+            'radio_metros': h.radio_metros,
+            'primera': h.primera.isoformat(),
+            'ultima': h.ultima.isoformat(),
+        },
+    } for h in hotspots]
+    return JsonResponse({'type': 'FeatureCollection', 'features': features})
+
 @usuario_autenticado
 def pagina7(request):
     return redirect('pagina2')
@@ -806,14 +1099,19 @@ def pagina7(request):
 # ========================================
 # PÁGINA 3: FLORA Y FAUNA POR UBICACIÓN
 # ========================================
-def pagina3(request):
+async def pagina3(request):
     """
     Flora y Fauna por ubicación usando iNaturalist (Chile) a partir de observaciones con foto.
     - Siempre filtra por Chile.
     - Además filtra por el texto que escribas (q), ej: 'camote', 'cóndor', 'puma'.
+    - Busca en el catálogo local (appProyecto.catalogo) si está importado; si no,
+      pide flora y fauna a la vez con el cliente asíncrono (appProyecto.inaturalist).
     """
     ubicacion = request.GET.get('ubicacion', '').strip()
-    page = int(request.GET.get('page', 1))
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     items_per_page = 30
 
     flora_results = []
@@ -822,81 +1120,18 @@ def pagina3(request):
 
     # Si no hay texto, no buscamos nada (para no traer 9 millones de resultados)
     if ubicacion:
-        try:
-            place_id_chile = 6793  # Chile
-
-            url = "https://api.inaturalist.org/v1/observations"
-            params = {
-                "place_id": place_id_chile,
-                "per_page": items_per_page,
-                "page": page,
-                "order_by": "created_at",
-                "order": "desc",
-                "locale": "es",
-                "preferred_place_id": place_id_chile,
-                "verifiable": "true",
-                "photos": "true",
-                "q": ubicacion,  # <- texto que escribes (nombre común / científico) [web:192]
-            }
-
-            r = requests.get(url, params=params, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                results = data.get("results", [])
-
-                for obs in results:
-                    taxon = obs.get("taxon") or {}
-                    if not taxon:
-                        continue
-
-                    # nombre común en español si existe
-                    common_name = taxon.get("preferred_common_name")
-                    if not common_name:
-                        for n in taxon.get("names", []):
-                            if n.get("lexicon") == "Spanish":
-                                common_name = n.get("name")
-                                break
-
-                    scientific_name = taxon.get("name") or ""
-
-                    # FOTO: usar primera foto de la observación
-                    default_photo = None
-                    photos = obs.get("photos") or []
-                    if photos:
-                        default_photo = (
-                            photos[0].get("url")
-                            or photos[0].get("medium_url")
-                            or photos[0].get("square_url")
-                        )
-
-                    iconic = (taxon.get("iconic_taxon_name") or "").lower()
-
-                    item = {
-                        "nombre_comun": common_name or "Sin nombre común",
-                        "nombre_cientifico": scientific_name,
-                        "descripcion": "",
-                        "imagen": default_photo,
-                        "tipo": iconic.capitalize(),
-                        "ciclo": "",
-                        "nombre": common_name or scientific_name,
-                        "habitat": "",
-                        "dieta": "",
-                        "poblacion": "",
-                        "ubicaciones": "Chile",
-                    }
-
-                    if iconic == "plantae":
-                        flora_results.append(item)
-                    elif iconic in [
-                        "animalia", "aves", "mammalia", "reptilia",
-                        "amphibia", "actinopterygii", "arachnida", "insecta"
-                    ]:
-                        fauna_results.append(item)
-            else:
-                error_message = "No se pudo obtener información desde iNaturalist por ahora."
-        except Exception as e:
-            print("DEBUG INAT ERROR:", repr(e))
-            error_message = "Error al conectar con el servicio de biodiversidad."
+        # Con catálogo local importado no se consulta la API (salvo por fotos)
+        locales = await sync_to_async(catalogo.buscar)(ubicacion, page, items_per_page)
+        if locales is not None:
+            flora_results, fauna_results = locales
+        else:
+            flora_results, fauna_results, error_message = await inaturalist.flora_y_fauna(
+                ubicacion, page, items_per_page
+            )
+
+    # Las fotos pasan por el proxy: miniatura WebP cacheada en vez de la original
+    for item in flora_results + fauna_results:
+        item['imagen'] = imagenes.url_proxy(item.get('imagen'))
 
     context = {
         "ubicacion": ubicacion,
@@ -907,4 +1142,29 @@ def pagina3(request):
         "hay_mas_flora": len(flora_results) == items_per_page,
         "hay_mas_fauna": len(fauna_results) == items_per_page,
     }
-    return render(request, "pagina3.html", context)
+    # render toca request.user (sesión y BD): va por sync_to_async
+    return await sync_to_async(render)(request, "pagina3.html", context)
+
+
+async def imagen_proxy(request):
+    """
+    Miniatura WebP de una foto externa firmada por pagina3 (?u=).
+    El contenido de una URL firmada no cambia: caché de un año y ETag.
+    """
+    try:
+        url = imagenes.leer_firma(request.GET.get('u', ''))
+    except signing.BadSignature:
+        return JsonResponse({'error': 'URL de imagen no válida'}, status=400)
+
+    etag = f'"{imagenes.clave(url)}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        respuesta = HttpResponse(status=304)
+    else:
+        try:
+            datos = await imagenes.miniatura(url)
+        except imagenes.ImagenNoDisponible:
+            return JsonResponse({'error': 'Imagen no disponible'}, status=502)
+        respuesta = HttpResponse(datos, content_type='image/webp')
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = imagenes.CACHE_CONTROL
+    return respuesta
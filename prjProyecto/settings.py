@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'appProyecto.enrutador.AdherenciaEscrituraMiddleware',
 ]
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
@@ -96,7 +97,11 @@ WSGI_APPLICATION = 'prjProyecto.wsgi.application'
 if DEBUG:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.mysql',
+            # Pool de conexiones por worker (appProyecto.db_backends.mysql_pool); DB_POOL=0 lo desactiva
+            'ENGINE': (
+                'appProyecto.db_backends.mysql_pool' if os.getenv('DB_POOL', '1') == '1'
+                else 'django.db.backends.mysql'
+            ),
             'NAME': os.getenv('DB_NAME', 'silvasentinel'),
             'USER': os.getenv('DB_USER', 'root'),
             'PASSWORD': os.getenv('DB_PASSWORD', ''),
@@ -106,16 +111,78 @@ if DEBUG:
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
                 'charset': 'utf8mb4',
             },
+            # Cada petición devuelve su conexión al pool al terminar
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'TAMANO': int(os.getenv('DB_POOL_TAMANO', 10)),         # por worker y alias
+                'MAX_VIDA': int(os.getenv('DB_POOL_MAX_VIDA', 1800)),   # s, menor que wait_timeout
+                'PING_TRAS': 30,                                        # s ociosa antes de verificarla
+                'ESPERA': float(os.getenv('DB_POOL_ESPERA', 5)),        # s antes de PoolAgotado
+            },
         }
     }
+    if os.getenv('DB_AUDIT_NAME'):
+        DATABASES['audit'] = {
+            **DATABASES['default'],
+            'NAME': os.getenv('DB_AUDIT_NAME'),
+            # Las tablas de auditoría se crean sin FK hacia la principal
+            # (ver appProyecto.enrutador.auditoria_separada)
+            'HOST': os.getenv('DB_AUDIT_HOST', DATABASES['default']['HOST']),
+        }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+            'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', DATABASES['default']['PASSWORD']),
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     # Producción (Render): SQLite
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Las transacciones toman el lock de escritura al comenzar:
+                # evita el "database is locked" inmediato al pasar de lectura a escritura
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
+    # Archivos aparte: los inserts de auditoría no compiten por el lock de escritura
+    # de denuncias. Para probar la réplica en local basta una copia del archivo.
+    if os.getenv('SQLITE_AUDIT_PATH'):
+        DATABASES['audit'] = {**DATABASES['default'], 'NAME': os.getenv('SQLITE_AUDIT_PATH')}
+    if os.getenv('SQLITE_REPLICA_PATH'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': os.getenv('SQLITE_REPLICA_PATH'),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Historial y logs a 'audit'; vistas de solo lectura a 'replica' (appProyecto.enrutador).
+# Sin esos alias todo queda en 'default'. La base de auditoría se migra con
+# `python manage.py migrate --database=audit`.
+DATABASE_ROUTERS = ['appProyecto.enrutador.EnrutadorBaseDatos']
+BD_AUDITORIA_ALIAS = 'audit'
+BD_REPLICA_ALIAS = os.getenv('DB_REPLICA_ALIAS', 'replica')
+# Tras escribir, el cliente lee de 'default' durante este plazo (mayor que el retraso de la réplica)
+REPLICA_ADHERENCIA_SEGUNDOS = int(os.getenv('REPLICA_ADHERENCIA_SEGUNDOS', 15))
+REPLICA_COOKIE = 'silvasentinel_escritura'
+
+# Perfil SQLite aplicado a cada conexión nueva (appProyecto.basedatos)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+    'mmap_size': 134217728,  # 128 MB
+    'cache_size': -20000,    # ~20 MB por conexión
+    'temp_store': 'MEMORY',
+}
+SQLITE_REINTENTOS = int(os.getenv('SQLITE_REINTENTOS', 5))
+SQLITE_REINTENTO_ESPERA = 0.05  # segundos, se duplica en cada intento
 
 # ==============================================================================
 # VALIDACIÓN DE CONTRASEÑAS
@@ -195,6 +262,12 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# request.user se resuelve desde un snapshot en caché (ver appProyecto/autenticacion.py)
+AUTHENTICATION_BACKENDS = [
+    'appProyecto.autenticacion.UsuarioCacheBackend',
+]
+USUARIO_CACHE_TTL = 1800  # 30 min
+
 # ==============================================================================
 # CONFIGURACIÓN DE SESIONES (SEGURIDAD MEJORADA)
 # ==============================================================================
@@ -206,7 +279,25 @@ SESSION_COOKIE_NAME = 'silvasentinel_sessionid'
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = False
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Caché + BD; solo reescribe la sesión si cambió o tras el umbral de renovación
+SESSION_ENGINE = 'appProyecto.sesiones'
+SESSION_REFRESH_THRESHOLD = int(os.getenv('SESSION_REFRESH_THRESHOLD', '300'))  # 5 min
+
+# ==============================================================================
+# CACHÉ
+# ==============================================================================
+
+# Caché en disco compartida por los workers de gunicorn (sobrescribible por .env)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
 
 # ==============================================================================
 # CONFIGURACIÓN DE CSRF (SEGURIDAD)
@@ -289,6 +380,109 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 ALLOWED_UPLOAD_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.pdf', '.mp4', '.mov']
 
+# ==============================================================================
+# TAREAS EN SEGUNDO PLANO
+# ==============================================================================
+
+# Efectos secundarios (logs, miniaturas, duplicados) fuera del ciclo de la petición
+TAREAS_WORKERS = int(os.getenv('TAREAS_WORKERS', '2'))
+TAREAS_SINCRONAS = os.getenv('TAREAS_SINCRONAS', 'False') == 'True'
+
+# ==============================================================================
+# COLA DE TRABAJO DE REVISORES
+# ==============================================================================
+
+COLA_RECLAMO_MINUTOS = 30  # luego la denuncia vuelve a la cola
+
+# ==============================================================================
+# ADMINISTRACIÓN
+# ==============================================================================
+
+# Sobre este número de filas el admin usa conteos estimados en vez de COUNT(*)
+ADMIN_CONTEO_EXACTO_HASTA = int(os.getenv('ADMIN_CONTEO_EXACTO_HASTA', 10000))
+
+# Acciones masivas sobre más filas que esto se ejecutan en segundo plano
+ACCIONES_ASYNC_UMBRAL = int(os.getenv('ACCIONES_ASYNC_UMBRAL', 10000))
+
+# ==============================================================================
+# RESPALDOS (manage.py respaldo)
+# ==============================================================================
+
+RESPALDOS_DIR = os.getenv('RESPALDOS_DIR', str(BASE_DIR / 'respaldos'))
+RESPALDOS_CONSERVAR = int(os.getenv('RESPALDOS_CONSERVAR', 7))  # los más recientes por base
+
+# ==============================================================================
+# ARCHIVO DE DENUNCIAS CERRADAS (manage.py archivar_denuncias)
+# ==============================================================================
+
+# Resueltas/rechazadas sin cambios hace más de estos meses pasan a las tablas de archivo
+ARCHIVO_MESES = int(os.getenv('ARCHIVO_MESES', 6))
+
+# ==============================================================================
+# UBICACIONES
+# ==============================================================================
+
+# Decimales con que se comparan coordenadas: 4 ≈ 11 m. Reportes dentro de la
+# misma celda reutilizan la Ubicacion. Al cambiarlo, correr fusionar_ubicaciones.
+UBICACION_DECIMALES = int(os.getenv('UBICACION_DECIMALES', 4))
+
+# Límites comunales en GeoJSON (WGS84) para asignar región y comuna sin GIS externo
+REGIONES_GEOJSON = os.getenv('REGIONES_GEOJSON', str(BASE_DIR / 'datos' / 'comunas.geojson'))
+REGIONES_CAMPO_REGION = os.getenv('REGIONES_CAMPO_REGION', 'codregion')
+REGIONES_CAMPO_COMUNA = os.getenv('REGIONES_CAMPO_COMUNA', 'cod_comuna')
+
+# Nomenclátor de GeoNames (CL.txt) para geocodificar ubicacion_texto sin red
+NOMENCLATOR_ARCHIVO = os.getenv('NOMENCLATOR_ARCHIVO', str(BASE_DIR / 'datos' / 'CL.txt'))
+NOMENCLATOR_CONFIANZA_MINIMA = float(os.getenv('NOMENCLATOR_CONFIANZA_MINIMA', 0.6))
+NOMENCLATOR_PRECARGAR = os.getenv('NOMENCLATOR_PRECARGAR', 'True') == 'True'  # cargar al arrancar el proceso
+
+# Modelo digital de elevación (grilla cruda + <archivo>.json), abierto con numpy.memmap
+ELEVACION_RASTER = os.getenv('ELEVACION_RASTER', str(BASE_DIR / 'datos' / 'dem.bin'))
+
+# ==============================================================================
+# FOCOS DE DENUNCIAS (manage.py calcular_hotspots)
+# ==============================================================================
+
+HOTSPOTS_RADIO_METROS = float(os.getenv('HOTSPOTS_RADIO_METROS', 500))  # radio de vecindad del DBSCAN
+HOTSPOTS_MINIMO = int(os.getenv('HOTSPOTS_MINIMO', 5))                 # denuncias para un núcleo
+HOTSPOTS_VENTANA_DIAS = int(os.getenv('HOTSPOTS_VENTANA_DIAS', 30))
+
+# ==============================================================================
+# DISPOSITIVO MÁS CERCANO A CADA DENUNCIA (appProyecto.dispositivos)
+# ==============================================================================
+
+DISPOSITIVOS_CERCANOS = int(os.getenv('DISPOSITIVOS_CERCANOS', 3))                        # k por defecto
+DISPOSITIVOS_DISTANCIA_MAXIMA = float(os.getenv('DISPOSITIVOS_DISTANCIA_MAXIMA', 10000))  # metros
+DISPOSITIVOS_INDICE_TTL = int(os.getenv('DISPOSITIVOS_INDICE_TTL', 3600))  # reconstrucción completa (s)
+
+# ==============================================================================
+# CLIENTE DE INATURALIST (appProyecto.inaturalist, pagina3)
+# ==============================================================================
+
+INATURALIST_URL = os.getenv('INATURALIST_URL', 'https://api.inaturalist.org/v1')
+INATURALIST_CONEXIONES = int(os.getenv('INATURALIST_CONEXIONES', 20))             # pool por proceso
+INATURALIST_TIMEOUT = float(os.getenv('INATURALIST_TIMEOUT', 10))                 # techo del timeout adaptativo
+INATURALIST_TIMEOUT_MINIMO = float(os.getenv('INATURALIST_TIMEOUT_MINIMO', 1.5))
+INATURALIST_FALLAS_PARA_ABRIR = int(os.getenv('INATURALIST_FALLAS_PARA_ABRIR', 5))  # fallas seguidas
+INATURALIST_ENFRIAMIENTO = float(os.getenv('INATURALIST_ENFRIAMIENTO', 30))       # segundos con el circuito abierto
+INATURALIST_CACHE_FRESCO = int(os.getenv('INATURALIST_CACHE_FRESCO', 3600))        # s sin refrescar
+INATURALIST_CACHE_MAXIMO = int(os.getenv('INATURALIST_CACHE_MAXIMO', 7 * 86400))   # s sirviendo obsoleta
+
+# ==============================================================================
+# PROXY DE IMÁGENES (appProyecto.imagenes, fotos de pagina3)
+# ==============================================================================
+
+IMAGENES_CACHE_DIR = os.getenv('IMAGENES_CACHE_DIR', str(BASE_DIR / 'cache_imagenes'))
+IMAGENES_CACHE_MAX_BYTES = int(os.getenv('IMAGENES_CACHE_MAX_BYTES', 200 * 1024 * 1024))  # LRU en disco
+IMAGENES_MAX_BYTES = int(os.getenv('IMAGENES_MAX_BYTES', 8 * 1024 * 1024))  # descarga máxima por foto
+# Hosts a los que el proxy sigue una redirección (además del de la URL firmada)
+IMAGENES_HOSTS_REDIRECCION = [
+    h.strip() for h in os.getenv(
+        'IMAGENES_HOSTS_REDIRECCION',
+        'inaturalist-open-data.s3.amazonaws.com,static.inaturalist.org'
+    ).split(',') if h.strip()
+]
+
 # ==============================================================================
 # CLAVES DE APIS EXTERNAS (FLORA Y FAUNA)
 # ==============================================================================